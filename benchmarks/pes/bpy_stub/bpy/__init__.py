@@ -0,0 +1,122 @@
+"""bpy mínimo para rodar o PeS fora do Blender nos benchmarks
+
+Modela só o que o add-on usa: bpy.data (filepath, libraries, collections,
+objects), bibliotecas com reload e libraries.load, preferências do add-on,
+cena, window manager e o layout dos painéis (que conta os elementos criados).
+"""
+
+import time
+from types import SimpleNamespace
+
+from . import app, path, props, types, utils
+
+
+class Library:
+    """Biblioteca linkada; reload() custa reload_cost segundos"""
+
+    reload_cost = 0.0
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.name = filepath.replace('\\', '/').split('/')[-1]
+        self.reloads = 0
+
+    def reload(self):
+        self.reloads += 1
+        if self.reload_cost:
+            time.sleep(self.reload_cost)
+
+
+class Collection:
+    def __init__(self, name, library=None):
+        self.name = name
+        self.library = library
+        self.children = []
+        self.objects = []
+
+
+class _AnyName:
+    """Lista de nomes de um arquivo sintético: contém qualquer nome pedido"""
+
+    def __contains__(self, name):
+        return True
+
+    def __iter__(self):
+        return iter(())
+
+
+class _LibraryLoad:
+    def __init__(self, data, filepath):
+        self._data = data
+        self._filepath = filepath
+        self._to = SimpleNamespace(collections=[])
+
+    def __enter__(self):
+        return SimpleNamespace(collections=_AnyName()), self._to
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            return False
+        library = next((lib for lib in self._data.libraries if lib.filepath == self._filepath), None)
+        if library is None:
+            library = Library(self._filepath)
+            self._data.libraries.append(library)
+        linked = [Collection(name, library) for name in self._to.collections]
+        self._data.collections.extend(linked)
+        self._to.collections = linked
+        return False
+
+
+class _Libraries(list):
+    def __init__(self, data):
+        super().__init__()
+        self._data = data
+
+    def load(self, filepath, link=False, relative=False):
+        return _LibraryLoad(self._data, filepath)
+
+
+class _Data:
+    def __init__(self):
+        self.filepath = ""
+        self.libraries = _Libraries(self)
+        self.collections = []
+        self.objects = []
+
+
+data = _Data()
+
+
+def reset_data():
+    """Troca bpy.data por um arquivo vazio"""
+    global data
+    data = _Data()
+    return data
+
+
+class _Addon:
+    def __init__(self, preferences):
+        self.preferences = preferences
+
+
+class _Preferences:
+    def __init__(self):
+        self.addons = {}
+
+
+class _WindowManager(types.WindowManager):
+    def popup_menu(self, draw_func, title=""):
+        menu = SimpleNamespace(layout=types.Layout())
+        draw_func(menu, context)
+
+
+context = SimpleNamespace(
+    preferences=_Preferences(),
+    scene=types.Scene(),
+    window_manager=_WindowManager(),
+)
+
+
+def set_addon_preferences(package, **values):
+    """Registra as preferências de um add-on como se ele estivesse habilitado"""
+    context.preferences.addons[package] = _Addon(SimpleNamespace(**values))
@@ -0,0 +1,7 @@
+"""bpy.app: versão, handlers e timers"""
+
+from . import handlers, timers
+
+version = (4, 3, 0)
+version_string = "4.3.0"
+background = True
@@ -0,0 +1,19 @@
+"""Listas de handlers do bpy.app.handlers"""
+
+import types
+
+render_init = []
+render_complete = []
+render_cancel = []
+render_pre = []
+render_post = []
+load_post = []
+save_post = []
+depsgraph_update_post = []
+
+
+def persistent(func):
+    # Como no Blender, que marca a função e recusa qualquer outra coisa
+    if not isinstance(func, types.FunctionType):
+        raise ValueError("bpy.app.handlers.persistent expected a function")
+    return func
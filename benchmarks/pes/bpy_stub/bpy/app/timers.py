@@ -0,0 +1,30 @@
+"""bpy.app.timers: as funções registradas rodam quando o benchmark chama run_pending()"""
+
+import time
+
+_registered = {}
+
+
+def register(function, first_interval=0, persistent=False):
+    _registered[function] = time.monotonic() + first_interval
+
+
+def unregister(function):
+    _registered.pop(function, None)
+
+
+def is_registered(function):
+    return function in _registered
+
+
+def run_pending():
+    """Executa os timers vencidos, como o loop de eventos do Blender faria"""
+    now = time.monotonic()
+    for function, due in list(_registered.items()):
+        if due > now:
+            continue
+        interval = function()
+        if interval is None:
+            _registered.pop(function, None)
+        else:
+            _registered[function] = time.monotonic() + interval
@@ -0,0 +1,11 @@
+"""bpy.path.abspath com caminhos '//' relativos ao arquivo aberto"""
+
+import os
+
+
+def abspath(path, start=None, library=None):
+    if not path.startswith("//"):
+        return path
+    import bpy
+    base = start or os.path.dirname(bpy.data.filepath)
+    return os.path.normpath(os.path.join(base, path[2:]))
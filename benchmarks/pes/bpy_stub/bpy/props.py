@@ -0,0 +1,71 @@
+"""Propriedades do bpy como descritores simples com valor padrão"""
+
+
+class _Property:
+    def __init__(self, default, **options):
+        self.default = default
+        self.options = options
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        return instance.__dict__.get(("prop", id(self)), self.default)
+
+    def __set__(self, instance, value):
+        instance.__dict__[("prop", id(self))] = value
+        update = self.options.get("update")
+        if update:
+            update(instance, None)
+
+
+def StringProperty(default="", **options):
+    return _Property(default, **options)
+
+
+def BoolProperty(default=False, **options):
+    return _Property(default, **options)
+
+
+def IntProperty(default=0, **options):
+    return _Property(default, **options)
+
+
+def FloatProperty(default=0.0, **options):
+    return _Property(default, **options)
+
+
+def FloatVectorProperty(default=(0.0, 0.0, 0.0), **options):
+    return _Property(tuple(default), **options)
+
+
+def EnumProperty(items=(), default=None, **options):
+    if default is None and items and not callable(items):
+        default = items[0][0]
+    return _Property(default, items=items, **options)
+
+
+class _Collection(list):
+    """Lista de PropertyGroup com add()/remove() como no bpy"""
+
+    def __init__(self, item_type):
+        super().__init__()
+        self.item_type = item_type
+
+    def add(self):
+        item = self.item_type()
+        self.append(item)
+        return item
+
+    def remove(self, index):
+        del self[index]
+
+
+class _CollectionProperty(_Property):
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        return instance.__dict__.setdefault(("prop", id(self)), _Collection(self.default))
+
+
+def CollectionProperty(type=None, **options):
+    return _CollectionProperty(type, **options)
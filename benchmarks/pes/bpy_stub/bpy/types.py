@@ -0,0 +1,78 @@
+"""Classes base do bpy.types usadas pelo PeS"""
+
+
+class _Counter:
+    elements = 0
+
+
+class Layout:
+    """Layout de painel que só conta os elementos criados"""
+
+    counter = _Counter
+
+    def __init__(self):
+        self.scale_y = 1.0
+        self.alignment = 'EXPAND'
+        self.enabled = True
+
+    def _child(self, *args, **kwargs):
+        Layout.counter.elements += 1
+        return Layout()
+
+    row = column = box = split = _child
+
+    def label(self, **kwargs):
+        Layout.counter.elements += 1
+
+    def prop(self, data, name, **kwargs):
+        Layout.counter.elements += 1
+
+    def separator(self, **kwargs):
+        Layout.counter.elements += 1
+
+    def operator(self, idname, **kwargs):
+        Layout.counter.elements += 1
+        return _OperatorProperties()
+
+
+class _OperatorProperties:
+    pass
+
+
+class bpy_struct:
+    pass
+
+
+class Operator(bpy_struct):
+    def __init__(self):
+        self.reports = []
+
+    def report(self, level, message):
+        self.reports.append((next(iter(level)), message))
+
+
+class Panel(bpy_struct):
+    def __init__(self):
+        self.layout = Layout()
+
+
+class Menu(bpy_struct):
+    pass
+
+
+class AddonPreferences(bpy_struct):
+    pass
+
+
+class PropertyGroup(bpy_struct):
+    pass
+
+
+class WindowManager(bpy_struct):
+    pass
+
+
+class Scene(bpy_struct):
+    def __init__(self):
+        self.cursor = type("Cursor", (), {"location": None})()
+        self.collection = None
@@ -0,0 +1,55 @@
+"""bpy.utils: registro de classes e pastas de dados do usuário"""
+
+import os
+import tempfile
+import types
+
+registered = []
+
+# Métodos com quantidade de argumentos conferida pelo Blender no registro
+_CALLBACK_ARGS = {"execute": 2, "invoke": 3, "modal": 3, "draw": 2, "poll": 2}
+# Pasta onde ficam os dados de usuário das extensões (trocada pelo benchmark)
+user_dir = os.path.join(tempfile.gettempdir(), "pes_bench_user")
+
+
+def _check_callbacks(cls):
+    """Mesma conferência do register_class do Blender para execute/invoke/draw/poll"""
+    base = next((b.__name__ for b in cls.__mro__[1:] if b.__module__ == "bpy.types"), "bpy_struct")
+    for name, expected in _CALLBACK_ARGS.items():
+        attr = next((klass.__dict__[name] for klass in cls.__mro__ if name in klass.__dict__), None)
+        if attr is None:
+            continue
+        if name == "poll":
+            if not isinstance(attr, (classmethod, staticmethod)):
+                raise ValueError(f'expected {base}, {cls.__name__} class "poll" attribute to be a static/class method')
+            attr = attr.__func__
+        elif not isinstance(attr, types.FunctionType):
+            raise ValueError(f'expected {base}, {cls.__name__} class "{name}" attribute to be a function')
+        found = attr.__code__.co_argcount
+        if found != expected:
+            raise ValueError(
+                f'expected {base}, {cls.__name__} class "{name}" function to have {expected} args, found {found}'
+            )
+
+
+def register_class(cls):
+    _check_callbacks(cls)
+    registered.append(cls)
+
+
+def unregister_class(cls):
+    registered.remove(cls)
+
+
+def extension_path_user(package, path="", create=False):
+    result = os.path.join(user_dir, package, path)
+    if create:
+        os.makedirs(result, exist_ok=True)
+    return result
+
+
+def user_resource(resource_type, path="", create=False):
+    result = os.path.join(user_dir, resource_type.lower(), path)
+    if create:
+        os.makedirs(result, exist_ok=True)
+    return result
@@ -0,0 +1,484 @@
+"""Benchmarks do PeS fora do Blender
+
+Carrega o add-on com o bpy de bpy_stub/ e o servidor local de standin.py e
+mede, em cenários de tamanho crescente:
+
+- draw: tempo de desenho dos painéis (1 a 500 bibliotecas, 2 a 2000 rigs)
+- catalog: carga do catálogo fria (rede), revalidação (304) e pelo cache em disco
+- download: vazão de download de um rig grande (com e sem hash, com falhas)
+- update: tempo total para atualizar N bibliotecas com o operador de update
+- probe: N pedidos HEAD pequenos, em série (requests) e concorrentes no loop de rede
+- bandwidth: vazão do segundo plano limitado, sozinho e durante um download em primeiro plano
+- bundle: N rigs baixados um a um (em paralelo) vs num único pacote .tar
+- hostname: downloads paralelos por nome de host (localhost) vs IP, com sondagens
+
+Uso:
+    python benchmarks/pes/run.py [--scenario draw] [--quick] [--json resultado.json]
+"""
+
+import argparse
+import functools
+import importlib.util
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ADDON_DIR = os.path.join(HERE, "..", "..", "packages", "pes_v0.0.0")
+ADDON_PACKAGE = "pes"
+
+sys.path.insert(0, os.path.join(HERE, "bpy_stub"))
+sys.path.insert(0, HERE)
+
+import bpy  # noqa: E402  (stub)
+from bpy.types import Layout  # noqa: E402
+
+from standin import (  # noqa: E402
+    StandInConfig, StandInServer, build_catalog, file_sha256, rig_filename,
+)
+
+
+def load_addon():
+    """Importa o add-on como pacote 'pes' e mede import e register"""
+    started = time.perf_counter()
+    spec = importlib.util.spec_from_file_location(
+        ADDON_PACKAGE, os.path.join(ADDON_DIR, "__init__.py"),
+        submodule_search_locations=[ADDON_DIR],
+    )
+    addon = importlib.util.module_from_spec(spec)
+    sys.modules[ADDON_PACKAGE] = addon
+    spec.loader.exec_module(addon)
+    imported = time.perf_counter()
+    addon.register()
+    registered = time.perf_counter()
+    return addon, {
+        "import_ms": (imported - started) * 1000,
+        "register_ms": (registered - imported) * 1000,
+        # O add-on só deve carregar a pilha de rede no primeiro uso
+        "requests_loaded_at_register": "requests" in sys.modules,
+    }
+
+
+def measure(func, repeat):
+    """Executa func `repeat` vezes e retorna (mediana, p95) em milissegundos"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[max(0, int(len(samples) * 0.95 + 0.5) - 1)]
+
+
+class Bench:
+    def __init__(self, args):
+        self.args = args
+        self.workdir = tempfile.mkdtemp(prefix="pes_bench_")
+        bpy.utils.user_dir = os.path.join(self.workdir, "user")
+        self.config = StandInConfig(
+            latency=args.latency,
+            bandwidth=args.bandwidth_mbps * 1e6 / 8,
+            ranges=not args.no_range,
+            fail_rate=0.0,
+            file_size=args.rig_kb * 1024,
+        )
+        self.server = StandInServer(self.config).start()
+        bpy.set_addon_preferences(
+            ADDON_PACKAGE,
+            catalog_url=f"{self.server.url}/rigs.json",
+            cache_server="",
+            timing_log="",
+            foreground_limit=0.0,
+            background_limit=20.0,
+            prefetch_updates=False,
+            extra_catalogs=[],
+        )
+        self.addon, self.startup = load_addon()
+        self.results = {"startup": self.startup}
+
+    def close(self):
+        self.addon.unregister()
+        self.server.stop()
+        if not self.args.keep:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+
+    # Preparação
+
+    def use_catalog(self, rigs):
+        """Troca o catálogo servido e descarta os caches do add-on"""
+        self.config.set_catalog(build_catalog(self.server.url, rigs))
+        self.addon._catalog_caches.clear()
+        # O banco local fica na mesma pasta: fecha antes de apagar
+        if self.addon._state_store is not None:
+            self.addon._state_store.close()
+            self.addon._state_store = None
+        shutil.rmtree(bpy.utils.user_dir, ignore_errors=True)
+
+    def open_shot(self, libraries, rigs, create_files=False):
+        """Abre um shot vazio que linka `libraries` bibliotecas
+
+        Com mais bibliotecas que rigs, as excedentes apontam para versões
+        seguintes dos mesmos rigs, para que todos os caminhos sejam distintos.
+        """
+        data = bpy.reset_data()
+        shot_dir = os.path.join(self.workdir, "projeto", "shots")
+        rig_dir = os.path.join(self.workdir, "projeto", "0_IN", "3_RIGs")
+        os.makedirs(shot_dir, exist_ok=True)
+        os.makedirs(rig_dir, exist_ok=True)
+        data.filepath = os.path.join(shot_dir, "shot.blend")
+        for index in range(libraries):
+            filename = rig_filename(index % rigs, 1 + index // rigs)
+            path = os.path.join(rig_dir, filename)
+            if create_files and not os.path.exists(path):
+                with open(path, 'wb') as f:
+                    f.write(b"\0" * 1024)
+            data.libraries.append(bpy.Library(f"//../0_IN/3_RIGs/{filename}"))
+        return rig_dir
+
+    # Cenários
+
+    def scenario_draw(self):
+        rows = []
+        library_counts = [1, 10, 100] if self.args.quick else [1, 10, 100, 500]
+        rig_counts = [2, 200] if self.args.quick else [2, 200, 2000]
+        for rigs in rig_counts:
+            self.use_catalog(rigs)
+            for libraries in library_counts:
+                self.open_shot(libraries, rigs)
+                self.addon.load_rigs_database()
+
+                update_panel = self.addon.DOWNLOADRIG_PT_update_panel()
+                download_panel = self.addon.DOWNLOADRIG_PT_download_panel()
+
+                def draw_update():
+                    update_panel.layout = Layout()
+                    update_panel.draw(bpy.context)
+
+                def draw_download():
+                    download_panel.layout = Layout()
+                    download_panel.draw(bpy.context)
+
+                update_p50, update_p95 = measure(draw_update, self.args.repeat)
+                download_p50, download_p95 = measure(draw_download, self.args.repeat)
+                rows.append({
+                    "rigs": rigs, "libraries": libraries,
+                    "update_p50_ms": update_p50, "update_p95_ms": update_p95,
+                    "download_p50_ms": download_p50, "download_p95_ms": download_p95,
+                })
+        return rows
+
+    def scenario_catalog(self):
+        rows = []
+        rig_counts = [2, 200] if self.args.quick else [2, 200, 2000]
+        for rigs in rig_counts:
+            self.use_catalog(rigs)
+
+            started = time.perf_counter()
+            self.addon.load_rigs_database()
+            cold = (time.perf_counter() - started) * 1000
+
+            revalidate, _ = measure(self.addon.load_rigs_database, self.args.repeat)
+
+            def from_disk():
+                self.addon._catalog_caches.clear()
+                database = self.addon.load_rigs_database(max_age=3600)
+                for rig in database["rigs"]:
+                    database["rigs"][rig]
+            disk, _ = measure(from_disk, self.args.repeat)
+
+            rows.append({
+                "rigs": rigs,
+                "json_bytes": len(self.config.catalog_body),
+                "cold_ms": cold, "revalidate_ms": revalidate, "disk_open_ms": disk,
+            })
+        return rows
+
+    def scenario_download(self):
+        from pes.downloader import download_file
+
+        size = self.args.download_mb * 1024 * 1024
+        name = "PES_CHR_big_RIG_v01.blend"
+        self.config.sizes[name] = size
+        url = f"{self.server.url}/files/{name}"
+        target = os.path.join(self.workdir, name)
+        sha256 = file_sha256(name, size)
+
+        rows = []
+        cases = [("sem verificação", None, 0.0), ("com sha256", sha256, 0.0),
+                 ("com sha256, 20% de falhas", sha256, 0.2)]
+        for label, expected, fail_rate in cases:
+            self.config.fail_rate = fail_rate
+            if os.path.exists(target):
+                os.remove(target)
+            started = time.perf_counter()
+            download_file([url], target, expected, size)
+            seconds = time.perf_counter() - started
+            self.config.fail_rate = 0.0
+            rows.append({
+                "case": label, "mb": self.args.download_mb,
+                "seconds": seconds, "mb_per_s": self.args.download_mb / seconds,
+            })
+        os.remove(target)
+        return rows
+
+    def scenario_update(self):
+        rows = []
+        library_counts = [1, 10, 50] if self.args.quick else [1, 10, 100, 500]
+        for libraries in library_counts:
+            self.use_catalog(max(libraries, 2))
+            rig_dir = self.open_shot(libraries, max(libraries, 2), create_files=True)
+            for filename in os.listdir(rig_dir):
+                if "_v02" in filename:
+                    os.remove(os.path.join(rig_dir, filename))
+
+            operator_cls = self.addon.DOWNLOADRIG_OT_update
+            started = time.perf_counter()
+            failures = 0
+            for library in list(bpy.data.libraries):
+                operator = operator_cls()
+                operator.filepath = library.filepath
+                if operator.execute(bpy.context) != {'FINISHED'}:
+                    failures += 1
+            seconds = time.perf_counter() - started
+            rows.append({
+                "libraries": libraries, "seconds": seconds,
+                "per_library_ms": seconds * 1000 / libraries, "failures": failures,
+            })
+        return rows
+
+    def scenario_probe(self):
+        import requests
+        from pes.engine import probe
+
+        engine = self.addon.get_engine()
+        latency = self.config.latency
+        # Sem latência a diferença some: simula um servidor remoto
+        self.config.latency = latency or 0.05
+        rows = []
+        try:
+            for count in ([5, 20] if self.args.quick else [5, 20, 100]):
+                urls = [f"{self.server.url}/files/{rig_filename(i, 1)}" for i in range(count)]
+
+                started = time.perf_counter()
+                session = requests.Session()
+                for url in urls:
+                    session.head(url, timeout=10)
+                serial = time.perf_counter() - started
+
+                async def probe_all():
+                    import asyncio
+                    return await asyncio.gather(*(probe(url) for url in urls))
+
+                started = time.perf_counter()
+                results = engine.run(probe_all())
+                concurrent = time.perf_counter() - started
+                rows.append({
+                    "urls": count, "latency_ms": self.config.latency * 1000,
+                    "serial_ms": serial * 1000, "engine_ms": concurrent * 1000,
+                    "failures": sum(1 for elapsed, _ in results if elapsed is None),
+                })
+        finally:
+            self.config.latency = latency
+        return rows
+
+    def scenario_bandwidth(self):
+        import threading
+        from pes.bandwidth import mbps_to_rate
+
+        budget = self.addon.get_bandwidth_budget()
+        limit_mbps = 40.0
+        budget.configure(0, mbps_to_rate(limit_mbps))
+        size = (self.args.download_mb or 32) * 1024 * 1024
+        for name in ("PES_CHR_fg_RIG_v01.blend", "PES_CHR_bg_RIG_v01.blend"):
+            self.config.sizes[name] = size
+        rig_dir = os.path.join(self.workdir, "banda")
+
+        def fetch(name, background):
+            path = os.path.join(rig_dir, name)
+            if os.path.exists(path):
+                os.remove(path)
+            started = time.perf_counter()
+            self.addon.fetch_file([f"{self.server.url}/files/{name}"], path, background=background)
+            return time.perf_counter() - started
+
+        rows = []
+        foreground_alone = fetch("PES_CHR_fg_RIG_v01.blend", False)
+        rows.append({"case": "primeiro plano sozinho", "mb_per_s": size / 1048576 / foreground_alone,
+                     "seconds": foreground_alone})
+
+        # Segundo plano com o limite, medido por 2 s, e depois com um download em primeiro plano
+        bg_path = os.path.join(rig_dir, "PES_CHR_bg_RIG_v01.blend")
+        bg_thread = threading.Thread(target=fetch, args=("PES_CHR_bg_RIG_v01.blend", True))
+        store = self.addon.get_state_store()
+
+        def received():
+            # Progresso gravado pelo cliente (o servidor conta também o que está nos buffers do socket)
+            rows = [row for row in store.active_downloads() if row["path"] == bg_path]
+            return (rows[0]["received"] if rows else 0), time.perf_counter()
+
+        bg_thread.start()
+        time.sleep(1.0)
+        first, first_at = received()
+        time.sleep(3.0)
+        last, last_at = received()
+        rows.append({"case": f"segundo plano, limite {limit_mbps:.0f} Mbit/s",
+                     "mb_per_s": (last - first) / 1048576 / (last_at - first_at), "seconds": last_at - first_at})
+
+        foreground_shared = fetch("PES_CHR_fg_RIG_v01.blend", False)
+        rows.append({"case": "primeiro plano com segundo plano ativo",
+                     "mb_per_s": size / 1048576 / foreground_shared, "seconds": foreground_shared})
+
+        budget.configure(0, 0)
+        bg_thread.join()
+        if os.path.exists(bg_path):
+            os.remove(bg_path)
+        return rows
+
+    def scenario_bundle(self):
+        latency = self.config.latency
+        # Sem latência a diferença some: simula um servidor remoto
+        self.config.latency = latency or 0.05
+        rows = []
+        try:
+            for count in ([4, 12] if self.args.quick else [4, 12, 40]):
+                catalog = build_catalog(self.server.url, count, versions=1)
+                for rig in catalog["rigs"].values():
+                    name = rig["download_url"].rsplit('/', 1)[-1]
+                    size = self.config.size_of(name)
+                    rig["version_info"] = {"1": {"sha256": file_sha256(name, size), "size": size}}
+                names = [rig["download_url"].rsplit('/', 1)[-1] for rig in catalog["rigs"].values()]
+                self.config.bundles["elenco"] = names
+                catalog["bundles"] = {"elenco": {
+                    "url": f"{self.server.url}/bundles/elenco.tar",
+                    "rigs": {rig_id: 1 for rig_id in catalog["rigs"]},
+                }}
+                self.use_catalog(0)
+                self.config.set_catalog(catalog)
+                database = self.addon.load_rigs_database()
+                rig_dir = os.path.join(self.workdir, "pacote")
+                engine = self.addon.get_engine()
+
+                def separate():
+                    async def download_all():
+                        import asyncio
+                        return await asyncio.gather(*(
+                            engine.to_thread(self.addon.download_version, rig, 1, rig_dir)
+                            for rig in database["rigs"].values()
+                        ))
+                    engine.run(download_all())
+
+                def bundled():
+                    self.addon.download_bundle(database, "elenco", rig_dir)
+
+                for label, func in (("um a um", separate), ("pacote", bundled)):
+                    shutil.rmtree(rig_dir, ignore_errors=True)
+                    requests_before = self.config.requests
+                    started = time.perf_counter()
+                    func()
+                    seconds = time.perf_counter() - started
+                    rows.append({
+                        "rigs": count, "case": label, "requests": self.config.requests - requests_before,
+                        "ms": seconds * 1000, "files": len(os.listdir(rig_dir)),
+                    })
+        finally:
+            self.config.latency = latency
+        return rows
+
+
+    def scenario_hostname(self):
+        # Com nome de host a sondagem passa pelo getaddrinfo, que roda num executor
+        # do loop: com todos os downloads esperando sondagens, ele não pode ficar atrás deles
+        addon = self.addon
+        latency = self.config.latency
+        self.config.latency = latency or 0.05
+        rows = []
+        try:
+            for count in ([8] if self.args.quick else [8, 32]):
+                for host in ("127.0.0.1", "localhost"):
+                    catalog = build_catalog(self.server.url.replace("127.0.0.1", host), count, versions=1)
+                    # Um mirror por rig e nenhum tamanho no catálogo: todo download depende de sondagens
+                    for rig in catalog["rigs"].values():
+                        mirror = rig["download_url"].replace("/files/", "/redirect/")
+                        rig["version_info"] = {"1": {"mirrors": [mirror]}}
+                    self.use_catalog(0)
+                    self.config.set_catalog(catalog)
+                    versions = [(rig, 1) for rig in addon.load_rigs_database()["rigs"].values()]
+                    rig_dir = os.path.join(self.workdir, "hostname")
+
+                    for case, probe_first in (("sondado antes", True), ("sondado nas threads", False)):
+                        shutil.rmtree(rig_dir, ignore_errors=True)
+                        started = time.perf_counter()
+                        settings = addon.get_download_settings()
+                        if probe_first:
+                            addon.probe_downloads(settings, [addon.get_version_job(rig, version, rig_dir)
+                                                             for rig, version in versions])
+                        addon.run_in_threads([
+                            functools.partial(addon.download_version, rig, version, rig_dir, settings=settings)
+                            for rig, version in versions
+                        ])
+                        rows.append({
+                            "rigs": count, "host": host, "case": case,
+                            "ms": (time.perf_counter() - started) * 1000, "files": len(os.listdir(rig_dir)),
+                        })
+        finally:
+            self.config.latency = latency
+        return rows
+
+
+def print_table(title, rows):
+    if not rows:
+        return
+    print(f"\n{title}")
+    columns = list(rows[0])
+    cells = [[f"{row[c]:.2f}" if isinstance(row[c], float) else str(row[c]) for c in columns] for row in rows]
+    widths = [max(len(c), *(len(r[i]) for r in cells)) for i, c in enumerate(columns)]
+    print("  ".join(c.rjust(w) for c, w in zip(columns, widths)))
+    for row in cells:
+        print("  ".join(value.rjust(w) for value, w in zip(row, widths)))
+
+
+SCENARIOS = ("draw", "catalog", "download", "update", "probe", "bandwidth", "bundle", "hostname")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks do PeS com bpy simulado e servidor local")
+    parser.add_argument("--scenario", choices=SCENARIOS + ("all",), default="all")
+    parser.add_argument("--quick", action="store_true", help="Cenários menores, para rodar em segundos")
+    parser.add_argument("--repeat", type=int, default=20, help="Repetições das medições curtas")
+    parser.add_argument("--latency", type=float, default=0.0, help="Latência do servidor por pedido (s)")
+    parser.add_argument("--bandwidth-mbps", type=float, default=0.0, help="Banda do servidor (0 = sem limite)")
+    parser.add_argument("--no-range", action="store_true", help="Servidor sem suporte a Range")
+    parser.add_argument("--download-mb", type=int, default=None, help="Tamanho do rig grande (padrão 300, 32 com --quick)")
+    parser.add_argument("--rig-kb", type=int, default=256, help="Tamanho dos rigs do cenário de update")
+    parser.add_argument("--json", help="Grava os resultados neste arquivo")
+    parser.add_argument("--keep", action="store_true", help="Mantém a pasta temporária do benchmark")
+    args = parser.parse_args(argv)
+    if args.download_mb is None:
+        args.download_mb = 32 if args.quick else 300
+
+    bench = Bench(args)
+    try:
+        print(
+            f"Import: {bench.startup['import_ms']:.1f} ms, register: {bench.startup['register_ms']:.2f} ms, "
+            f"requests carregado no register: {bench.startup['requests_loaded_at_register']}"
+        )
+        scenarios = SCENARIOS if args.scenario == "all" else (args.scenario,)
+        for name in scenarios:
+            rows = getattr(bench, f"scenario_{name}")()
+            bench.results[name] = rows
+            print_table(name, rows)
+    finally:
+        bench.close()
+
+    if args.json:
+        with open(args.json, 'w', encoding="utf-8") as f:
+            json.dump(bench.results, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
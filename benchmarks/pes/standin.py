@@ -0,0 +1,347 @@
+"""Servidor HTTP local que substitui GitHub Pages e Dropbox nos benchmarks
+
+Serve um rigs.json gerado e arquivos de rig sintéticos de qualquer tamanho,
+criados sob demanda (nada é gravado em disco), além de pacotes .tar com
+vários deles. Latência por pedido, banda, suporte a Range, redirects e
+falhas 503 são configuráveis.
+
+Uso avulso:
+    python standin.py --rigs 20 --size-mb 300 --latency 0.05 --bandwidth-mbps 100
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import random
+import re
+import tarfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PATTERN_SIZE = 1024 * 1024
+WRITE_CHUNK = 256 * 1024
+FILE_RE = re.compile(r'^/files/(?P<name>[^/?]+)$')
+REDIRECT_RE = re.compile(r'^/redirect/(?P<name>[^/?]+)$')
+BUNDLE_RE = re.compile(r'^/bundles/(?P<name>[^/?]+)\.tar$')
+
+
+def rig_id(index):
+    return f"PES_CHR_r{index:04d}_RIG"
+
+
+def rig_filename(index, version):
+    return f"{rig_id(index)}_v{version:02d}.blend"
+
+
+def build_catalog(base_url, rigs, versions=2, redirect=False):
+    """Catálogo com `rigs` rigs de `versions` versões cada"""
+    route = "redirect" if redirect else "files"
+    catalog = {"rigs": {}}
+    for index in range(rigs):
+        urls = {
+            str(version): f"{base_url}/{route}/{rig_filename(index, version)}"
+            for version in range(versions, 0, -1)
+        }
+        catalog["rigs"][rig_id(index)] = {
+            "latest_version": versions,
+            "download_url": urls[str(versions)],
+            "description": f"Rig sintético {index}",
+            "versions": urls,
+        }
+    return catalog
+
+
+class StandInConfig:
+    """Parâmetros do servidor, alteráveis entre cenários"""
+
+    def __init__(self, latency=0.0, bandwidth=0, ranges=True, fail_rate=0.0,
+                 file_size=1024 * 1024, seed=0):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.ranges = ranges
+        self.fail_rate = fail_rate
+        self.file_size = file_size
+        self.sizes = {}
+        # nome do pacote -> nomes dos arquivos
+        self.bundles = {}
+        self.random = random.Random(seed)
+        self.catalog_body = b"{}"
+        self.catalog_etag = '"0"'
+        self.requests = 0
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+
+    def set_catalog(self, catalog):
+        self.catalog_body = json.dumps(catalog).encode("utf-8")
+        self.catalog_etag = '"%s"' % hashlib.sha1(self.catalog_body).hexdigest()[:16]
+
+    def size_of(self, name):
+        return self.sizes.get(name, self.file_size)
+
+
+_patterns = {}
+_patterns_lock = threading.Lock()
+
+
+def file_pattern(name):
+    """Bloco de 1 MB que se repete ao longo do arquivo sintético `name`"""
+    with _patterns_lock:
+        pattern = _patterns.get(name)
+        if pattern is None:
+            seed = hashlib.sha256(name.encode("utf-8")).digest()
+            pattern = _patterns[name] = random.Random(seed).randbytes(PATTERN_SIZE)
+    return pattern
+
+
+def file_bytes(name, start, end):
+    """Bytes [start, end) do arquivo sintético"""
+    pattern = file_pattern(name)
+    out = bytearray()
+    pos = start
+    while pos < end:
+        offset = pos % PATTERN_SIZE
+        take = min(PATTERN_SIZE - offset, end - pos)
+        out += pattern[offset:offset + take]
+        pos += take
+    return bytes(out)
+
+
+def file_sha256(name, size):
+    """sha256 do arquivo sintético inteiro"""
+    hasher = hashlib.sha256()
+    for start in range(0, size, PATTERN_SIZE):
+        hasher.update(file_bytes(name, start, min(start + PATTERN_SIZE, size)))
+    return hasher.hexdigest()
+
+
+def bundle_layout(config, names):
+    """Cabeçalhos tar de cada membro do pacote e o tamanho total do .tar"""
+    members = []
+    total = 2 * tarfile.BLOCKSIZE
+    for name in names:
+        info = tarfile.TarInfo(name)
+        info.size = config.size_of(name)
+        header = info.tobuf()
+        members.append((header, name, info.size))
+        total += len(header) + info.size + (-info.size % tarfile.BLOCKSIZE)
+    return members, total
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Cabeçalho e corpo saem em escritas separadas; sem isso o ACK atrasado soma ~40 ms
+    disable_nagle_algorithm = True
+    config = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_body(self, body):
+        config = self.config
+        sent = 0
+        started = time.perf_counter()
+        view = memoryview(body)
+        while sent < len(view):
+            chunk = view[sent:sent + WRITE_CHUNK]
+            self.wfile.write(chunk)
+            sent += len(chunk)
+            if config.bandwidth:
+                ahead = sent / config.bandwidth - (time.perf_counter() - started)
+                if ahead > 0:
+                    time.sleep(ahead)
+        with config.lock:
+            config.bytes_sent += sent
+
+    def _stream_file(self, name, start, end):
+        config = self.config
+        # Fatias do bloco que se repete, sem copiar: o servidor não deve ser o gargalo
+        pattern = memoryview(file_pattern(name))
+        started = time.perf_counter()
+        sent = 0
+        pos = start
+        while pos < end:
+            offset = pos % PATTERN_SIZE
+            chunk = pattern[offset:offset + min(WRITE_CHUNK, PATTERN_SIZE - offset, end - pos)]
+            self.wfile.write(chunk)
+            pos += len(chunk)
+            sent += len(chunk)
+            # Contado a cada pedaço para medir a vazão durante a transferência
+            with config.lock:
+                config.bytes_sent += len(chunk)
+            if config.bandwidth:
+                ahead = sent / config.bandwidth - (time.perf_counter() - started)
+                if ahead > 0:
+                    time.sleep(ahead)
+
+    def _status(self, code, headers=()):
+        self.send_response(code)
+        for key, value in headers:
+            self.send_header(key, value)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_HEAD(self):
+        self._handle(head=True)
+
+    def do_GET(self):
+        self._handle(head=False)
+
+    def _handle(self, head):
+        config = self.config
+        with config.lock:
+            config.requests += 1
+            failed = config.fail_rate and config.random.random() < config.fail_rate
+        if config.latency:
+            time.sleep(config.latency)
+        if failed:
+            self._status(503, [("Retry-After", "0")])
+            return
+
+        path = self.path.split('?')[0]
+        if path == "/rigs.json":
+            self._catalog(head)
+            return
+
+        match = REDIRECT_RE.match(path)
+        if match:
+            self._status(302, [("Location", f"/files/{match.group('name')}"),
+                               ("Cache-Control", "max-age=600")])
+            return
+
+        match = BUNDLE_RE.match(path)
+        if match and match.group("name") in config.bundles:
+            self._bundle(config.bundles[match.group("name")], head)
+            return
+
+        match = FILE_RE.match(path)
+        if not match:
+            self._status(404)
+            return
+        self._file(match.group("name"), head)
+
+    def _bundle(self, names, head):
+        members, total = bundle_layout(self.config, names)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-tar")
+        self.send_header("Content-Length", str(total))
+        self.end_headers()
+        if head:
+            return
+        for header, name, size in members:
+            self.wfile.write(header)
+            self._stream_file(name, 0, size)
+            self.wfile.write(bytes(-size % tarfile.BLOCKSIZE))
+        self.wfile.write(bytes(2 * tarfile.BLOCKSIZE))
+
+    def _catalog(self, head):
+        config = self.config
+        if self.headers.get("If-None-Match") == config.catalog_etag:
+            self._status(304, [("ETag", config.catalog_etag)])
+            return
+        body = config.catalog_body
+        gzipped = "gzip" in self.headers.get("Accept-Encoding", "")
+        if gzipped:
+            body = gzip.compress(body, compresslevel=6)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", config.catalog_etag)
+        if gzipped:
+            self.send_header("Content-Encoding", "gzip")
+        self.end_headers()
+        if not head:
+            self._send_body(body)
+
+    def _file(self, name, head):
+        config = self.config
+        size = config.size_of(name)
+        start, end = 0, size
+        status = 200
+        range_header = self.headers.get("Range")
+        if range_header and config.ranges:
+            match = re.fullmatch(r'bytes=(\d+)-(\d*)', range_header.strip())
+            if match:
+                start = int(match.group(1))
+                end = min(int(match.group(2)) + 1, size) if match.group(2) else size
+                if start >= size or start >= end:
+                    self._status(416, [("Content-Range", f"bytes */{size}")])
+                    return
+                status = 206
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(end - start))
+        if config.ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end - 1}/{size}")
+        self.end_headers()
+        if not head:
+            self._stream_file(name, start, end)
+
+
+class StandInServer:
+    """Servidor em uma thread de fundo; url é a base para o catálogo e arquivos"""
+
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        self.config = config or StandInConfig()
+        handler = type("Handler", (StandInHandler,), {"config": self.config})
+        # A fila padrão (5) derruba conexões simultâneas e o cliente espera 1 s pelo SYN repetido
+        server_cls = type("Server", (ThreadingHTTPServer,), {"request_queue_size": 128})
+        self.httpd = server_cls((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://{host}:{self.httpd.server_address[1]}"
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor local de catálogo e rigs sintéticos")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument("--rigs", type=int, default=2)
+    parser.add_argument("--versions", type=int, default=2)
+    parser.add_argument("--size-mb", type=float, default=1.0, help="Tamanho dos arquivos de rig")
+    parser.add_argument("--latency", type=float, default=0.0, help="Segundos de espera por pedido")
+    parser.add_argument("--bandwidth-mbps", type=float, default=0.0, help="Limite de banda (0 = sem limite)")
+    parser.add_argument("--no-range", action="store_true", help="Ignora o cabeçalho Range")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fração de pedidos que recebem 503")
+    parser.add_argument("--redirect", action="store_true", help="URLs do catálogo passam por um 302")
+    args = parser.parse_args(argv)
+
+    config = StandInConfig(
+        latency=args.latency,
+        bandwidth=args.bandwidth_mbps * 1e6 / 8,
+        ranges=not args.no_range,
+        fail_rate=args.fail_rate,
+        file_size=int(args.size_mb * 1024 * 1024),
+    )
+    server = StandInServer(config, args.host, args.port)
+    config.set_catalog(build_catalog(server.url, args.rigs, args.versions, args.redirect))
+    print(f"Catálogo em {server.url}/rigs.json")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -9,27 +9,169 @@ bl_info = {
     "category": "Import",
 }
 
+import time
+_import_started = time.perf_counter()
+
 import bpy
+import functools
 import os
-import requests
-from bpy.types import Panel, Operator
-from bpy.props import StringProperty
+import re
+import urllib.parse
+from bpy.types import Panel, Operator, AddonPreferences, PropertyGroup
+from mathutils import Vector
+from bpy.app.handlers import persistent
+from bpy.props import (
+    StringProperty, BoolProperty, IntProperty, FloatProperty, FloatVectorProperty, EnumProperty,
+    CollectionProperty,
+)
+
+# Rede, banco local e catálogo são importados só no primeiro uso: o Blender
+# (inclusive renders no farm) não paga por requests/sqlite3 só por carregar o PeS
+from .timing import span, timed, timed_method, timings
 
 # URL do arquivo JSON que contém as informações dos rigs
 JSON_URL = "https://igormunizart.github.io/HIA/pes/rigs.json"
+# Segundos em que os painéis reaproveitam o catálogo sem consultar a rede
+CATALOG_TTL = 60
+# Intervalo mínimo entre gravações do progresso de um download no estado local
+PROGRESS_INTERVAL = 0.5
+# Downloads simultâneos ao importar vários rigs de uma vez
+MAX_PARALLEL_DOWNLOADS = 4
+# Rigs usados há menos tempo que isso (segundos) nunca são apagados para liberar espaço
+EVICT_MIN_IDLE = 3 * 24 * 3600
+# Fração mínima de arquivos faltando para pedir o pacote inteiro em vez de cada rig
+BUNDLE_MIN_MISSING = 0.5
+# Intervalo (segundos) entre as conferências da pasta de rigs por versões novas
+RIG_FOLDER_POLL = 2.0
+# Collection da cena que guarda os empties de instância criados pelo PeS
+INSTANCE_COLLECTION = "PeS_Instancias"
+
+# Nome de arquivo de rig: <base>_v<versão>[_<variante>].blend
+RIG_FILENAME_RE = re.compile(r'^(?P<base>.*)_v(?P<version>\d+)(?:_(?P<variant>[A-Za-z0-9]+))?(?:\..*)?$')
+
+INSTANCE_DISPLAY_ITEMS = [
+    ('TEXTURED', "Texturizado", "Mostra as instâncias com material"),
+    ('SOLID', "Sólido", "Mostra as instâncias em modo sólido"),
+    ('WIRE', "Wireframe", "Mostra as instâncias em wireframe"),
+    ('BOUNDS', "Caixa", "Mostra só a caixa envolvente (mais leve)"),
+]
+
+def get_preferences():
+    """Retorna as preferências do add-on, ou None se ele não estiver registrado"""
+    addon = bpy.context.preferences.addons.get(__package__)
+    return addon.preferences if addon else None
+
+def get_cache_server():
+    """Endereço do cache da rede local configurado nas preferências"""
+    prefs = get_preferences()
+    if prefs and prefs.cache_server.strip():
+        return prefs.cache_server.strip().rstrip('/')
+    return None
+
+def get_cached_url(route, url, sha256=None, server=None):
+    """Monta a URL equivalente servida pelo cache da rede local"""
+    query = {"url": url}
+    if sha256:
+        query["sha256"] = sha256
+    return f"{server or get_cache_server()}/{route}?{urllib.parse.urlencode(query)}"
+
+def get_catalog_url():
+    """URL de origem do catálogo: a das preferências ou a padrão do projeto"""
+    prefs = get_preferences()
+    if prefs and prefs.catalog_url.strip():
+        return prefs.catalog_url.strip()
+    return JSON_URL
+
+def get_catalog_urls(catalog_url=None):
+    """URLs do catálogo em ordem de preferência: cache local e depois a origem"""
+    catalog_url = catalog_url or get_catalog_url()
+    if get_cache_server():
+        return [get_cached_url("catalog", catalog_url), catalog_url]
+    return [catalog_url]
 
 def get_version_from_filename(filename):
     """Extrai o número da versão e nome base do arquivo"""
-    try:
-        parts = filename.rsplit('_v', 1)
-        if len(parts) == 2:
-            base_name = parts[0]
-            version = int(parts[1].split('.')[0])
-            return base_name, version
-    except:
-        pass
+    match = RIG_FILENAME_RE.match(filename)
+    if match:
+        return match.group("base"), int(match.group("version"))
     return filename, 0
 
+def get_variant_from_filename(filename):
+    """Extrai a variante leve do arquivo (ex.: 'proxy'), ou '' para o rig completo"""
+    match = RIG_FILENAME_RE.match(filename)
+    if match and match.group("variant"):
+        return match.group("variant")
+    return ""
+
+def get_full_rig_filename(filename):
+    """Nome do arquivo do rig completo correspondente a uma variante"""
+    variant = get_variant_from_filename(filename)
+    if not variant:
+        return filename
+    return re.sub(rf'_{re.escape(variant)}(\.[^.]*)?$', r'\1', filename)
+
+def find_rig(database, filename):
+    """Procura no catálogo o rig correspondente a um arquivo e retorna (rig_id, rig_data)"""
+    base_name, _ = get_version_from_filename(os.path.basename(filename))
+    for rig_id, rig_data in database["rigs"].items():
+        if rig_id in base_name:
+            return rig_id, rig_data
+    return None, None
+
+def get_collection_name(rig_id):
+    """Nome da collection principal de um rig (ex.: chr.poba_rig)"""
+    return f"chr.{rig_id.split('_')[-2].lower()}_rig"
+
+def get_selected_rigs(context, database):
+    """Rigs marcados para importação em lote no painel que ainda estão no catálogo"""
+    return [item.rig_id for item in context.window_manager.pes_selected_rigs if item.rig_id in database["rigs"]]
+
+def find_linked_collection(collection_name):
+    """Procura uma collection já linkada de alguma biblioteca"""
+    for collection in bpy.data.collections:
+        if collection.name == collection_name and collection.library is not None:
+            return collection
+    return None
+
+def get_instance_objects(rig_id):
+    """Empties de instância criados pelo PeS para um rig"""
+    return [
+        obj for obj in bpy.data.objects
+        if obj.get("pes_rig_id") == rig_id and obj.instance_type == 'COLLECTION'
+    ]
+
+def get_instances_collection(scene):
+    """Collection onde ficam os empties de instância, criada sob demanda"""
+    collection = bpy.data.collections.get(INSTANCE_COLLECTION)
+    if collection is None or collection.library is not None:
+        collection = bpy.data.collections.new(INSTANCE_COLLECTION)
+    if collection.name not in scene.collection.children:
+        scene.collection.children.link(collection)
+    return collection
+
+def get_instance_source(rig_id, collections):
+    """Collection que os empties de instância do rig instanciam
+
+    Com uma só collection é ela mesma; com várias (link_collections do
+    catálogo), uma collection local que reúne todas, criada sob demanda.
+    """
+    if len(collections) == 1:
+        return collections[0]
+    name = f"PeS_{rig_id}"
+    source = bpy.data.collections.get(name)
+    if source is None or source.library is not None:
+        source = bpy.data.collections.new(name)
+    for collection in collections:
+        if collection.name not in source.children:
+            source.children.link(collection)
+    return source
+
+def update_instance_display(self, context):
+    """Aplica o modo de exibição escolhido no painel a todas as instâncias"""
+    for obj in bpy.data.objects:
+        if "pes_rig_id" in obj and obj.instance_type == 'COLLECTION':
+            obj.display_type = self.pes_instance_display
+
 def get_download_path():
     """Retorna o caminho para download baseado no arquivo .blend atual"""
     current_blend = bpy.data.filepath
@@ -38,15 +180,877 @@ def get_download_path():
     parent_dir = os.path.dirname(os.path.dirname(current_blend))
     return os.path.join(parent_dir, "0_IN", "3_RIGs")
 
-def load_rigs_database():
-    """Carrega o banco de dados de rigs do JSON"""
+_catalog_caches = {}
+_state_store = None
+_engine = None
+_bandwidth = None
+_catalog_refreshing = set()
+_rig_folder_index = None
+_rig_folder_refreshing = False
+# (rigs do catálogo, geração do índice local, catálogo combinado)
+_merged_catalog = (None, None, None)
+# (catálogos de cada origem, catálogo combinado)
+_federated_catalog = (None, None)
+
+def get_user_cache_dir():
+    """Pasta de dados do usuário onde o PeS guarda seus caches"""
+    try:
+        return bpy.utils.extension_path_user(__package__, path="cache", create=True)
+    except ValueError:
+        # Carregado como add-on legado, fora do sistema de extensões
+        return bpy.utils.user_resource('CONFIG', path=os.path.join("pes", "cache"), create=True)
+
+def get_state_store():
+    """Banco local com revisões do catálogo, arquivos baixados e uso"""
+    global _state_store
+    if _state_store is None:
+        from .state import StateStore
+        _state_store = StateStore(os.path.join(get_user_cache_dir(), "state.sqlite3"))
+    return _state_store
+
+def get_engine():
+    """Loop de rede em segundo plano, iniciado no primeiro uso"""
+    global _engine
+    if _engine is None:
+        from .engine import NetworkEngine
+        _engine = NetworkEngine(max_blocking=MAX_PARALLEL_DOWNLOADS)
+    return _engine
+
+def get_bandwidth_budget():
+    """Limites de banda de primeiro e segundo plano, lidos das preferências no primeiro uso"""
+    global _bandwidth
+    if _bandwidth is None:
+        from .bandwidth import BandwidthBudget
+        _bandwidth = BandwidthBudget()
+        prefs = get_preferences()
+        if prefs:
+            apply_bandwidth_limits(prefs)
+    return _bandwidth
+
+class DownloadSettings:
+    """O que os downloads precisam do Blender, lido na thread principal
+
+    Downloads rodam em threads do loop de rede, que não podem tocar no
+    bpy.context nem no bpy.data: preferências e caminhos chegam prontos aqui.
+    """
+
+    def __init__(self, cache_server=None, budget=None, linked=frozenset()):
+        self.cache_server = cache_server
+        self.budget = budget
+        # Bibliotecas do arquivo aberto, que a limpeza da pasta de rigs não apaga
+        self.linked = linked
+        # URL -> (latência ou None, Content-Length ou None), de probe_downloads
+        self.probes = {}
+
+def get_linked_library_paths():
+    """Caminhos absolutos normalizados das bibliotecas do arquivo aberto"""
+    return frozenset(
+        os.path.normcase(os.path.abspath(bpy.path.abspath(lib.filepath)))
+        for lib in bpy.data.libraries if lib.filepath
+    )
+
+def get_download_settings():
+    """DownloadSettings das preferências e bibliotecas atuais; só na thread principal"""
+    return DownloadSettings(get_cache_server(), get_bandwidth_budget(), get_linked_library_paths())
+
+def apply_bandwidth_limits(prefs):
+    """Aplica aos downloads os limites de banda das preferências"""
+    from .bandwidth import mbps_to_rate
+    get_bandwidth_budget().configure(
+        mbps_to_rate(prefs.foreground_limit), mbps_to_rate(prefs.background_limit)
+    )
+
+def _dispatch_network_completions():
+    """Timer da thread principal que entrega ao Blender os resultados do loop de rede"""
+    if _engine is None:
+        return None
+    _engine.dispatch_completions()
+    return 0.1 if _engine.pending_callbacks else None
+
+def run_in_background(coro, callback):
+    """Roda a corrotina no loop de rede e chama callback(future) na thread principal"""
+    get_engine().submit(coro, callback)
+    if not bpy.app.timers.is_registered(_dispatch_network_completions):
+        bpy.app.timers.register(_dispatch_network_completions, first_interval=0.05)
+
+def run_in_threads(calls, return_exceptions=False):
+    """Roda as funções sem argumentos (ex.: functools.partial) juntas no executor do loop de rede
+
+    Espera todas e retorna os resultados na ordem de calls; só na thread
+    principal, nunca de dentro de um trabalho do loop.
+    """
+    import asyncio
+    engine = get_engine()
+
+    async def run_all():
+        return await asyncio.gather(*(engine.to_thread(call) for call in calls),
+                                    return_exceptions=return_exceptions)
+
+    return engine.run(run_all())
+
+def tag_redraw_pes_panels():
+    """Pede o redesenho das viewports 3D, onde ficam os painéis do PeS"""
+    window_manager = bpy.context.window_manager
+    for window in getattr(window_manager, "windows", ()):
+        for area in window.screen.areas:
+            if area.type == 'VIEW_3D':
+                area.tag_redraw()
+
+def get_catalog_cache(catalog_url=None):
+    """Cache em memória e em disco de um catálogo (por padrão, o principal)"""
+    catalog_url = catalog_url or get_catalog_url()
+    cache = _catalog_caches.get(catalog_url)
+    if cache is None:
+        from .catalog import CatalogCache, catalog_cache_filename
+        path = os.path.join(get_user_cache_dir(), catalog_cache_filename(catalog_url))
+        cache = _catalog_caches[catalog_url] = CatalogCache(path, get_state_store())
+    return cache
+
+@timed("catalog")
+def load_rigs_database(max_age=0, background=False):
+    """Carrega o banco de dados de rigs do JSON
+
+    Reaproveita a cópia em memória por até max_age segundos; depois disso
+    revalida com um pedido condicional (ETag) e, sem rede, usa a cópia em disco.
+    Com background, uma cópia vencida é devolvida na hora e a revalidação
+    acontece no loop de rede, redesenhando os painéis quando terminar.
+    """
+    sources = get_catalog_sources()
+    if background and any(cache.current() is not None for cache, _, _ in sources):
+        for cache, urls, ttl in sources:
+            if not cache.is_fresh(max_age and ttl):
+                refresh_catalog_in_background(cache, urls)
+        return merge_local_rigs(merge_catalog_sources(sources))
+    stale = [source for source in sources if not source[0].is_fresh(max_age and source[2])]
+    if len(stale) == 1:
+        cache, urls, ttl = stale[0]
+        cache.load(urls, max_age and ttl)
+    elif stale:
+        get_engine().run(refresh_catalog_sources(stale, max_age))
+    return merge_local_rigs(merge_catalog_sources(sources))
+
+def get_catalog_sources():
+    """Origens do catálogo em ordem de prioridade: [(cache, urls, ttl)]
+
+    O catálogo principal tem prioridade 0 e vence os empates; os catálogos
+    extras das preferências entram pela prioridade de cada um.
+    """
+    entries = [(0, get_catalog_url(), CATALOG_TTL)]
+    prefs = get_preferences()
+    for source in (prefs.extra_catalogs if prefs else ()):
+        url = source.url.strip()
+        if source.enabled and url and url not in (entry[1] for entry in entries):
+            # TTL 0 nunca fica fresco: cada redesenho revalidaria de novo
+            entries.append((source.priority, url, max(1, source.ttl)))
+    entries.sort(key=lambda entry: -entry[0])
+    return [(get_catalog_cache(url), get_catalog_urls(url), ttl) for _, url, ttl in entries]
+
+async def refresh_catalog_sources(sources, max_age=0):
+    """Revalida ao mesmo tempo, no loop de rede, as origens com mais que o TTL
+
+    Com max_age 0 todas são revalidadas; senão vale o TTL de cada origem.
+    """
+    import asyncio
+    engine = get_engine()
+    await asyncio.gather(*(
+        engine.to_thread(cache.load, urls, max_age and ttl)
+        for cache, urls, ttl in sources if not cache.is_fresh(max_age and ttl)
+    ))
+
+def merge_catalog_sources(sources):
+    """Catálogo combinado das origens, refeito só quando alguma delas muda"""
+    global _federated_catalog
+    catalogs = tuple(cache.current() for cache, _, _ in sources)
+    cached, merged = _federated_catalog
+    if cached is None or len(cached) != len(catalogs) or \
+            any(old is not new for old, new in zip(cached, catalogs)):
+        from .catalog import merge_catalogs
+        merged = merge_catalogs(catalogs)
+        _federated_catalog = (catalogs, merged)
+    return merged
+
+def refresh_catalog_in_background(cache, urls):
+    """Revalida o catálogo fora da thread principal (uma revalidação por vez)"""
+    if cache in _catalog_refreshing:
+        return
+    _catalog_refreshing.add(cache)
+
+    previous = cache.current()
+
+    def finished(future):
+        _catalog_refreshing.discard(cache)
+        # Um 304 devolve a mesma cópia: redesenhar só pediria outra revalidação
+        if future.exception() is None and future.result() is not previous:
+            tag_redraw_pes_panels()
+
+    run_in_background(get_engine().to_thread(cache.load, urls, 0), finished)
+
+def parse_rig_filename(filename):
+    """(rig_id, versão) de um arquivo de rig completo na pasta de rigs, ou None
+
+    Só nomes de rig publicados (PES_CHR_<nome>_RIG_vNN.blend) contam: a pasta
+    também guarda texturas e bibliotecas de dependência.
+    """
+    from .publish import PUBLISH_FILENAME_RE
+    match = PUBLISH_FILENAME_RE.match(filename)
+    if match is None or match.group("variant"):
+        return None
+    version = int(match.group("version"))
+    return (match.group("base"), version) if version else None
+
+def get_rig_folder_index():
+    """Índice da pasta de rigs do arquivo aberto, atualizado por um timer em segundo plano"""
+    global _rig_folder_index
+    download_dir = get_download_path()
+    if bpy.app.background or not download_dir:
+        return None
+    if _rig_folder_index is None or _rig_folder_index.directory != download_dir:
+        from .watcher import RigFolderIndex
+        if _rig_folder_index is not None:
+            _rig_folder_index.close()
+        _rig_folder_index = RigFolderIndex(download_dir, parse_rig_filename)
+    if not bpy.app.timers.is_registered(_poll_rig_folder):
+        bpy.app.timers.register(_poll_rig_folder, first_interval=0.0)
+    return _rig_folder_index
+
+def _poll_rig_folder():
+    """Timer que confere a pasta de rigs no loop de rede e redesenha os painéis se ela mudar"""
+    global _rig_folder_refreshing
+    index = _rig_folder_index
+    if index is None:
+        return None
+    if not _rig_folder_refreshing:
+        _rig_folder_refreshing = True
+
+        def finished(future):
+            global _rig_folder_refreshing
+            _rig_folder_refreshing = False
+            if future.exception() is not None:
+                print(f"PeS: erro ao conferir a pasta de rigs: {future.exception()}")
+            elif future.result():
+                tag_redraw_pes_panels()
+
+        run_in_background(get_engine().to_thread(index.refresh), finished)
+    return RIG_FOLDER_POLL
+
+def merge_local_rigs(database):
+    """Catálogo com as versões deixadas direto na pasta de rigs, que ele não conhece"""
+    global _merged_catalog
+    index = get_rig_folder_index()
+    if index is None:
+        return database
+    cached_rigs, generation, merged = _merged_catalog
+    if cached_rigs is not database["rigs"] or generation != index.generation:
+        from .watcher import merge_local_versions
+        merged = merge_local_versions(database, index.versions())
+        _merged_catalog = (database["rigs"], index.generation, merged)
+    return merged
+
+def get_version_info(rig_data, version):
+    """Retorna os metadados opcionais de uma versão do rig (mirrors, etc.)"""
+    return rig_data.get("version_info", {}).get(str(version), {})
+
+def get_version_urls(rig_data, version, download_url=None):
+    """Lista as URLs de uma versão: a URL principal seguida dos mirrors"""
+    if download_url is None:
+        download_url = rig_data.get("versions", {}).get(str(version), rig_data["download_url"])
+    urls = [download_url]
+    for mirror in get_version_info(rig_data, version).get("mirrors", []):
+        if mirror not in urls:
+            urls.append(mirror)
+    return urls
+
+def get_version_filepath(rig_data, version, download_dir):
+    """Onde uma versão fica (ou ficará) na pasta de rigs"""
+    from .downloader import get_filename_from_url
+    local_path = get_version_info(rig_data, version).get("local_path")
+    if local_path:
+        return local_path
+    return os.path.join(download_dir, get_filename_from_url(get_version_urls(rig_data, version)[0]))
+
+def get_variant_urls(rig_data, version, variant):
+    """URLs de uma variante da versão; sem variante (ou inexistente), as do rig completo"""
+    variants = get_version_info(rig_data, version).get("variants", {})
+    if variant and variant in variants:
+        return [variants[variant]]
+    return get_version_urls(rig_data, version)
+
+def get_link_collections(rig_id, rig_data, version):
+    """Collections a linkar: as declaradas no catálogo ou a convenção chr.<nome>_rig"""
+    declared = get_version_info(rig_data, version).get("link_collections")
+    return list(declared) if declared else [get_collection_name(rig_id)]
+
+def check_version_requirements(rig_id, rig_data, version, link=False):
+    """Valida os metadados da versão antes do download; retorna a mensagem de erro ou None"""
+    info = get_version_info(rig_data, version)
+
+    blender_min = info.get("blender_min")
+    if blender_min:
+        required = tuple(int(part) for part in str(blender_min).split('.'))
+        if tuple(bpy.app.version) < required:
+            current = '.'.join(str(part) for part in bpy.app.version)
+            return f"A v{version} requer Blender {blender_min} (atual: {current})"
+
+    if link and info.get("collections"):
+        missing = [name for name in get_link_collections(rig_id, rig_data, version)
+                   if name not in info["collections"]]
+        if missing:
+            return (
+                f"Collection {', '.join(missing)} não existe na v{version} "
+                f"(disponíveis: {', '.join(info['collections'])})"
+            )
+    return None
+
+def fetch_file(urls, filepath, sha256=None, overwrite=True, chunk_index=None, base_files=(), size=None,
+               background=False, settings=None):
+    """Baixa urls para filepath e retorna o caminho do arquivo
+
+    O download é feito sob uma trava em arquivo: se outro processo já estiver
+    baixando o mesmo rig, espera por ele e reaproveita o arquivo pronto.
+    Com chunk_index e versões locais em base_files, tenta antes a atualização
+    incremental e só baixa o arquivo inteiro se ela não for possível.
+    Com background, usa o orçamento de banda do segundo plano, que cede
+    lugar aos downloads pedidos pelo artista. Fora da thread principal,
+    settings (de get_download_settings) é obrigatório.
+    """
+    from .delta import DeltaError, delta_download
+    from .diskspace import reserve_space
+    from .downloader import DownloadError, download_file, get_part_path
+    from .locks import FileLock
+
+    settings = settings or get_download_settings()
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    origin_urls = list(urls)
+    if settings.cache_server:
+        urls = [get_cached_url("fetch", urls[0], sha256, settings.cache_server)] + origin_urls
+
+    with FileLock(filepath) as lock:
+        if os.path.exists(filepath) and (lock.waited or not overwrite):
+            record_file_use(filepath)
+            return filepath
+
+        # Sem espaço o download falha aqui, antes de transferir qualquer byte
+        download_dir = os.path.dirname(filepath)
+
+        evict = functools.partial(evict_rig_cache, download_dir, linked=settings.linked)
+
+        # O HEAD vai à origem: o cache da rede local começaria a transferência inteira
+        with reserve_space(download_dir, size or get_expected_size(origin_urls, settings), get_part_path(filepath),
+                           evict):
+            store = get_state_store()
+            record_state(store.start_download, filepath, urls[-1], size)
+            try:
+                with settings.budget.transfer(background) as throttle:
+                    progress = _progress_recorder(store, filepath)
+                    if chunk_index and any(os.path.exists(base) for base in base_files):
+                        try:
+                            with span("delta"):
+                                stats = delta_download(urls, filepath, chunk_index, base_files, sha256, throttle)
+                            print(
+                                f"Atualização incremental: {stats['downloaded'] / 1048576:.1f} MB baixados, "
+                                f"{stats['reused'] / 1048576:.1f} MB reaproveitados"
+                            )
+                        except (DeltaError, DownloadError, OSError, ValueError) as e:
+                            print(f"Atualização incremental indisponível, baixando o arquivo inteiro: {e}")
+                            download_file(urls, filepath, sha256, size, progress, throttle)
+                    else:
+                        download_file(urls, filepath, sha256, size, progress, throttle)
+            finally:
+                record_state(store.finish_download, filepath)
+
+        # Com sha256 o conteúdo foi conferido durante o download (inteiro ou incremental)
+        record_state(record_downloaded_file, filepath, sha256, bool(sha256))
+        return filepath
+
+def probe_urls(settings, url_lists):
+    """Sonda ao mesmo tempo as URLs ainda não sondadas e guarda as respostas em settings.probes"""
+    import asyncio
+    from .engine import probe
+    urls = [url for url in dict.fromkeys(url for urls in url_lists for url in urls) if url not in settings.probes]
+    if not urls:
+        return
+    engine = get_engine()
+
+    async def probe_all():
+        return await asyncio.gather(*(probe(url) for url in urls))
+
+    for url, (elapsed, response) in zip(urls, engine.run(probe_all())):
+        length = response.headers.get("content-length", "") if elapsed is not None else ""
+        settings.probes[url] = (elapsed, int(length) if length.isdigit() else None)
+
+def probe_downloads(settings, jobs):
+    """Sonda, na thread que chama, os mirrors e tamanhos de jobs no formato de get_dependency_jobs
+
+    Chamar antes de mandar os downloads para as threads de rede: lá eles
+    ordenam os mirrors e conferem o espaço em disco com estas respostas, sem
+    esperar por sondagens atrás dos outros downloads. Só sonda os arquivos que
+    faltam e têm mais de um mirror ou tamanho desconhecido no catálogo.
+    """
+    probe_urls(settings, [urls for urls, filepath, _, size in jobs
+                          if urls and not os.path.exists(filepath) and (len(urls) > 1 or not size)])
+
+def get_expected_size(urls, settings):
+    """Tamanho anunciado (Content-Length) pelo primeiro mirror que respondeu ao HEAD
+
+    Usa as sondagens de probe_downloads e sonda agora as URLs que faltarem.
+    Sem resposta de nenhum mirror levanta DownloadError: o espaço em disco não
+    pode ser conferido.
+    """
+    from .downloader import DownloadError, get_filename_from_url
+    probe_urls(settings, [urls])
+    filename = get_filename_from_url(urls[0])
+    for url in urls:
+        elapsed, size = settings.probes[url]
+        if elapsed is not None:
+            if size is None:
+                print(f"Aviso: {filename} sem Content-Length; espaço em disco não conferido")
+            return size
+    raise DownloadError(f"Nenhum mirror respondeu ao HEAD de {filename}: tamanho desconhecido")
+
+def rank_mirrors(urls, settings):
+    """URLs pela latência das sondagens de probe_downloads; as que não responderam vão para o fim"""
+    probe_urls(settings, [urls])
+    return sorted(urls, key=lambda url: (settings.probes[url][0] is None, settings.probes[url][0] or 0.0))
+
+def evict_rig_cache(directory, needed, linked):
+    """Apaga os rigs menos usados da pasta até liberar `needed` bytes; retorna o que liberou
+
+    Nunca apaga as bibliotecas do arquivo aberto (linked, de
+    get_linked_library_paths na thread principal) nem rigs usados há menos de
+    EVICT_MIN_IDLE; um rig apagado pode ser baixado de novo pelo catálogo.
+    """
+    import sqlite3
+    store = get_state_store()
+    try:
+        candidates = store.least_recently_used(directory, limit=200)
+    except sqlite3.Error as e:
+        print(f"Aviso: estado local indisponível: {e}")
+        return 0
+
+    cutoff = time.time() - EVICT_MIN_IDLE
+    freed = 0
+    for row in candidates:
+        if freed >= needed or row["last_used"] > cutoff:
+            break
+        path = row["path"]
+        # Texturas e bibliotecas de dependência (sem versão) ficam: não se sabe que rig as usa
+        if os.path.normcase(path) in linked or not row["version"]:
+            continue
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            size = 0
+        except OSError as e:
+            print(f"Aviso: não foi possível apagar {path}: {e}")
+            continue
+        record_state(store.forget_file, path)
+        freed += size
+        print(f"PeS: {os.path.basename(path)} apagado para liberar espaço ({size / 1048576:.0f} MB)")
+    return freed
+
+def record_state(func, *args):
+    """Grava no estado local sem deixar uma falha do banco interromper o download"""
+    import sqlite3
     try:
-        response = requests.get(JSON_URL)
-        response.raise_for_status()
-        return response.json()
-    except Exception as e:
-        print(f"Erro ao carregar banco de dados: {str(e)}")
-        return {"rigs": {}}
+        func(*args)
+    except sqlite3.Error as e:
+        print(f"Aviso: estado local indisponível: {e}")
+
+def _progress_recorder(store, filepath):
+    """Callback de progresso que grava no estado local no máximo a cada PROGRESS_INTERVAL"""
+    last_write = [0.0]
+
+    def progress(received, total):
+        now = time.monotonic()
+        if now - last_write[0] >= PROGRESS_INTERVAL:
+            last_write[0] = now
+            record_state(store.update_download, filepath, received, total)
+
+    return progress
+
+def record_downloaded_file(filepath, sha256=None, verified=False):
+    """Registra no estado local um arquivo de rig recém-baixado"""
+    filename = os.path.basename(filepath)
+    rig_id, version = get_version_from_filename(filename)
+    get_state_store().record_file(
+        filepath, rig_id, version, get_variant_from_filename(filename), sha256, verified
+    )
+
+def record_file_use(*filepaths):
+    """Atualiza o último uso de arquivos de rig (caminhos absolutos) no estado local"""
+    record_state(get_state_store().touch, list(filepaths))
+
+def download_rig(urls, download_dir, sha256=None, overwrite=True, chunk_index=None, base_files=(), size=None,
+                 background=False, settings=None):
+    """Baixa o rig para a pasta de download e retorna o caminho do arquivo
+
+    Com mirrors, o download começa pelo que respondeu mais rápido à sondagem
+    (de probe_downloads, ou feita agora). O nome do arquivo vem sempre da URL
+    principal.
+    """
+    from .downloader import get_filename_from_url
+    settings = settings or get_download_settings()
+    filepath = os.path.join(download_dir, get_filename_from_url(urls[0]))
+    if len(urls) > 1 and not os.path.exists(filepath):
+        urls = rank_mirrors(urls, settings)
+    return fetch_file(urls, filepath, sha256, overwrite, chunk_index, base_files, size, background, settings)
+
+def download_version(rig_data, version, download_dir, overwrite=True, base_files=(), background=False,
+                     settings=None):
+    """Baixa uma versão do catálogo usando mirrors, hash, tamanho e índice de pedaços declarados"""
+    info = get_version_info(rig_data, version)
+    local_path = info.get("local_path")
+    if local_path:
+        # Versão deixada direto na pasta de rigs: já está no lugar, e não há URL para ela
+        if not os.path.exists(local_path):
+            from .downloader import DownloadError
+            raise DownloadError(f"{os.path.basename(local_path)} não está mais na pasta de rigs")
+        record_file_use(local_path)
+        return local_path
+    urls, _, sha256, size = get_version_job(rig_data, version, download_dir)
+    return download_rig(
+        urls,
+        download_dir,
+        sha256=sha256,
+        overwrite=overwrite,
+        chunk_index=info.get("chunk_index"),
+        base_files=base_files,
+        size=size,
+        background=background,
+        settings=settings
+    )
+
+def get_version_job(rig_data, version, download_dir):
+    """Download de uma versão no formato de get_dependency_jobs: (urls, caminho, sha256, tamanho)"""
+    from .downloader import get_filename_from_url
+    version = int(version)
+    info = get_version_info(rig_data, version)
+    if info.get("local_path"):
+        return [], info["local_path"], None, None
+    download_url = rig_data["download_url"] if version == rig_data["latest_version"] else None
+    urls = get_version_urls(rig_data, version, download_url)
+    return urls, os.path.join(download_dir, get_filename_from_url(urls[0])), info.get("sha256"), info.get("size")
+
+def get_library_job(filename, database, download_dir):
+    """Download do catálogo para o arquivo de uma biblioteca ausente, como em get_version_job, ou None"""
+    from .downloader import get_filename_from_url
+    rig_data = find_rig(database, filename)[1]
+    if rig_data is None:
+        return None
+    _, version = get_version_from_filename(filename)
+    if str(version) not in rig_data.get("versions", {}) and version != rig_data["latest_version"]:
+        return None
+    variant = get_variant_from_filename(filename)
+    if not variant:
+        return get_version_job(rig_data, version, download_dir)
+    url = get_version_info(rig_data, version).get("variants", {}).get(variant)
+    if url is None:
+        return None
+    return [url], os.path.join(download_dir, get_filename_from_url(url)), None, None
+
+def get_dependency_jobs(database, rig_data, version, download_dir, seen=None):
+    """Arquivos de que uma versão depende, inclusive os dos sub-rigs: [(urls, caminho, sha256, tamanho)]
+
+    Caminhos são relativos à pasta do rig e nunca saem dela; sub-rigs ficam
+    na própria pasta, com as dependências deles.
+    """
+    from .downloader import get_filename_from_url
+    seen = set() if seen is None else seen
+    root = os.path.normpath(download_dir)
+    jobs = []
+    for dependency in get_version_info(rig_data, version).get("dependencies", []):
+        if "rig" in dependency:
+            key = (dependency["rig"], int(dependency["version"]))
+            sub_rig = database["rigs"].get(key[0])
+            if sub_rig is None or key in seen:
+                continue
+            seen.add(key)
+            info = get_version_info(sub_rig, key[1])
+            if info.get("local_path"):
+                # Sub-rig deixado direto na pasta: já está no lugar
+                continue
+            urls = get_version_urls(sub_rig, key[1])
+            jobs.append((urls, os.path.join(download_dir, get_filename_from_url(urls[0])),
+                         info.get("sha256"), info.get("size")))
+            jobs.extend(get_dependency_jobs(database, sub_rig, key[1], download_dir, seen))
+            continue
+        filepath = os.path.normpath(os.path.join(root, dependency["path"]))
+        if filepath in seen or not filepath.startswith(os.path.join(root, "")):
+            continue
+        seen.add(filepath)
+        urls = [dependency["url"]] + list(dependency.get("mirrors", []))
+        jobs.append((urls, filepath, dependency.get("sha256"), dependency.get("size")))
+    return jobs
+
+def get_missing_dependencies(database, versions, download_dir):
+    """Dependências ainda ausentes de [(rig_data, versão)], sem repetir arquivos nem as próprias versões"""
+    seen = set()
+    jobs = []
+    for rig_data, version in versions:
+        jobs.extend(get_dependency_jobs(database, rig_data, version, download_dir, seen))
+    # Um sub-rig pode apontar de volta para um rig pedido: esse já vem pelo download_version
+    requested = {get_version_filepath(rig_data, version, download_dir) for rig_data, version in versions}
+    return [job for job in jobs if job[1] not in requested and not os.path.exists(job[1])]
+
+def fetch_dependency(job, background=False, settings=None):
+    """Baixa um arquivo de get_dependency_jobs (se ainda não estiver no lugar)"""
+    urls, filepath, sha256, size = job
+    return fetch_file(urls, filepath, sha256, overwrite=False, size=size, background=background,
+                      settings=settings)
+
+def download_with_dependencies(database, rig_data, version, download_dir, overwrite=True, base_files=(),
+                               background=False):
+    """download_version junto com as dependências que faltam, tudo em paralelo; retorna o caminho do rig
+
+    Só na thread principal (ou fora do loop de rede): espera os downloads no loop.
+    """
+    jobs = get_missing_dependencies(database, [(rig_data, version)], download_dir)
+    settings = get_download_settings()
+    probe_downloads(settings, [get_version_job(rig_data, version, download_dir)] + jobs)
+    if not jobs:
+        return download_version(rig_data, version, download_dir, overwrite, base_files, background, settings)
+    return run_in_threads(
+        [functools.partial(download_version, rig_data, version, download_dir, overwrite, base_files,
+                           background, settings)]
+        + [functools.partial(fetch_dependency, job, background, settings) for job in jobs]
+    )[0]
+
+def download_bundle(database, name, download_dir, background=False):
+    """Baixa as versões de um pacote do catálogo e retorna {rig_id: caminho}
+
+    Os arquivos que faltam vêm num único tar transmitido e extraído direto na
+    pasta de rigs. Com poucos arquivos faltando o pacote não é pedido, e os
+    membros que ele não trouxe (ou que não conferiram) são baixados um a um.
+    """
+    from .bundle import download_bundle as fetch_bundle
+    from .diskspace import reserve_space
+    from .downloader import get_filename_from_url
+
+    bundle = database["bundles"][name]
+    missing = {}
+    for rig_id, version in bundle["rigs"].items():
+        rig_data = database["rigs"][rig_id]
+        info = get_version_info(rig_data, version)
+        if info.get("local_path"):
+            continue
+        filename = get_filename_from_url(get_version_urls(rig_data, version)[0])
+        if not os.path.exists(os.path.join(download_dir, filename)):
+            missing[filename] = (info.get("sha256"), info.get("size"))
+
+    settings = get_download_settings()
+    if len(missing) > 1 and len(missing) >= len(bundle["rigs"]) * BUNDLE_MIN_MISSING:
+        os.makedirs(download_dir, exist_ok=True)
+        urls = [bundle["url"]] + list(bundle.get("mirrors", []))
+        if settings.cache_server:
+            urls.insert(0, get_cached_url("fetch", urls[0], server=settings.cache_server))
+        # Uma única entrada de progresso para o pacote inteiro
+        bundle_path = os.path.join(download_dir, get_filename_from_url(bundle["url"]))
+
+        evict = functools.partial(evict_rig_cache, download_dir, linked=settings.linked)
+
+        def downloaded(filepath, sha256):
+            record_state(record_downloaded_file, filepath, sha256, bool(sha256))
+
+        total = sum(size for _, size in missing.values() if size)
+        with reserve_space(download_dir, total, None, evict):
+            store = get_state_store()
+            record_state(store.start_download, bundle_path, urls[-1], bundle.get("size"))
+            try:
+                with settings.budget.transfer(background) as throttle, span("bundle"):
+                    failed = fetch_bundle(
+                        urls, download_dir, missing, _progress_recorder(store, bundle_path), throttle, downloaded
+                    )
+            finally:
+                record_state(store.finish_download, bundle_path)
+        for filename, error in failed.items():
+            print(f"Pacote {name}: {error}; baixando {filename} separado")
+
+    # O que já estava na pasta só é marcado como usado; o resto vem em paralelo, com as dependências
+    versions = [(database["rigs"][rig_id], version) for rig_id, version in bundle["rigs"].items()]
+    jobs = get_missing_dependencies(database, versions, download_dir)
+    probe_downloads(settings, [get_version_job(rig_data, version, download_dir)
+                               for rig_data, version in versions] + jobs)
+    results = run_in_threads(
+        [functools.partial(download_version, rig_data, version, download_dir,
+                           overwrite=False, background=background, settings=settings)
+         for rig_data, version in versions]
+        + [functools.partial(fetch_dependency, job, background, settings) for job in jobs]
+    )
+    return dict(zip(bundle["rigs"], results))
+
+def link_rig_collections(database, downloaded):
+    """Linka as collections de [(rig_id, versão, arquivo)], abrindo cada biblioteca uma única vez
+
+    Retorna (collections linkadas, nomes de collections não encontradas).
+    """
+    collections_by_file = {}
+    for rig_id, version, filepath in downloaded:
+        names = get_link_collections(rig_id, database["rigs"][rig_id], version)
+        collections_by_file.setdefault(filepath, []).extend(names)
+
+    linked = []
+    not_found = []
+    for filepath, names in collections_by_file.items():
+        with span("libraries.load"), bpy.data.libraries.load(filepath, link=True) as (data_from, data_to):
+            available = [name for name in names if name in data_from.collections]
+            not_found.extend(name for name in names if name not in data_from.collections)
+            data_to.collections = available
+        linked.extend(c for c in data_to.collections if c is not None)
+
+    for collection in linked:
+        bpy.context.scene.collection.children.link(collection)
+
+    # Um único ajuste de caminhos relativos para todas as bibliotecas novas
+    convert_linked_libraries_to_relative()
+    return linked, not_found
+
+def prefetch_updates(database, filepaths, download_dir, settings):
+    """Baixa em segundo plano as versões novas dos rigs linkados, sem trocar os links
+
+    Roda fora da thread principal, com settings lido antes dela; retorna os
+    arquivos que ficaram prontos.
+    """
+    fetched = []
+    for filepath in filepaths:
+        filename = os.path.basename(filepath)
+        rig_id, rig_data = find_rig(database, filename)
+        if rig_data is None:
+            continue
+        _, current_version = get_version_from_filename(filename)
+        latest_version = rig_data["latest_version"]
+        if latest_version <= current_version or check_version_requirements(rig_id, rig_data, latest_version):
+            continue
+        variant = get_variant_from_filename(filename)
+        try:
+            if variant:
+                fetched.append(download_rig(get_variant_urls(rig_data, latest_version, variant),
+                                            download_dir, overwrite=False, background=True, settings=settings))
+            else:
+                fetched.append(download_version(rig_data, latest_version, download_dir, overwrite=False,
+                                                base_files=[filepath], background=True, settings=settings))
+                # Já fora da thread principal: as dependências vêm uma a uma, no orçamento do segundo plano
+                for job in get_missing_dependencies(database, [(rig_data, latest_version)], download_dir):
+                    fetched.append(fetch_dependency(job, background=True, settings=settings))
+        except Exception as e:
+            print(f"PeS: pré-carregamento de {rig_id} v{latest_version} falhou: {e}")
+    return fetched
+
+def is_library_missing(lib):
+    """O arquivo da biblioteca não existe no caminho gravado"""
+    missing = getattr(lib, "is_missing", None)
+    if missing is not None:
+        return missing
+    return not os.path.exists(bpy.path.abspath(lib.filepath))
+
+def get_library_filename(lib):
+    """Nome do arquivo de uma biblioteca, mesmo com caminho gravado em outro sistema"""
+    return os.path.basename(lib.filepath.replace('\\', '/'))
+
+def copy_rig_file(source, filepath, sha256=None, settings=None):
+    """Copia um rig de outra pasta local para filepath, sob a mesma trava dos downloads"""
+    import shutil
+    from .diskspace import reserve_space
+    from .downloader import get_part_path
+    from .locks import FileLock
+
+    download_dir = os.path.dirname(filepath)
+    os.makedirs(download_dir, exist_ok=True)
+    with FileLock(filepath):
+        if os.path.exists(filepath):
+            record_file_use(filepath)
+            return filepath
+
+        linked = (settings or get_download_settings()).linked
+        evict = functools.partial(evict_rig_cache, download_dir, linked=linked)
+
+        part_path = get_part_path(filepath)
+        with reserve_space(download_dir, os.path.getsize(source), part_path, evict):
+            try:
+                shutil.copyfile(source, part_path)
+                os.replace(part_path, filepath)
+            finally:
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+    record_state(record_downloaded_file, filepath, sha256, False)
+    return filepath
+
+def resolve_missing_library(filename, database, download_dir, settings):
+    """Coloca na pasta de rigs o arquivo de uma biblioteca ausente; retorna o caminho ou None
+
+    Procura, nesta ordem: a pasta de rigs do shot, outra cópia conhecida pelo
+    estado local (copiada para a pasta) e o catálogo (baixado). Roda fora da
+    thread principal.
+    """
+    import sqlite3
+    target = os.path.join(download_dir, filename)
+    if os.path.exists(target):
+        return target
+
+    base_name, version = get_version_from_filename(filename)
+    variant = get_variant_from_filename(filename)
+    store = get_state_store()
+    try:
+        copies = store.local_versions(base_name).get(version, [])
+    except sqlite3.Error:
+        copies = []
+    for path in copies:
+        if os.path.normcase(os.path.basename(path)) == os.path.normcase(filename):
+            row = store.get_file(path)
+            return copy_rig_file(path, target, row["sha256"] if row else None, settings)
+
+    job = get_library_job(filename, database, download_dir)
+    if job is None:
+        return None
+    if variant:
+        return download_rig(job[0], download_dir, overwrite=False, settings=settings)
+    return download_version(find_rig(database, filename)[1], version, download_dir, overwrite=False,
+                            settings=settings)
+
+def get_file_sha256(filepath, rig_data=None):
+    """sha256 conhecido de um arquivo de rig, sem lê-lo: o do estado local ou o do catálogo"""
+    import sqlite3
+    path = bpy.path.abspath(filepath)
+    try:
+        row = get_state_store().get_file(path)
+    except sqlite3.Error:
+        row = None
+    if row is not None and row["sha256"]:
+        return row["sha256"]
+
+    filename = os.path.basename(path)
+    if rig_data is None or get_variant_from_filename(filename):
+        return None
+    _, version = get_version_from_filename(filename)
+    info = get_version_info(rig_data, version)
+    # O hash do catálogo só vale para um arquivo com o tamanho publicado
+    if info.get("sha256") and info.get("size") and os.path.isfile(path) and os.path.getsize(path) == info["size"]:
+        return info["sha256"]
+    return None
+
+def same_rig_content(old_filepath, new_filepath, rig_data=None):
+    """Os dois arquivos são o mesmo ou têm o mesmo hash conhecido"""
+    old_path = os.path.normcase(os.path.abspath(bpy.path.abspath(old_filepath)))
+    new_path = os.path.normcase(os.path.abspath(bpy.path.abspath(new_filepath)))
+    if old_path == new_path:
+        return True
+    old_sha256 = get_file_sha256(old_path, rig_data)
+    return bool(old_sha256) and old_sha256 == get_file_sha256(new_path, rig_data)
+
+def relink_library(old_filepath, new_filepath, reload=True):
+    """Aponta as bibliotecas de old_filepath para new_filepath e as recarrega
+
+    Com reload=False só troca o caminho, para quando o conteúdo é idêntico.
+    """
+    relinked = False
+    for lib in bpy.data.libraries:
+        if lib.filepath == old_filepath:
+            lib.filepath = new_filepath
+            if reload:
+                with span("lib.reload"):
+                    lib.reload()
+            relinked = True
+    return relinked
 
 def get_relative_path(filepath):
     """Converte um caminho absoluto para relativo ao arquivo .blend atual"""
@@ -75,6 +1079,7 @@ def get_relative_path(filepath):
     except ValueError:
         return filepath  # Em caso de erro, mantém o caminho absoluto
 
+@timed("relativize")
 def convert_linked_libraries_to_relative():
     """Converte todos os caminhos de bibliotecas linkadas para caminhos relativos"""
     blend_file = bpy.data.filepath
@@ -98,6 +1103,7 @@ class DOWNLOADRIG_OT_download(Operator):
 
     rig_id: StringProperty()
 
+    @timed_method("op.download")
     def execute(self, context):
         database = load_rigs_database()
         if self.rig_id not in database["rigs"]:
@@ -105,7 +1111,10 @@ class DOWNLOADRIG_OT_download(Operator):
             return {'CANCELLED'}
 
         rig_data = database["rigs"][self.rig_id]
-        download_url = rig_data["download_url"]
+        problem = check_version_requirements(self.rig_id, rig_data, rig_data["latest_version"])
+        if problem:
+            self.report({'ERROR'}, problem)
+            return {'CANCELLED'}
 
         download_dir = get_download_path()
         if not download_dir:
@@ -113,17 +1122,7 @@ class DOWNLOADRIG_OT_download(Operator):
             return {'CANCELLED'}
 
         try:
-            os.makedirs(download_dir, exist_ok=True)
-            filename = download_url.split('/')[-1].split('?')[0]
-            filepath = os.path.join(download_dir, filename)
-
-            response = requests.get(download_url, stream=True)
-            response.raise_for_status()
-
-            with open(filepath, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
+            filepath = download_with_dependencies(database, rig_data, rig_data["latest_version"], download_dir)
 
             self.report({'INFO'}, f"Rig baixado com sucesso em: {filepath}")
             return {'FINISHED'}
@@ -138,6 +1137,7 @@ class DOWNLOADRIG_OT_download_and_link(Operator):
 
     rig_id: StringProperty()
 
+    @timed_method("op.download_and_link")
     def execute(self, context):
         download_dir = get_download_path()
         if not download_dir:
@@ -150,31 +1150,26 @@ class DOWNLOADRIG_OT_download_and_link(Operator):
             return {'CANCELLED'}
 
         rig_data = database["rigs"][self.rig_id]
-        download_url = rig_data["download_url"]
+        version = rig_data["latest_version"]
+        # Valida versão do Blender e nome das collections antes de baixar qualquer byte
+        problem = check_version_requirements(self.rig_id, rig_data, version, link=True)
+        if problem:
+            self.report({'ERROR'}, problem)
+            return {'CANCELLED'}
 
         try:
-            # Download
-            os.makedirs(download_dir, exist_ok=True)
-            filename = download_url.split('/')[-1].split('?')[0]
-            filepath = os.path.join(download_dir, filename)
-
-            response = requests.get(download_url, stream=True)
-            response.raise_for_status()
-
-            with open(filepath, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
+            # Download (com as texturas, bibliotecas e sub-rigs de que o rig depende)
+            filepath = download_with_dependencies(database, rig_data, version, download_dir)
 
             # Importa a collection usando o caminho absoluto para garantir que funcione primeiro
-            collection_name = f"chr.{self.rig_id.split('_')[-2].lower()}_rig"
+            collection_names = get_link_collections(self.rig_id, rig_data, version)
 
-            with bpy.data.libraries.load(filepath, link=True) as (data_from, data_to):
-                if collection_name in data_from.collections:
-                    data_to.collections = [collection_name]
-                else:
-                    self.report({'ERROR'}, f"Collection {collection_name} não encontrada no arquivo")
+            with span("libraries.load"), bpy.data.libraries.load(filepath, link=True) as (data_from, data_to):
+                missing = [name for name in collection_names if name not in data_from.collections]
+                if missing:
+                    self.report({'ERROR'}, f"Collection {', '.join(missing)} não encontrada no arquivo")
                     return {'CANCELLED'}
+                data_to.collections = collection_names
 
             # Adiciona a collection à cena
             for collection in data_to.collections:
@@ -191,12 +1186,224 @@ class DOWNLOADRIG_OT_download_and_link(Operator):
             self.report({'ERROR'}, f"Erro: {str(e)}")
             return {'CANCELLED'}
 
+class DOWNLOADRIG_PG_selected_rig(PropertyGroup):
+    rig_id: StringProperty(name="Rig")
+
+class DOWNLOADRIG_OT_toggle_selection(Operator):
+    bl_idname = "downloadrig.toggle_selection"
+    bl_label = "Selecionar Rig"
+    bl_description = "Marca ou desmarca o rig para importação em lote"
+    bl_options = {'INTERNAL'}
+
+    rig_id: StringProperty()
+
+    @timed_method("op.toggle_selection")
+    def execute(self, context):
+        selected = context.window_manager.pes_selected_rigs
+        index = next((i for i, item in enumerate(selected) if item.rig_id == self.rig_id), None)
+        if index is None:
+            selected.add().rig_id = self.rig_id
+        else:
+            selected.remove(index)
+        return {'FINISHED'}
+
+class DOWNLOADRIG_OT_link_selected(Operator):
+    bl_idname = "downloadrig.link_selected"
+    bl_label = "Baixar e Importar Selecionados"
+    bl_description = "Baixa os rigs marcados em paralelo e importa todos de uma vez"
+
+    @timed_method("op.link_selected")
+    def execute(self, context):
+        download_dir = get_download_path()
+        if not download_dir:
+            self.report({'ERROR'}, "Por favor, salve seu arquivo .blend primeiro!")
+            return {'CANCELLED'}
+
+        # Rigs que saíram do catálogo desde que foram marcados ficam de fora
+        database = load_rigs_database()
+        rig_ids = get_selected_rigs(context, database)
+        if not rig_ids:
+            self.report({'ERROR'}, "Nenhum rig selecionado")
+            return {'CANCELLED'}
+
+        for rig_id in rig_ids:
+            rig_data = database["rigs"][rig_id]
+            problem = check_version_requirements(rig_id, rig_data, rig_data["latest_version"], link=True)
+            if problem:
+                self.report({'ERROR'}, f"{rig_id}: {problem}")
+                return {'CANCELLED'}
+
+        try:
+            # Downloads em paralelo no loop de rede (até MAX_PARALLEL_DOWNLOADS ao mesmo tempo)
+            versions = [(database["rigs"][rig_id], database["rigs"][rig_id]["latest_version"]) for rig_id in rig_ids]
+            jobs = get_missing_dependencies(database, versions, download_dir)
+            settings = get_download_settings()
+            probe_downloads(settings, [get_version_job(rig_data, version, download_dir)
+                                       for rig_data, version in versions] + jobs)
+            filepaths = run_in_threads(
+                [functools.partial(download_version, rig_data, version, download_dir, settings=settings)
+                 for rig_data, version in versions]
+                + [functools.partial(fetch_dependency, job, False, settings) for job in jobs]
+            )[:len(rig_ids)]
+            linked, not_found = link_rig_collections(database, [
+                (rig_id, database["rigs"][rig_id]["latest_version"], filepath)
+                for rig_id, filepath in zip(rig_ids, filepaths)
+            ])
+
+            context.window_manager.pes_selected_rigs.clear()
+
+            if not_found:
+                self.report({'WARNING'}, f"Collections não encontradas: {', '.join(not_found)}")
+            else:
+                self.report({'INFO'}, f"{len(linked)} rigs baixados e importados com sucesso!")
+            return {'FINISHED'}
+
+        except Exception as e:
+            self.report({'ERROR'}, f"Erro: {str(e)}")
+            return {'CANCELLED'}
+
+class DOWNLOADRIG_OT_link_bundle(Operator):
+    bl_idname = "downloadrig.link_bundle"
+    bl_label = "Baixar e Importar Pacote"
+    bl_description = "Baixa todos os rigs do pacote numa única transferência e importa todos de uma vez"
+
+    bundle: StringProperty()
+
+    @timed_method("op.link_bundle")
+    def execute(self, context):
+        download_dir = get_download_path()
+        if not download_dir:
+            self.report({'ERROR'}, "Por favor, salve seu arquivo .blend primeiro!")
+            return {'CANCELLED'}
+
+        database = load_rigs_database()
+        bundle = database.get("bundles", {}).get(self.bundle)
+        if bundle is None:
+            self.report({'ERROR'}, f"Pacote {self.bundle} não encontrado no banco de dados")
+            return {'CANCELLED'}
+
+        for rig_id, version in bundle["rigs"].items():
+            rig_data = database["rigs"].get(rig_id)
+            if rig_data is None:
+                self.report({'ERROR'}, f"Rig {rig_id} do pacote não encontrado no banco de dados")
+                return {'CANCELLED'}
+            problem = check_version_requirements(rig_id, rig_data, version, link=True)
+            if problem:
+                self.report({'ERROR'}, f"{rig_id}: {problem}")
+                return {'CANCELLED'}
+
+        try:
+            filepaths = download_bundle(database, self.bundle, download_dir)
+            linked, not_found = link_rig_collections(database, [
+                (rig_id, version, filepaths[rig_id]) for rig_id, version in bundle["rigs"].items()
+            ])
+        except Exception as e:
+            self.report({'ERROR'}, f"Erro: {str(e)}")
+            return {'CANCELLED'}
+
+        if not_found:
+            self.report({'WARNING'}, f"Collections não encontradas: {', '.join(not_found)}")
+        else:
+            self.report({'INFO'}, f"Pacote {self.bundle}: {len(linked)} rigs importados")
+        return {'FINISHED'}
+
+class DOWNLOADRIG_OT_add_instances(Operator):
+    bl_idname = "downloadrig.add_instances"
+    bl_label = "Adicionar Instâncias"
+    bl_description = "Linka a collection do rig uma vez e cria empties de instância na cena"
+    bl_options = {'UNDO'}
+
+    rig_id: StringProperty()
+    count: IntProperty(name="Quantidade", default=0, min=0)
+
+    @timed_method("op.add_instances")
+    def execute(self, context):
+        scene = context.scene
+
+        try:
+            database = load_rigs_database()
+            if self.rig_id not in database["rigs"]:
+                self.report({'ERROR'}, "Rig não encontrado no banco de dados")
+                return {'CANCELLED'}
+
+            # As mesmas collections que o link normal traria (link_collections do catálogo)
+            rig_data = database["rigs"][self.rig_id]
+            version = rig_data["latest_version"]
+            names = get_link_collections(self.rig_id, rig_data, version)
+            collections = [c for c in map(find_linked_collection, names) if c is not None]
+
+            if not collections:
+                download_dir = get_download_path()
+                if not download_dir:
+                    self.report({'ERROR'}, "Por favor, salve seu arquivo .blend primeiro!")
+                    return {'CANCELLED'}
+
+                problem = check_version_requirements(self.rig_id, rig_data, version, link=True)
+                if problem:
+                    self.report({'ERROR'}, problem)
+                    return {'CANCELLED'}
+                filepath = download_with_dependencies(database, rig_data, version, download_dir, overwrite=False)
+
+                # Linka só os datablocks, sem adicionar as collections à cena
+                with span("libraries.load"), bpy.data.libraries.load(filepath, link=True) as (data_from, data_to):
+                    available = [name for name in names if name in data_from.collections]
+                    if not available:
+                        self.report({'ERROR'}, f"Collections não encontradas no arquivo: {', '.join(names)}")
+                        return {'CANCELLED'}
+                    data_to.collections = available
+                collections = [c for c in data_to.collections if c is not None]
+                convert_linked_libraries_to_relative()
+
+            count = self.count or scene.pes_instance_count
+            existing = len(get_instance_objects(self.rig_id))
+            source = get_instance_source(self.rig_id, collections)
+            target = get_instances_collection(scene)
+            origin = scene.cursor.location.copy()
+            offset = Vector(scene.pes_instance_offset)
+
+            for i in range(existing, existing + count):
+                obj = bpy.data.objects.new(f"{source.name}.inst", None)
+                obj.instance_type = 'COLLECTION'
+                obj.instance_collection = source
+                obj.location = origin + offset * i
+                obj.display_type = scene.pes_instance_display
+                obj.empty_display_size = 0.5
+                obj["pes_rig_id"] = self.rig_id
+                target.objects.link(obj)
+
+            self.report({'INFO'}, f"{count} instâncias de {self.rig_id} adicionadas")
+            return {'FINISHED'}
+
+        except Exception as e:
+            self.report({'ERROR'}, f"Erro: {str(e)}")
+            return {'CANCELLED'}
+
+class DOWNLOADRIG_OT_remove_instances(Operator):
+    bl_idname = "downloadrig.remove_instances"
+    bl_label = "Remover Instâncias"
+    bl_description = "Remove os empties de instância do rig (a última ou todas)"
+    bl_options = {'UNDO'}
+
+    rig_id: StringProperty()
+    count: IntProperty(name="Quantidade", description="0 remove todas", default=0, min=0)
+
+    @timed_method("op.remove_instances")
+    def execute(self, context):
+        objects = sorted(get_instance_objects(self.rig_id), key=lambda obj: obj.name)
+        if self.count:
+            objects = objects[-self.count:]
+        for obj in objects:
+            bpy.data.objects.remove(obj)
+        self.report({'INFO'}, f"{len(objects)} instâncias removidas")
+        return {'FINISHED'}
+
 class DOWNLOADRIG_OT_update(Operator):
     bl_idname = "downloadrig.update"
     bl_label = "Atualizar"
 
     filepath: StringProperty()
 
+    @timed_method("op.update")
     def execute(self, context):
         try:
             current_file = os.path.basename(self.filepath)
@@ -211,7 +1418,7 @@ class DOWNLOADRIG_OT_update(Operator):
                     rig_found = True
                     rig_id = rid
                     latest_version = rig_data["latest_version"]
-                    download_url = rig_data["download_url"]
+                    variant = get_variant_from_filename(current_file)
                     break
 
             if not rig_found:
@@ -222,34 +1429,40 @@ class DOWNLOADRIG_OT_update(Operator):
                 self.report({'INFO'}, f"Já está na versão mais recente (v{current_version})")
                 return {'CANCELLED'}
 
+            problem = check_version_requirements(rig_id, rig_data, latest_version)
+            if problem:
+                self.report({'ERROR'}, problem)
+                return {'CANCELLED'}
+
             # Usar a pasta padrão de download para baixar a nova versão
             download_dir = get_download_path()
             if not download_dir:
                 self.report({'ERROR'}, "Por favor, salve seu arquivo .blend primeiro!")
                 return {'CANCELLED'}
 
-            os.makedirs(download_dir, exist_ok=True)
-            new_filename = download_url.split('/')[-1].split('?')[0]
-            new_filepath = os.path.join(download_dir, new_filename)
-
-            response = requests.get(download_url, stream=True)
-            response.raise_for_status()
-
-            with open(new_filepath, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
+            if variant:
+                if get_version_info(rig_data, latest_version).get("local_path"):
+                    self.report({'ERROR'}, f"A v{latest_version} só existe na pasta de rigs, sem a variante {variant}")
+                    return {'CANCELLED'}
+                new_filepath = download_rig(get_variant_urls(rig_data, latest_version, variant), download_dir)
+            else:
+                # A versão atual serve de base para a atualização incremental
+                new_filepath = download_with_dependencies(
+                    database, rig_data, latest_version, download_dir,
+                    base_files=[bpy.path.abspath(self.filepath)]
+                )
 
-            # Atualiza o link da biblioteca para o novo arquivo
-            for lib in bpy.data.libraries:
-                if lib.filepath == self.filepath:
-                    lib.filepath = new_filepath
-                    lib.reload()
+            # Atualiza o link da biblioteca para o novo arquivo (sem recarregar se for idêntico)
+            unchanged = same_rig_content(self.filepath, new_filepath, rig_data)
+            relink_library(self.filepath, new_filepath, reload=not unchanged)
 
             # Depois converte para caminhos relativos
             convert_linked_libraries_to_relative()
 
-            self.report({'INFO'}, f"Rig atualizado para v{latest_version} e links atualizados!")
+            if unchanged:
+                self.report({'INFO'}, f"Rig atualizado para v{latest_version} (conteúdo idêntico, sem recarregar)")
+            else:
+                self.report({'INFO'}, f"Rig atualizado para v{latest_version} e links atualizados!")
             return {'FINISHED'}
 
         except Exception as e:
@@ -263,7 +1476,9 @@ class DOWNLOADRIG_OT_change_version(Operator):
     filepath: StringProperty()
     version: StringProperty()
     download_url: StringProperty()
+    rig_id: StringProperty()
 
+    @timed_method("op.change_version")
     def execute(self, context):
         try:
             download_dir = get_download_path()
@@ -271,30 +1486,40 @@ class DOWNLOADRIG_OT_change_version(Operator):
                 self.report({'ERROR'}, "Por favor, salve seu arquivo .blend primeiro!")
                 return {'CANCELLED'}
 
-            os.makedirs(download_dir, exist_ok=True)
-            new_filename = self.download_url.split('/')[-1].split('?')[0]
-            new_filepath = os.path.join(download_dir, new_filename)
-
-            # Verifica se o arquivo já existe para evitar download desnecessário
-            if not os.path.exists(new_filepath):
-                response = requests.get(self.download_url, stream=True)
-                response.raise_for_status()
-
-                with open(new_filepath, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        if chunk:
-                            f.write(chunk)
-
-            # Atualiza o link da biblioteca para o novo arquivo
-            for lib in bpy.data.libraries:
-                if lib.filepath == self.filepath:
-                    lib.filepath = new_filepath
-                    lib.reload()
+            # O mesmo catálogo que montou o menu de versões
+            database = load_rigs_database(CATALOG_TTL)
+            rig_data = database["rigs"].get(self.rig_id) if self.rig_id else None
+            if rig_data:
+                new_filepath = get_version_filepath(rig_data, self.version, download_dir)
+            else:
+                from .downloader import get_filename_from_url
+                new_filepath = os.path.join(download_dir, get_filename_from_url(self.download_url))
+
+            # Arquivo já na pasta não é baixado de novo; só as dependências que faltarem
+            base_files = [bpy.path.abspath(self.filepath)]
+            if rig_data:
+                if not os.path.exists(new_filepath):
+                    problem = check_version_requirements(self.rig_id, rig_data, self.version)
+                    if problem:
+                        self.report({'ERROR'}, problem)
+                        return {'CANCELLED'}
+                download_with_dependencies(database, rig_data, self.version, download_dir,
+                                           overwrite=False, base_files=base_files)
+            elif not os.path.exists(new_filepath):
+                download_rig([self.download_url], download_dir,
+                             overwrite=False, base_files=base_files)
+
+            # Atualiza o link da biblioteca; versão republicada sem mudanças não é recarregada
+            unchanged = same_rig_content(self.filepath, new_filepath, rig_data)
+            relink_library(self.filepath, new_filepath, reload=not unchanged)
 
             # Depois converte para caminhos relativos
             convert_linked_libraries_to_relative()
 
-            self.report({'INFO'}, f"Versão alterada para v{self.version}")
+            if unchanged:
+                self.report({'INFO'}, f"Versão alterada para v{self.version} (conteúdo idêntico, sem recarregar)")
+            else:
+                self.report({'INFO'}, f"Versão alterada para v{self.version}")
             return {'FINISHED'}
 
         except Exception as e:
@@ -307,26 +1532,47 @@ class DOWNLOADRIG_OT_show_versions(Operator):
 
     filepath: StringProperty()
 
+    @timed_method("op.show_versions")
     def execute(self, context):
         try:
             current_file = os.path.basename(self.filepath)
             base_name, current_version = get_version_from_filename(current_file)
             filepath = self.filepath
 
-            database = load_rigs_database()
+            # O menu abre a partir do painel, que acabou de carregar o catálogo
+            database = load_rigs_database(CATALOG_TTL)
 
             for rig_id, rig_data in database["rigs"].items():
                 if rig_id in base_name and "versions" in rig_data:
+                    local_versions = get_state_store().local_versions(rig_id)
+                    # Versões deixadas direto na pasta de rigs (fora do catálogo)
+                    local_versions.update(
+                        (int(version), [info["local_path"]])
+                        for version, info in rig_data.get("version_info", {}).items() if info.get("local_path")
+                    )
+
                     def draw_menu(self_menu, context):
                         layout = self_menu.layout
-                        for version in sorted(rig_data["versions"].keys(), reverse=True):
+                        versions = set(rig_data["versions"]) | {
+                            version for version, info in rig_data.get("version_info", {}).items()
+                            if info.get("local_path")
+                        }
+                        for version in sorted(versions, key=int, reverse=True):
+                            if int(version) == current_version:
+                                suffix = " (atual)"
+                            elif int(version) in local_versions:
+                                suffix = " (local)"
+                            else:
+                                suffix = ""
                             op = layout.operator(
                                 "downloadrig.change_version",
-                                text=f"Versão {version}" + (" (atual)" if int(version) == current_version else "")
+                                text=f"Versão {version}{suffix}",
+                                icon='FILE_TICK' if int(version) in local_versions else 'NONE'
                             )
                             op.filepath = filepath
                             op.version = version
-                            op.download_url = rig_data["versions"][version]
+                            op.download_url = rig_data["versions"].get(version, "")
+                            op.rig_id = rig_id
 
                     bpy.context.window_manager.popup_menu(draw_menu, title="Versões Disponíveis")
                     break
@@ -337,6 +1583,250 @@ class DOWNLOADRIG_OT_show_versions(Operator):
             self.report({'ERROR'}, f"Erro ao mostrar versões: {str(e)}")
             return {'CANCELLED'}
 
+class DOWNLOADRIG_OT_change_variant(Operator):
+    bl_idname = "downloadrig.change_variant"
+    bl_label = "Alterar Variante"
+    bl_description = "Troca o rig linkado por uma variante mais leve ou pelo rig completo"
+
+    filepath: StringProperty()
+    rig_id: StringProperty()
+    version: StringProperty()
+    variant: StringProperty()
+
+    @timed_method("op.change_variant")
+    def execute(self, context):
+        try:
+            download_dir = get_download_path()
+            if not download_dir:
+                self.report({'ERROR'}, "Por favor, salve seu arquivo .blend primeiro!")
+                return {'CANCELLED'}
+
+            rig_data = load_rigs_database()["rigs"].get(self.rig_id)
+            if not rig_data:
+                self.report({'ERROR'}, "Rig não encontrado no banco de dados")
+                return {'CANCELLED'}
+
+            urls = get_variant_urls(rig_data, self.version, self.variant)
+            new_filepath = download_rig(urls, download_dir, overwrite=False)
+
+            relink_library(self.filepath, new_filepath)
+            convert_linked_libraries_to_relative()
+
+            self.report({'INFO'}, f"Variante alterada para {self.variant or 'completo'}")
+            return {'FINISHED'}
+
+        except Exception as e:
+            self.report({'ERROR'}, f"Erro ao mudar variante: {str(e)}")
+            return {'CANCELLED'}
+
+class DOWNLOADRIG_OT_show_variants(Operator):
+    bl_idname = "downloadrig.show_variants"
+    bl_label = "Variantes Disponíveis"
+
+    filepath: StringProperty()
+
+    @timed_method("op.show_variants")
+    def execute(self, context):
+        try:
+            filename = os.path.basename(self.filepath)
+            _, current_version = get_version_from_filename(filename)
+            current_variant = get_variant_from_filename(filename)
+            filepath = self.filepath
+
+            rig_id, rig_data = find_rig(load_rigs_database(CATALOG_TTL), filename)
+            if rig_id is None:
+                self.report({'ERROR'}, "Rig não encontrado no banco de dados")
+                return {'CANCELLED'}
+
+            variants = get_version_info(rig_data, current_version).get("variants", {})
+
+            def draw_menu(self_menu, context):
+                layout = self_menu.layout
+                for variant in [""] + sorted(variants):
+                    op = layout.operator(
+                        "downloadrig.change_variant",
+                        text=(variant or "Completo") + (" (atual)" if variant == current_variant else "")
+                    )
+                    op.filepath = filepath
+                    op.rig_id = rig_id
+                    op.version = str(current_version)
+                    op.variant = variant
+
+            bpy.context.window_manager.popup_menu(draw_menu, title="Variantes Disponíveis")
+            return {'FINISHED'}
+
+        except Exception as e:
+            self.report({'ERROR'}, f"Erro ao mostrar variantes: {str(e)}")
+            return {'CANCELLED'}
+
+class DOWNLOADRIG_OT_repair_libraries(Operator):
+    bl_idname = "downloadrig.repair_libraries"
+    bl_label = "Reparar Bibliotecas"
+    bl_description = "Encontra ou baixa os rigs de todas as bibliotecas ausentes e religa tudo de uma vez"
+
+    @timed_method("op.repair_libraries")
+    def execute(self, context):
+        download_dir = get_download_path()
+        if not download_dir:
+            self.report({'ERROR'}, "Por favor, salve seu arquivo .blend primeiro!")
+            return {'CANCELLED'}
+
+        missing = [lib for lib in bpy.data.libraries if lib.filepath and is_library_missing(lib)]
+        if not missing:
+            self.report({'INFO'}, "Nenhuma biblioteca ausente")
+            return {'CANCELLED'}
+
+        try:
+            database = load_rigs_database()
+            filenames = sorted({get_library_filename(lib) for lib in missing})
+
+            # Dependências dos rigs do catálogo vêm junto (variantes não declaram as delas)
+            versions = []
+            for filename in filenames:
+                rig_data = find_rig(database, filename)[1]
+                if rig_data is not None and not get_variant_from_filename(filename):
+                    versions.append((rig_data, get_version_from_filename(filename)[1]))
+            jobs = get_missing_dependencies(database, versions, download_dir)
+
+            # Cópias e downloads em paralelo no loop de rede
+            settings = get_download_settings()
+            library_jobs = (get_library_job(filename, database, download_dir) for filename in filenames)
+            probe_downloads(settings, [job for job in library_jobs if job] + jobs)
+            results = run_in_threads(
+                [functools.partial(resolve_missing_library, filename, database, download_dir, settings)
+                 for filename in filenames]
+                + [functools.partial(fetch_dependency, job, False, settings) for job in jobs],
+                return_exceptions=True
+            )
+            resolved = dict(zip(filenames, results))
+            for job, result in zip(jobs, results[len(filenames):]):
+                if isinstance(result, Exception):
+                    print(f"Aviso: dependência {os.path.basename(job[1])} não baixada: {result}")
+        except Exception as e:
+            self.report({'ERROR'}, f"Erro ao reparar: {str(e)}")
+            return {'CANCELLED'}
+
+        repaired = []
+        failed = []
+        for lib in missing:
+            filename = get_library_filename(lib)
+            result = resolved[filename]
+            if isinstance(result, Exception):
+                failed.append(f"{filename} ({result})")
+            elif not result:
+                failed.append(filename)
+            else:
+                lib.filepath = result
+                repaired.append(lib)
+
+        # Todos os caminhos trocados primeiro, depois um único ciclo de recarga
+        for lib in repaired:
+            with span("lib.reload"):
+                lib.reload()
+        if repaired:
+            record_file_use(*(resolved[get_library_filename(lib)] for lib in repaired))
+            convert_linked_libraries_to_relative()
+
+        if failed:
+            self.report({'WARNING'}, f"{len(repaired)} reparadas; não encontradas: {', '.join(sorted(set(failed)))}")
+        else:
+            self.report({'INFO'}, f"{len(repaired)} bibliotecas reparadas")
+        return {'FINISHED'}
+
+# Bibliotecas trocadas pelo rig completo durante o render: (caminho completo, caminho da variante)
+_render_swaps = []
+
+def get_render_swaps():
+    """[(variante, rig completo, nome do arquivo)] das bibliotecas variantes do arquivo aberto"""
+    swaps = []
+    for lib in bpy.data.libraries:
+        filename = os.path.basename(lib.filepath)
+        if not get_variant_from_filename(filename):
+            continue
+        full_filename = get_full_rig_filename(filename)
+        full_filepath = os.path.join(os.path.dirname(bpy.path.abspath(lib.filepath)), full_filename)
+        swaps.append((lib.filepath, full_filepath, filename))
+    return swaps
+
+def fetch_full_rigs(swaps):
+    """Baixa em paralelo os rigs completos que faltam para as trocas; só na thread principal"""
+    missing = [(full_filepath, filename) for _, full_filepath, filename in swaps if not os.path.exists(full_filepath)]
+    if not missing:
+        return
+    database = load_rigs_database()
+    jobs = []
+    for full_filepath, filename in missing:
+        rig_id, rig_data = find_rig(database, filename)
+        if rig_id is None:
+            print(f"PeS: rig completo não encontrado para {filename}, renderizando a variante")
+            continue
+        _, version = get_version_from_filename(filename)
+        info = get_version_info(rig_data, version)
+        jobs.append((get_version_urls(rig_data, version), full_filepath, info.get("sha256"), info.get("size")))
+    settings = get_download_settings()
+    probe_downloads(settings, jobs)
+    results = run_in_threads([functools.partial(fetch_dependency, job, False, settings) for job in jobs],
+                             return_exceptions=True)
+    for job, result in zip(jobs, results):
+        if isinstance(result, Exception):
+            print(f"PeS: erro ao baixar {os.path.basename(job[1])}, renderizando a variante: {result}")
+
+def swap_to_full_rigs(swaps):
+    """Troca as variantes pelos rigs completos que estão no disco; só na thread principal"""
+    for variant_filepath, full_filepath, filename in swaps:
+        if not os.path.exists(full_filepath):
+            print(f"PeS: {os.path.basename(full_filepath)} não está na pasta de rigs, renderizando a variante")
+            continue
+        relink_library(variant_filepath, full_filepath)
+        _render_swaps.append((full_filepath, variant_filepath))
+        print(f"PeS: {filename} -> {os.path.basename(full_filepath)} para o render")
+
+@persistent
+def swap_variants_for_render(scene, depsgraph=None):
+    """Antes do render pela linha de comando, troca as variantes leves pelo rig completo
+
+    Só em modo background, onde o handler roda na thread principal; no
+    Blender aberto ele roda no job de render, e a troca é feita pelo operador
+    downloadrig.render_full. Nada é baixado aqui: o prestage já traz os rigs
+    completos para o nó.
+    """
+    if not bpy.app.background or not scene.pes_render_full or _render_swaps:
+        return
+    swap_to_full_rigs(get_render_swaps())
+
+@persistent
+def restore_variants_after_render(scene, depsgraph=None):
+    """Depois do render, volta as bibliotecas para as variantes leves"""
+    while _render_swaps:
+        full_filepath, variant_filepath = _render_swaps.pop()
+        relink_library(full_filepath, variant_filepath)
+
+class DOWNLOADRIG_OT_render_full(Operator):
+    bl_idname = "downloadrig.render_full"
+    bl_label = "Renderizar com Rig Completo"
+    bl_description = "Baixa os rigs completos das variantes leves, renderiza com eles e volta para as variantes"
+
+    animation: BoolProperty(name="Animação", default=False)
+
+    @timed_method("op.render_full")
+    def execute(self, context):
+        if _render_swaps:
+            self.report({'ERROR'}, "Já há um render com rigs completos em andamento")
+            return {'CANCELLED'}
+        swaps = get_render_swaps()
+        try:
+            fetch_full_rigs(swaps)
+        except Exception as e:
+            self.report({'WARNING'}, f"Rigs completos indisponíveis, renderizando as variantes: {str(e)}")
+
+        # Render bloqueante na thread principal: a troca e a volta acontecem fora do job de render
+        swap_to_full_rigs(swaps)
+        try:
+            bpy.ops.render.render('EXEC_DEFAULT', animation=self.animation, write_still=not self.animation)
+        finally:
+            restore_variants_after_render(context.scene)
+        return {'FINISHED'}
+
 class DOWNLOADRIG_PT_update_panel(Panel):
     bl_label = "Atualizar rigs"
     bl_idname = "DOWNLOADRIG_PT_update_panel"
@@ -344,14 +1834,27 @@ class DOWNLOADRIG_PT_update_panel(Panel):
     bl_region_type = 'UI'
     bl_category = 'PeS'
 
+    @timed_method("draw.update")
     def draw(self, context):
         layout = self.layout
-        database = load_rigs_database()
+        database = load_rigs_database(CATALOG_TTL, background=True)
 
         linked_files = set()
+        missing = 0
         for lib in bpy.data.libraries:
             if lib.filepath:
                 linked_files.add(lib.filepath)
+                if is_library_missing(lib):
+                    missing += 1
+
+        if missing:
+            row = layout.row()
+            row.alert = True
+            row.operator(
+                "downloadrig.repair_libraries",
+                text=f"Reparar {missing} bibliotecas ausentes",
+                icon='LIBRARY_DATA_BROKEN'
+            )
 
         if linked_files:
             for filepath in sorted(linked_files):
@@ -376,7 +1879,8 @@ class DOWNLOADRIG_PT_update_panel(Panel):
 
                 title_row = header_row.row()
                 title_row.label(text="", icon='MESH_MONKEY')
-                title_row.label(text=f"{rig_name} - v{current_version}")
+                variant = get_variant_from_filename(filename)
+                title_row.label(text=f"{rig_name} - v{current_version}" + (f" [{variant}]" if variant else ""))
 
                 button_row = header_row.row(align=True)
                 button_row.alignment = 'RIGHT'
@@ -399,6 +1903,14 @@ class DOWNLOADRIG_PT_update_panel(Panel):
                 )
                 versions_op.filepath = filepath
 
+                if get_version_info(rig_data, current_version).get("variants"):
+                    button_row.operator(
+                        "downloadrig.show_variants",
+                        text="",
+                        icon='MOD_DECIM',
+                        emboss=True
+                    ).filepath = filepath
+
                 path_row = box.row()
                 path_row.scale_y = 0.8
                 path_row.label(text=filepath, icon='FILE_FOLDER')
@@ -406,6 +1918,12 @@ class DOWNLOADRIG_PT_update_panel(Panel):
         else:
             layout.label(text="Nenhum rig linkado", icon='INFO')
 
+        render_box = layout.box()
+        render_box.prop(context.scene, "pes_render_full")
+        row = render_box.row(align=True)
+        row.operator("downloadrig.render_full", text="Imagem", icon='RENDER_STILL').animation = False
+        row.operator("downloadrig.render_full", text="Animação", icon='RENDER_ANIMATION').animation = True
+
 class DOWNLOADRIG_PT_download_panel(Panel):
     bl_label = "Baixar/Importar"
     bl_idname = "DOWNLOADRIG_PT_download_panel"
@@ -415,14 +1933,45 @@ class DOWNLOADRIG_PT_download_panel(Panel):
     bl_options = {'DEFAULT_CLOSED'}
     bl_parent_id = "DOWNLOADRIG_PT_update_panel"  # Define o pai como o painel de atualização
 
+    @timed_method("draw.download")
     def draw(self, context):
         layout = self.layout
 
-        database = load_rigs_database()
+        database = load_rigs_database(CATALOG_TTL, background=True)
+        selected = get_selected_rigs(context, database)
+
+        if selected:
+            row = layout.row()
+            row.scale_y = 1.2
+            row.operator(
+                "downloadrig.link_selected",
+                text=f"Baixar e Importar Selecionados ({len(selected)})",
+                icon='LINKED'
+            )
+
+        bundles = database.get("bundles", {})
+        if bundles:
+            box = layout.box()
+            box.label(text="Pacotes", icon='PACKAGE')
+            for name, bundle in bundles.items():
+                row = box.row()
+                row.label(text=bundle.get("description", name))
+                row.operator(
+                    "downloadrig.link_bundle",
+                    text=f"Importar ({len(bundle['rigs'])})",
+                    icon='LINKED'
+                ).bundle = name
+
         for rig_id, rig_data in database["rigs"].items():
             box = layout.box()
             row = box.row()
             char_name = rig_id.split('_')[-2]
+            row.operator(
+                "downloadrig.toggle_selection",
+                text="",
+                icon='CHECKBOX_HLT' if rig_id in selected else 'CHECKBOX_DEHLT',
+                emboss=False
+            ).rig_id = rig_id
             row.label(text=char_name)
             row = box.row()
             row.label(text=f"Versão: v{rig_data['latest_version']}")
@@ -445,23 +1994,387 @@ class DOWNLOADRIG_PT_download_panel(Panel):
             )
             link_op.rig_id = rig_id
 
+            instance_op = row.operator(
+                "downloadrig.add_instances",
+                text="",
+                icon='OUTLINER_OB_GROUP_INSTANCE'
+            )
+            instance_op.rig_id = rig_id
+
+class DOWNLOADRIG_PT_instances_panel(Panel):
+    bl_label = "Instâncias"
+    bl_idname = "DOWNLOADRIG_PT_instances_panel"
+    bl_space_type = 'VIEW_3D'
+    bl_region_type = 'UI'
+    bl_category = 'PeS'
+    bl_options = {'DEFAULT_CLOSED'}
+    bl_parent_id = "DOWNLOADRIG_PT_update_panel"
+
+    @timed_method("draw.instances")
+    def draw(self, context):
+        layout = self.layout
+        scene = context.scene
+
+        col = layout.column(align=True)
+        col.prop(scene, "pes_instance_count")
+        col.prop(scene, "pes_instance_offset")
+        layout.prop(scene, "pes_instance_display")
+
+        counts = {}
+        for obj in bpy.data.objects:
+            rig_id = obj.get("pes_rig_id")
+            if rig_id and obj.instance_type == 'COLLECTION':
+                counts[rig_id] = counts.get(rig_id, 0) + 1
+
+        if not counts:
+            layout.label(text="Nenhuma instância na cena", icon='INFO')
+            return
+
+        for rig_id, count in sorted(counts.items()):
+            row = layout.box().row(align=True)
+            row.label(text=f"{rig_id.split('_')[-2]}: {count}", icon='OUTLINER_OB_GROUP_INSTANCE')
+
+            add_op = row.operator("downloadrig.add_instances", text="", icon='ADD')
+            add_op.rig_id = rig_id
+            add_op.count = 1
+
+            remove_op = row.operator("downloadrig.remove_instances", text="", icon='REMOVE')
+            remove_op.rig_id = rig_id
+            remove_op.count = 1
+
+            clear_op = row.operator("downloadrig.remove_instances", text="", icon='TRASH')
+            clear_op.rig_id = rig_id
+            clear_op.count = 0
+
+class DOWNLOADRIG_OT_clear_timings(Operator):
+    bl_idname = "downloadrig.clear_timings"
+    bl_label = "Limpar Medições"
+    bl_description = "Descarta os tempos medidos nesta sessão"
+
+    def execute(self, context):
+        timings.clear()
+        return {'FINISHED'}
+
+class DOWNLOADRIG_PT_diagnostics_panel(Panel):
+    bl_label = "Diagnóstico"
+    bl_idname = "DOWNLOADRIG_PT_diagnostics_panel"
+    bl_space_type = 'VIEW_3D'
+    bl_region_type = 'UI'
+    bl_category = 'PeS'
+    bl_options = {'DEFAULT_CLOSED'}
+    bl_parent_id = "DOWNLOADRIG_PT_update_panel"
+
+    def draw(self, context):
+        layout = self.layout
+        summary = timings.summary()
+        if not summary:
+            layout.label(text="Nenhuma medição ainda", icon='INFO')
+            return
+
+        col = layout.column(align=True)
+        header = col.row()
+        header.label(text="Etapa")
+        header.label(text="n")
+        header.label(text="p50 (ms)")
+        header.label(text="p95 (ms)")
+        for stage, count, p50, p95, _ in summary:
+            row = col.row()
+            row.label(text=stage)
+            row.label(text=str(count))
+            row.label(text=f"{p50 * 1000:.1f}")
+            row.label(text=f"{p95 * 1000:.1f}")
+
+        if _bandwidth is not None and (_bandwidth.foreground.rate or _bandwidth.background.rate):
+            layout.label(
+                text=f"Banda: {_bandwidth.foreground.rate * 8 / 1e6:.0f} / "
+                     f"{_bandwidth.background.rate * 8 / 1e6:.0f} Mbit/s (0 = sem limite)",
+                icon='SORTTIME'
+            )
+        layout.operator("downloadrig.clear_timings", icon='TRASH')
+
+def update_timing_log(self, context):
+    """Aplica o caminho do log JSONL de tempos escolhido nas preferências"""
+    path = self.timing_log.strip()
+    timings.log_path = bpy.path.abspath(path) if path else None
+
+def update_bandwidth_limits(self, context):
+    """Reaplica os limites de banda quando as preferências mudam"""
+    if _bandwidth is not None:
+        apply_bandwidth_limits(self)
+
+class DOWNLOADRIG_PG_catalog_source(PropertyGroup):
+    url: StringProperty(
+        name="URL",
+        description="Endereço do rigs.json de outra produção ou de uma biblioteca compartilhada",
+        default=""
+    )
+    priority: IntProperty(
+        name="Prioridade",
+        description="Em rigs com o mesmo nome, vence o catálogo de maior prioridade (o principal tem 0 e vence empates)",
+        default=-1
+    )
+    ttl: IntProperty(
+        name="TTL (s)",
+        description="Segundos em que os painéis reaproveitam este catálogo sem consultar a rede",
+        default=CATALOG_TTL,
+        min=1
+    )
+    enabled: BoolProperty(
+        name="Ativo",
+        default=True
+    )
+
+class DOWNLOADRIG_OT_add_catalog(Operator):
+    bl_idname = "downloadrig.add_catalog"
+    bl_label = "Adicionar Catálogo"
+    bl_description = "Adiciona outro catálogo de rigs, combinado com o principal"
+
+    def execute(self, context):
+        get_preferences().extra_catalogs.add()
+        return {'FINISHED'}
+
+class DOWNLOADRIG_OT_remove_catalog(Operator):
+    bl_idname = "downloadrig.remove_catalog"
+    bl_label = "Remover Catálogo"
+    bl_description = "Remove este catálogo extra"
+
+    index: IntProperty()
+
+    def execute(self, context):
+        get_preferences().extra_catalogs.remove(self.index)
+        return {'FINISHED'}
+
+class DOWNLOADRIG_Preferences(AddonPreferences):
+    bl_idname = __package__
+
+    catalog_url: StringProperty(
+        name="URL do catálogo",
+        description="Substitui o catálogo padrão de rigs (deixe vazio para usar o padrão)",
+        default=""
+    )
+    cache_server: StringProperty(
+        name="Servidor de cache",
+        description="Endereço do cache da rede local, ex.: http://nas:8765 (deixe vazio para baixar direto)",
+        default=""
+    )
+    timing_log: StringProperty(
+        name="Log de tempos",
+        description="Arquivo JSONL onde cada etapa medida é registrada (deixe vazio para não gravar)",
+        default="",
+        subtype='FILE_PATH',
+        update=update_timing_log
+    )
+    foreground_limit: FloatProperty(
+        name="Limite dos downloads (Mbit/s)",
+        description="Banda máxima dos downloads pedidos pelo artista (0 = sem limite)",
+        default=0.0,
+        min=0.0,
+        update=update_bandwidth_limits
+    )
+    background_limit: FloatProperty(
+        name="Limite em segundo plano (Mbit/s)",
+        description="Banda máxima do pré-carregamento; cai ao mínimo enquanto houver um download pedido pelo artista (0 = sem limite)",
+        default=20.0,
+        min=0.0,
+        update=update_bandwidth_limits
+    )
+    prefetch_updates: BoolProperty(
+        name="Pré-carregar atualizações",
+        description="Ao abrir um arquivo, baixa em segundo plano as versões novas dos rigs linkados",
+        default=False
+    )
+    extra_catalogs: CollectionProperty(
+        type=DOWNLOADRIG_PG_catalog_source,
+        name="Catálogos extras"
+    )
+
+    def draw(self, context):
+        layout = self.layout
+        layout.prop(self, "catalog_url")
+        box = layout.box()
+        row = box.row()
+        row.label(text="Catálogos extras")
+        row.operator("downloadrig.add_catalog", text="", icon='ADD')
+        for index, source in enumerate(self.extra_catalogs):
+            row = box.row(align=True)
+            row.prop(source, "enabled", text="")
+            row.prop(source, "url", text="")
+            row.prop(source, "priority")
+            row.prop(source, "ttl")
+            row.operator("downloadrig.remove_catalog", text="", icon='X').index = index
+        layout.prop(self, "cache_server")
+        layout.prop(self, "timing_log")
+        col = layout.column(heading="Banda")
+        col.prop(self, "foreground_limit")
+        col.prop(self, "background_limit")
+        col.prop(self, "prefetch_updates")
+
 classes = (
+    DOWNLOADRIG_PG_catalog_source,
+    DOWNLOADRIG_OT_add_catalog,
+    DOWNLOADRIG_OT_remove_catalog,
+    DOWNLOADRIG_Preferences,
     DOWNLOADRIG_OT_download,
     DOWNLOADRIG_OT_download_and_link,
+    DOWNLOADRIG_PG_selected_rig,
+    DOWNLOADRIG_OT_toggle_selection,
+    DOWNLOADRIG_OT_link_selected,
+    DOWNLOADRIG_OT_link_bundle,
+    DOWNLOADRIG_OT_add_instances,
+    DOWNLOADRIG_OT_remove_instances,
     DOWNLOADRIG_OT_update,
     DOWNLOADRIG_OT_change_version,
     DOWNLOADRIG_OT_show_versions,
+    DOWNLOADRIG_OT_change_variant,
+    DOWNLOADRIG_OT_show_variants,
+    DOWNLOADRIG_OT_repair_libraries,
+    DOWNLOADRIG_OT_render_full,
+    DOWNLOADRIG_OT_clear_timings,
     DOWNLOADRIG_PT_update_panel,
     DOWNLOADRIG_PT_download_panel,
+    DOWNLOADRIG_PT_instances_panel,
+    DOWNLOADRIG_PT_diagnostics_panel,
 )
 
+@persistent
+def record_libraries_use(dummy):
+    """Ao abrir um arquivo, marca como usados os rigs que ele linka"""
+    # Renders em segundo plano não abrem o banco local só para registrar uso
+    if bpy.app.background:
+        return
+    filepaths = [bpy.path.abspath(lib.filepath) for lib in bpy.data.libraries if lib.filepath]
+    if filepaths:
+        record_file_use(*filepaths)
+
+@persistent
+def prefetch_linked_updates(dummy):
+    """Ao abrir um arquivo, pré-carrega as versões novas dos rigs linkados (se habilitado)"""
+    prefs = get_preferences()
+    if bpy.app.background or not prefs or not prefs.prefetch_updates:
+        return
+    download_dir = get_download_path()
+    filepaths = sorted({bpy.path.abspath(lib.filepath) for lib in bpy.data.libraries if lib.filepath})
+    if not download_dir or not filepaths:
+        return
+    # Preferências e bpy.data são lidos aqui; o resto roda no loop de rede
+    sources = get_catalog_sources()
+    settings = get_download_settings()
+    engine = get_engine()
+
+    async def prefetch():
+        await refresh_catalog_sources(sources, CATALOG_TTL)
+        database = merge_catalog_sources(sources)
+        return await engine.to_thread(prefetch_updates, database, filepaths, download_dir, settings)
+
+    def finished(future):
+        if future.exception() is not None:
+            print(f"PeS: pré-carregamento interrompido: {future.exception()}")
+        elif future.result():
+            print(f"PeS: {len(future.result())} atualizações pré-carregadas")
+            tag_redraw_pes_panels()
+
+    run_in_background(prefetch(), finished)
+
+def report_startup(register_seconds):
+    """Registra o custo de import/register; com PES_PROFILE_STARTUP=1 também imprime"""
+    timings.record("startup.import", _import_seconds)
+    timings.record("startup.register", register_seconds)
+    if os.environ.get("PES_PROFILE_STARTUP"):
+        import sys
+        heavy = [name for name in ("requests", "urllib3", "ssl", "sqlite3", "concurrent.futures")
+                 if name in sys.modules]
+        print(
+            f"PeS: import {_import_seconds * 1000:.2f} ms, register {register_seconds * 1000:.2f} ms"
+            f" (módulos pesados já carregados: {', '.join(heavy) or 'nenhum'})"
+        )
+
 def register():
+    register_started = time.perf_counter()
     for cls in classes:
         bpy.utils.register_class(cls)
 
+    bpy.types.WindowManager.pes_selected_rigs = CollectionProperty(
+        type=DOWNLOADRIG_PG_selected_rig,
+        name="Rigs selecionados",
+        description="Rigs marcados para importação em lote"
+    )
+    bpy.types.Scene.pes_instance_count = IntProperty(
+        name="Quantidade",
+        description="Número de instâncias criadas por clique",
+        default=10,
+        min=1,
+        max=500
+    )
+    bpy.types.Scene.pes_instance_offset = FloatVectorProperty(
+        name="Espaçamento",
+        description="Deslocamento entre instâncias consecutivas, a partir do cursor 3D",
+        default=(2.0, 0.0, 0.0),
+        subtype='TRANSLATION'
+    )
+    bpy.types.Scene.pes_instance_display = EnumProperty(
+        name="Exibição",
+        description="Como as instâncias aparecem na viewport",
+        items=INSTANCE_DISPLAY_ITEMS,
+        default='TEXTURED',
+        update=update_instance_display
+    )
+    bpy.types.Scene.pes_render_full = BoolProperty(
+        name="Rig completo no render",
+        description="Em renders pela linha de comando, troca variantes leves (proxy) pelo rig completo; "
+                    "no Blender aberto, use Renderizar com Rig Completo",
+        default=True
+    )
+
+    bpy.app.handlers.render_init.append(swap_variants_for_render)
+    bpy.app.handlers.render_complete.append(restore_variants_after_render)
+    bpy.app.handlers.render_cancel.append(restore_variants_after_render)
+    bpy.app.handlers.load_post.append(record_libraries_use)
+    bpy.app.handlers.load_post.append(prefetch_linked_updates)
+
+    prefs = get_preferences()
+    if prefs:
+        update_timing_log(prefs, bpy.context)
+
+    report_startup(time.perf_counter() - register_started)
+
 def unregister():
+    global _state_store, _engine, _bandwidth, _rig_folder_index, _merged_catalog, _federated_catalog
+    if _engine is not None:
+        _engine.stop()
+        _engine = None
+    if bpy.app.timers.is_registered(_dispatch_network_completions):
+        bpy.app.timers.unregister(_dispatch_network_completions)
+    _catalog_refreshing.clear()
+    _bandwidth = None
+    if bpy.app.timers.is_registered(_poll_rig_folder):
+        bpy.app.timers.unregister(_poll_rig_folder)
+    if _rig_folder_index is not None:
+        _rig_folder_index.close()
+        _rig_folder_index = None
+    _merged_catalog = (None, None, None)
+    _federated_catalog = (None, None)
+    bpy.app.handlers.load_post.remove(prefetch_linked_updates)
+    bpy.app.handlers.load_post.remove(record_libraries_use)
+    bpy.app.handlers.render_cancel.remove(restore_variants_after_render)
+    bpy.app.handlers.render_complete.remove(restore_variants_after_render)
+    bpy.app.handlers.render_init.remove(swap_variants_for_render)
+
+    del bpy.types.Scene.pes_render_full
+    del bpy.types.Scene.pes_instance_display
+    del bpy.types.Scene.pes_instance_offset
+    del bpy.types.Scene.pes_instance_count
+    del bpy.types.WindowManager.pes_selected_rigs
+
     for cls in reversed(classes):
         bpy.utils.unregister_class(cls)
 
+    _catalog_caches.clear()
+    timings.log_path = None
+    if _state_store is not None:
+        _state_store.close()
+        _state_store = None
+
+_import_seconds = time.perf_counter() - _import_started
+
 if __name__ == "__main__":
     register()
@@ -0,0 +1,116 @@
+"""Limite de banda dos downloads do PeS (token bucket)
+
+Downloads em primeiro plano (pedidos pelo artista) e em segundo plano
+(pré-carregamento de atualizações, prestage) têm orçamentos separados.
+Enquanto houver um download em primeiro plano, o segundo plano cai para
+YIELD_RATE, para que um pré-carregamento nunca atrase um clique.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+# Banda do segundo plano (bytes/s) enquanto há downloads em primeiro plano
+YIELD_RATE = 256 * 1024
+# Fichas acumuladas quando a transferência fica parada (segundos de banda)
+BURST_SECONDS = 0.25
+# Espera máxima de cada vez, para perceber logo uma mudança de taxa
+MAX_WAIT = 0.25
+
+
+def mbps_to_rate(mbps):
+    """Converte Mbit/s (como nas preferências) em bytes/s; 0 = sem limite"""
+    return max(0.0, mbps) * 1e6 / 8
+
+
+class TokenBucket:
+    """Balde de fichas em bytes/s, compartilhado entre threads; rate 0 = sem limite
+
+    consume() aceita dívida: um pedaço maior que o balde passa na hora e a
+    thread espera o tempo que ele custou, de modo que a média fica na taxa.
+    """
+
+    def __init__(self, rate=0):
+        self._lock = threading.Lock()
+        self._rate = rate
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+
+    @property
+    def rate(self):
+        return self._rate
+
+    def _refill(self):
+        now = time.monotonic()
+        if self._rate:
+            capacity = self._rate * BURST_SECONDS
+            self._tokens = min(capacity, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def set_rate(self, rate):
+        """Troca a taxa; a dívida pendente passa a ser paga na taxa nova"""
+        with self._lock:
+            self._refill()
+            self._rate = rate
+            if not rate:
+                self._tokens = 0.0
+
+    def consume(self, nbytes):
+        """Desconta nbytes e espera enquanto o balde estiver negativo"""
+        with self._lock:
+            if not self._rate:
+                return
+            self._refill()
+            self._tokens -= nbytes
+        while True:
+            with self._lock:
+                self._refill()
+                if not self._rate or self._tokens >= 0:
+                    return
+                wait = -self._tokens / self._rate
+            time.sleep(min(wait, MAX_WAIT))
+
+
+class BandwidthBudget:
+    """Orçamentos de primeiro e segundo plano do processo"""
+
+    def __init__(self, foreground_rate=0, background_rate=0):
+        self.foreground = TokenBucket(foreground_rate)
+        self.background = TokenBucket(background_rate)
+        self._background_rate = background_rate
+        self._active_foreground = 0
+        self._lock = threading.Lock()
+
+    @property
+    def active_foreground(self):
+        """Downloads em primeiro plano em andamento"""
+        return self._active_foreground
+
+    def configure(self, foreground_rate, background_rate):
+        """Aplica novas taxas (bytes/s, 0 = sem limite)"""
+        self.foreground.set_rate(foreground_rate)
+        with self._lock:
+            self._background_rate = background_rate
+            self._apply_background()
+
+    def _apply_background(self):
+        rate = self._background_rate
+        if self._active_foreground:
+            rate = min(rate, YIELD_RATE) if rate else YIELD_RATE
+        self.background.set_rate(rate)
+
+    @contextmanager
+    def transfer(self, background=False):
+        """Vale para uma transferência; devolve throttle(nbytes), chamado a cada pedaço"""
+        if background:
+            yield self.background.consume
+            return
+        with self._lock:
+            self._active_foreground += 1
+            self._apply_background()
+        try:
+            yield self.foreground.consume
+        finally:
+            with self._lock:
+                self._active_foreground -= 1
+                self._apply_background()
@@ -0,0 +1,272 @@
+"""Leitor mínimo de arquivos .blend sem depender do Blender
+
+Lê os cabeçalhos de bloco e o SDNA para extrair informações simples
+(bibliotecas linkadas, nomes de collections, caminhos de imagens) sem abrir o
+arquivo no Blender. Suporta o formato clássico de 12 bytes, o formato com
+cabeçalho estendido do Blender 5 e arquivos comprimidos com gzip ou zstd
+(este último quando houver um módulo zstd disponível).
+"""
+
+import gzip
+import re
+import struct
+
+# Blocos cujo conteúdo é guardado durante a leitura (prefixo de até PREFIX_SIZE bytes)
+DEFAULT_CODES = (b'LI', b'GR', b'IM', b'ID')
+PREFIX_SIZE = 4096
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+_ARRAY_RE = re.compile(r'\[(\d+)\]')
+
+
+class BlendFileError(Exception):
+    """Arquivo .blend inválido ou em formato não suportado"""
+
+
+class Block:
+    """Bloco de dados do arquivo (cabeçalho + prefixo dos dados quando guardado)"""
+
+    __slots__ = ("code", "offset", "header_size", "size", "old", "sdna_index", "count", "data")
+
+    def __init__(self, code, offset, header_size, size, old, sdna_index, count):
+        self.code = code
+        self.offset = offset
+        self.header_size = header_size
+        self.size = size
+        self.old = old
+        self.sdna_index = sdna_index
+        self.count = count
+        self.data = None
+
+    @property
+    def end(self):
+        """Posição do primeiro byte depois do bloco"""
+        return self.offset + self.header_size + self.size
+
+
+def _open_zstd(path):
+    try:
+        from compression import zstd
+        return zstd.open(path, 'rb')
+    except ImportError:
+        pass
+    try:
+        import zstandard
+    except ImportError:
+        raise BlendFileError("Arquivo comprimido com zstd e nenhum módulo zstd disponível")
+    return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+
+
+def open_blend(path):
+    """Abre o arquivo devolvendo um objeto de leitura já descomprimido"""
+    with open(path, 'rb') as f:
+        magic = f.read(4)
+    if magic[:2] == GZIP_MAGIC:
+        return gzip.open(path, 'rb'), True
+    if magic == ZSTD_MAGIC:
+        return _open_zstd(path), True
+    return open(path, 'rb'), False
+
+
+def _skip(f, count):
+    """Avança count bytes; leitores comprimidos podem não suportar seek"""
+    try:
+        f.seek(count, 1)
+        return
+    except (OSError, AttributeError, ValueError):
+        pass
+    while count > 0:
+        data = f.read(min(count, 1024 * 1024))
+        if not data:
+            raise BlendFileError("Fim inesperado do arquivo")
+        count -= len(data)
+
+
+class BlendFile:
+    """Índice dos blocos e estruturas SDNA de um arquivo .blend"""
+
+    def __init__(self, path, codes=DEFAULT_CODES, prefix_size=PREFIX_SIZE):
+        self.path = path
+        self.blocks = []
+        self.structs = {}
+        self.struct_names = []
+        self._codes = set(codes)
+        self._prefix_size = prefix_size
+
+        f, self.compressed = open_blend(path)
+        with f:
+            self._read_header(f)
+            self._read_blocks(f)
+
+    def _read_header(self, f):
+        start = f.read(12)
+        if len(start) < 12 or not start.startswith(b'BLENDER'):
+            raise BlendFileError(f"Não é um arquivo .blend: {self.path}")
+
+        if start[7:9].isdigit():
+            # Formato estendido: BLENDER + tamanho do cabeçalho + -01 + endian + versão
+            header_size = int(start[7:9])
+            rest = f.read(header_size - 12)
+            header = start + rest
+            self.pointer_size = 8
+            self.large_bhead = True
+            endian = header[12:13]
+            self.version = int(header[13:17])
+        else:
+            header_size = 12
+            self.pointer_size = 4 if start[7:8] == b'_' else 8
+            self.large_bhead = False
+            endian = start[8:9]
+            self.version = int(start[9:12])
+
+        self.endian = '<' if endian == b'v' else '>'
+        self.header_size = header_size
+        if self.large_bhead:
+            # code, SDNAnr, old, len, nr
+            self._bhead = struct.Struct(self.endian + '4siQqq')
+        elif self.pointer_size == 8:
+            self._bhead = struct.Struct(self.endian + '4siQii')
+        else:
+            self._bhead = struct.Struct(self.endian + '4siIii')
+
+    def _read_blocks(self, f):
+        offset = self.header_size
+        size_bhead = self._bhead.size
+        dna_data = None
+        while True:
+            raw = f.read(size_bhead)
+            if len(raw) < size_bhead:
+                break
+            if self.large_bhead:
+                code, sdna_index, old, size, count = self._bhead.unpack(raw)
+            else:
+                code, size, old, sdna_index, count = self._bhead.unpack(raw)
+            code = code.rstrip(b'\x00')
+            block = Block(code, offset, size_bhead, size, old, sdna_index, count)
+            self.blocks.append(block)
+            offset = block.end
+
+            if code == b'ENDB':
+                break
+            if code == b'DNA1':
+                dna_data = f.read(size)
+            elif code in self._codes:
+                keep = min(size, self._prefix_size)
+                block.data = f.read(keep)
+                _skip(f, size - keep)
+            else:
+                _skip(f, size)
+
+        if dna_data is None:
+            raise BlendFileError(f"Arquivo sem SDNA: {self.path}")
+        self._parse_sdna(dna_data)
+
+    def _parse_sdna(self, data):
+        endian = self.endian
+        pos = 0
+
+        def expect(tag):
+            nonlocal pos
+            pos = (pos + 3) & ~3
+            if data[pos:pos + 4] != tag:
+                raise BlendFileError(f"SDNA inválido: esperado {tag!r}")
+            pos += 4
+
+        def read_int():
+            nonlocal pos
+            value = struct.unpack_from(endian + 'i', data, pos)[0]
+            pos += 4
+            return value
+
+        def read_strings(count):
+            nonlocal pos
+            result = []
+            for _ in range(count):
+                end = data.index(b'\x00', pos)
+                result.append(data[pos:end].decode('ascii', 'replace'))
+                pos = end + 1
+            return result
+
+        if data[:4] != b'SDNA':
+            raise BlendFileError("SDNA inválido")
+        pos = 4
+        expect(b'NAME')
+        names = read_strings(read_int())
+        expect(b'TYPE')
+        types = read_strings(read_int())
+        expect(b'TLEN')
+        lengths = struct.unpack_from(endian + f'{len(types)}h', data, pos)
+        pos += 2 * len(types)
+        expect(b'STRC')
+        struct_count = read_int()
+
+        for _ in range(struct_count):
+            type_index, field_count = struct.unpack_from(endian + 'hh', data, pos)
+            pos += 4
+            fields = {}
+            field_offset = 0
+            for _ in range(field_count):
+                field_type, field_name = struct.unpack_from(endian + 'hh', data, pos)
+                pos += 4
+                name = names[field_name]
+                count = 1
+                for dim in _ARRAY_RE.findall(name):
+                    count *= int(dim)
+                if name.startswith('*') or name.startswith('(*'):
+                    field_size = self.pointer_size * count
+                else:
+                    field_size = lengths[field_type] * count
+                bare = name.lstrip('*(').split('[')[0].split(')')[0]
+                fields[bare] = (types[field_type], field_offset, field_size)
+                field_offset += field_size
+            self.structs[types[type_index]] = fields
+            self.struct_names.append(types[type_index])
+
+    def struct_name(self, block):
+        """Nome da estrutura SDNA armazenada no bloco"""
+        if 0 <= block.sdna_index < len(self.struct_names):
+            return self.struct_names[block.sdna_index]
+        return None
+
+    def get_string(self, block, field, struct_name=None):
+        """Lê um campo char[] do bloco como texto"""
+        fields = self.structs.get(struct_name or self.struct_name(block), {})
+        if field not in fields or block.data is None:
+            return None
+        _, offset, size = fields[field]
+        raw = block.data[offset:offset + size]
+        return raw.split(b'\x00', 1)[0].decode('utf-8', 'replace')
+
+    def id_name(self, block):
+        """Nome do datablock sem o prefixo de dois caracteres (ex.: 'GR')"""
+        name = self.get_string(block, 'name', 'ID')
+        return name[2:] if name else None
+
+    def iter_blocks(self, code):
+        for block in self.blocks:
+            if block.code == code:
+                yield block
+
+    def libraries(self):
+        """Caminhos das bibliotecas linkadas, como gravados no arquivo"""
+        result = []
+        for block in self.iter_blocks(b'LI'):
+            path = self.get_string(block, 'filepath') or self.get_string(block, 'name')
+            if path:
+                result.append(path)
+        return result
+
+    def collections(self):
+        """Nomes das collections locais do arquivo"""
+        return [name for name in (self.id_name(b) for b in self.iter_blocks(b'GR')) if name]
+
+    def images(self):
+        """Caminhos de arquivo das imagens do arquivo"""
+        result = []
+        for block in self.iter_blocks(b'IM'):
+            path = self.get_string(block, 'filepath') or self.get_string(block, 'name')
+            if path:
+                result.append(path)
+        return result
@@ -0,0 +1,198 @@
+"""Pacotes de rigs: várias versões baixadas num único .tar transmitido
+
+O catálogo descreve os pacotes em "bundles":
+
+    "bundles": {
+        "seq03_cast": {
+            "description": "Elenco da sequência 03",
+            "url": "https://.../seq03_cast.tar",
+            "rigs": {"PES_CHR_Poba_RIG": 3, "PES_CHR_Sagu_RIG": 5}
+        }
+    }
+
+Cada membro do tar tem o nome do arquivo da versão no catálogo; hash e
+tamanho vêm do version_info dela. O tar é lido enquanto chega e cada membro
+vai direto para a pasta de rigs, conferido antes de aparecer no destino.
+"""
+
+import hashlib
+import http.client
+import os
+import tarfile
+import time
+
+import requests
+import urllib3
+
+from .downloader import (
+    BUFFER_SIZE, MAX_ATTEMPTS, RETRY_STATUS, DownloadError, IntegrityError,
+    _backoff_delay, _open_stream, _preallocate, _raw_stream, _write_all,
+    forget_redirect, get_part_path,
+)
+from .locks import FileLock
+from .timing import span
+
+
+class _BodyReader:
+    """Corpo da resposta como arquivo para o tarfile, com progresso e limite de banda"""
+
+    def __init__(self, response, progress=None, throttle=None):
+        self.response = response
+        self.stream = _raw_stream(response) or response.raw
+        if self.stream is response.raw:
+            response.raw.decode_content = True
+        self.progress = progress
+        self.throttle = throttle
+        expected = response.headers.get("Content-Length")
+        self.total = int(expected) if expected and expected.isdigit() else None
+        self.received = 0
+
+    def read(self, size=-1):
+        try:
+            data = self.stream.read(size)
+        except (http.client.HTTPException, urllib3.exceptions.HTTPError, OSError) as e:
+            raise requests.ConnectionError(f"Transferência interrompida ({self.response.url}): {e}") from e
+        if not data and size and self.total is not None and self.received != self.total:
+            raise requests.ConnectionError(
+                f"Transferência interrompida ({self.response.url}): {self.received} de {self.total} bytes"
+            )
+        self.received += len(data)
+        if self.progress:
+            self.progress(self.received, self.total)
+        if self.throttle and data:
+            self.throttle(len(data))
+        return data
+
+
+def _extract_member(source, filepath, expected_size, sha256=None, size=None):
+    """Grava um membro do tar em filepath, conferindo tamanho e hash antes de movê-lo"""
+    part_path = get_part_path(filepath)
+    hasher = hashlib.sha256() if sha256 else None
+    buffer = bytearray(BUFFER_SIZE)
+    view = memoryview(buffer)
+    written = 0
+    try:
+        with open(part_path, 'wb', buffering=0) as f:
+            _preallocate(f.fileno(), expected_size)
+            while True:
+                read = source.readinto(view)
+                if not read:
+                    break
+                chunk = view[:read]
+                _write_all(f, chunk)
+                written += read
+                if hasher:
+                    hasher.update(chunk)
+            os.fsync(f.fileno())
+        if written != expected_size:
+            raise requests.ConnectionError(f"{os.path.basename(filepath)} incompleto no pacote")
+        if size is not None and written != size:
+            raise IntegrityError(f"{os.path.basename(filepath)}: tamanho {written} difere do esperado {size}")
+        if hasher and hasher.hexdigest() != sha256:
+            raise IntegrityError(f"{os.path.basename(filepath)}: sha256 não confere")
+        os.replace(part_path, filepath)
+    finally:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+
+
+def extract_bundle(response, download_dir, members, progress=None, throttle=None, on_file=None):
+    """Extrai do tar da resposta os membros pedidos enquanto ele chega
+
+    members: {nome do arquivo: (sha256, tamanho)}, ambos opcionais. Só o nome
+    base de cada membro é usado, e membros não pedidos são pulados. Retorna
+    {nome: erro} dos membros que não conferiram; on_file(caminho, sha256) é
+    chamado para cada arquivo gravado.
+    """
+    failed = {}
+    reader = _BodyReader(response, progress, throttle)
+    try:
+        with tarfile.open(fileobj=reader, mode="r|*", bufsize=BUFFER_SIZE) as tar:
+            for info in tar:
+                name = os.path.basename(info.name)
+                if not info.isfile() or name not in members or name in failed:
+                    continue
+                sha256, size = members[name]
+                filepath = os.path.join(download_dir, name)
+                with FileLock(filepath) as lock:
+                    if lock.waited and os.path.exists(filepath):
+                        # Outro processo baixou o mesmo rig enquanto este esperava
+                        continue
+                    try:
+                        _extract_member(tar.extractfile(info), filepath, info.size, sha256, size)
+                    except IntegrityError as e:
+                        failed[name] = e
+                        continue
+                if on_file:
+                    on_file(filepath, sha256)
+    except tarfile.ReadError as e:
+        if isinstance(e.__context__, requests.ConnectionError):
+            raise e.__context__
+        raise DownloadError(f"Pacote inválido ({response.url}): {e}") from e
+    return failed
+
+
+def download_bundle(urls, download_dir, members, progress=None, throttle=None, on_file=None):
+    """Baixa o pacote do primeiro mirror disponível e extrai os membros que faltam
+
+    Uma conexão que cai no meio do pacote é retomada com um pedido novo, só
+    pelos membros ainda ausentes. Retorna {nome: erro} dos membros que não
+    chegaram ou não conferiram, para serem baixados um a um.
+    """
+    if isinstance(urls, str):
+        urls = [urls]
+
+    members = dict(members)
+    failed = {}
+    last_error = None
+    for url in urls:
+        for attempt in range(MAX_ATTEMPTS):
+            members = {
+                name: expected for name, expected in members.items()
+                if name not in failed and not os.path.exists(os.path.join(download_dir, name))
+            }
+            if not members:
+                return failed
+            try:
+                response = _open_stream(url)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                last_error = e
+                time.sleep(_backoff_delay(attempt))
+                continue
+
+            with response:
+                if response.status_code in RETRY_STATUS:
+                    last_error = requests.HTTPError(
+                        f"{response.status_code} {response.reason} ({url})", response=response
+                    )
+                    time.sleep(_backoff_delay(attempt, response.headers.get("Retry-After")))
+                    continue
+                if not response.ok:
+                    last_error = requests.HTTPError(
+                        f"{response.status_code} {response.reason} ({url})", response=response
+                    )
+                    break
+
+                try:
+                    with span("http.transfer"):
+                        failed.update(extract_bundle(
+                            response, download_dir, members, progress, throttle, on_file
+                        ))
+                except (requests.ConnectionError, requests.Timeout,
+                        requests.exceptions.ChunkedEncodingError) as e:
+                    last_error = e
+                    forget_redirect(url)
+                    time.sleep(_backoff_delay(attempt))
+                    continue
+                except DownloadError as e:
+                    last_error = e
+                    break
+            # Membros que o pacote não trouxe ficam para o download individual
+            for name in members:
+                if name not in failed and not os.path.exists(os.path.join(download_dir, name)):
+                    failed[name] = DownloadError(f"{name} não está no pacote ({url})")
+            return failed
+
+    error = DownloadError(str(last_error) if last_error else "Nenhuma URL de pacote disponível")
+    failed.update({name: error for name in members if name not in failed})
+    return failed
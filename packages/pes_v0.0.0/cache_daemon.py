@@ -0,0 +1,454 @@
+"""Cache HTTP da rede local para o catálogo e os rigs do PeS
+
+Processo opcional, independente do Blender, para rodar numa estação ou no NAS
+do estúdio. Usa apenas a biblioteca padrão do Python:
+
+    python cache_daemon.py --cache-dir /srv/pes-cache --port 8765
+
+No Blender, aponte as preferências do PeS ("Servidor de cache") para
+http://<maquina>:8765. Rotas:
+
+    GET /catalog?url=<url>               catálogo (rigs.json) com TTL curto
+    GET /fetch?url=<url>[&sha256=<hex>]  arquivo de rig, com suporte a Range
+                                         (HEAD responde sem baixar da origem)
+    GET /status                          estatísticas do cache
+
+O primeiro pedido de um arquivo baixa da origem uma única vez; pedidos
+simultâneos recebem os bytes conforme eles chegam e os seguintes são servidos
+do disco. Quando sha256 é informado o arquivo só é mantido se o hash conferir.
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_PORT = 8765
+DEFAULT_ALLOWED_HOSTS = (
+    "dropbox.com",
+    "dropboxusercontent.com",
+    "igormunizart.github.io",
+)
+CATALOG_TTL = 60
+UPSTREAM_TIMEOUT = 60
+UPSTREAM_ATTEMPTS = 3
+COPY_BUFFER = 1024 * 1024
+USER_AGENT = "pes-cache-daemon"
+
+
+def _host_allowed(url, allowed_hosts):
+    """Verifica se a URL aponta para um host permitido (evita proxy aberto)"""
+    parsed = urllib.parse.urlsplit(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        return False
+    host = parsed.hostname.lower()
+    return any(host == h or host.endswith("." + h) for h in allowed_hosts)
+
+
+def _open_upstream(url, method="GET"):
+    """Abre a URL de origem repetindo falhas transitórias"""
+    last_error = None
+    for attempt in range(UPSTREAM_ATTEMPTS):
+        try:
+            request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT}, method=method)
+            return urllib.request.urlopen(request, timeout=UPSTREAM_TIMEOUT)
+        except urllib.error.HTTPError as e:
+            if e.code not in (429, 500, 502, 503, 504):
+                raise
+            last_error = e
+        except (urllib.error.URLError, OSError) as e:
+            last_error = e
+        time.sleep(0.5 * (2 ** attempt))
+    raise last_error
+
+
+def parse_range(header, size):
+    """Interpreta um cabeçalho Range de intervalo único
+
+    Retorna (inicio, fim) inclusivo, None se não houver Range válido a aplicar
+    ou levanta ValueError se o intervalo não for satisfazível.
+    """
+    if not header or not header.startswith("bytes=") or ',' in header:
+        return None
+    start, _, end = header[len("bytes="):].strip().partition('-')
+    try:
+        if start == "":
+            length = int(end)
+            if length <= 0:
+                raise ValueError(header)
+            return max(size - length, 0), size - 1
+        first = int(start)
+        last = int(end) if end else size - 1
+    except ValueError:
+        return None
+    if first >= size or last < first:
+        raise ValueError(header)
+    return first, min(last, size - 1)
+
+
+class Transfer:
+    """Download em andamento da origem, legível enquanto é gravado"""
+
+    def __init__(self, part_path):
+        self.part_path = part_path
+        self.cond = threading.Condition()
+        self.size = None
+        self.written = 0
+        self.done = False
+        self.error = None
+
+    def wait_for(self, position):
+        """Bloqueia até existirem bytes além de position ou a transferência acabar"""
+        with self.cond:
+            while self.written <= position and not self.done and self.error is None:
+                self.cond.wait(1.0)
+            if self.error is not None:
+                raise self.error
+            return self.written
+
+    def wait_for_size(self):
+        """Bloqueia até o tamanho total ser conhecido"""
+        with self.cond:
+            while self.size is None and not self.done and self.error is None:
+                self.cond.wait(1.0)
+            if self.error is not None:
+                raise self.error
+            return self.size if self.size is not None else self.written
+
+
+class CacheStore:
+    """Objetos em disco indexados pelo hash da URL de origem"""
+
+    def __init__(self, root, allowed_hosts, catalog_ttl=CATALOG_TTL):
+        self.root = root
+        self.allowed_hosts = tuple(h.lower() for h in allowed_hosts)
+        self.catalog_ttl = catalog_ttl
+        self.objects_dir = os.path.join(root, "objects")
+        self.tmp_dir = os.path.join(root, "tmp")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._transfers = {}
+        self._catalogs = {}
+        self._catalog_lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "bytes_upstream": 0, "bytes_served": 0}
+
+    def object_path(self, key):
+        return os.path.join(self.objects_dir, key[:2], key)
+
+    def _read_meta(self, key):
+        try:
+            with open(self.object_path(key) + ".json", 'r', encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def open_object(self, url, sha256=None):
+        """Retorna ("file", caminho, tamanho) do cache ou ("transfer", Transfer, None)"""
+        if not _host_allowed(url, self.allowed_hosts):
+            raise PermissionError(f"Host não permitido: {url}")
+
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        path = self.object_path(key)
+        with self._lock:
+            meta = self._read_meta(key)
+            if meta is not None and os.path.exists(path):
+                if not sha256 or meta.get("sha256") == sha256.lower():
+                    self.stats["hits"] += 1
+                    os.utime(path + ".json")
+                    return "file", path, meta["size"]
+
+            transfer = self._transfers.get(key)
+            if transfer is None:
+                self.stats["misses"] += 1
+                part_path = os.path.join(self.tmp_dir, f"{key}.{os.getpid()}.part")
+                transfer = Transfer(part_path)
+                # Cria o arquivo antes de liberar leitores que vão abri-lo
+                open(part_path, 'wb').close()
+                self._transfers[key] = transfer
+                thread = threading.Thread(
+                    target=self._fetch, args=(key, url, sha256, transfer), daemon=True
+                )
+                thread.start()
+        return "transfer", transfer, None
+
+    def head_object(self, url, sha256=None):
+        """Tamanho do arquivo (ou None) sem iniciar uma transferência da origem
+
+        Vem dos metadados do cache ou de uma transferência em andamento; sem
+        nenhum dos dois, o HEAD é repassado à origem.
+        """
+        if not _host_allowed(url, self.allowed_hosts):
+            raise PermissionError(f"Host não permitido: {url}")
+
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        with self._lock:
+            meta = self._read_meta(key)
+            if meta is not None and os.path.exists(self.object_path(key)):
+                if not sha256 or meta.get("sha256") == sha256.lower():
+                    return meta["size"]
+            transfer = self._transfers.get(key)
+        if transfer is not None and transfer.size is not None:
+            return transfer.size
+        with _open_upstream(url, "HEAD") as response:
+            length = response.headers.get("Content-Length")
+        return int(length) if length and length.isdigit() else None
+
+    def _fetch(self, key, url, sha256, transfer):
+        """Baixa da origem para o arquivo temporário, notificando leitores"""
+        digest = hashlib.sha256()
+        try:
+            with _open_upstream(url) as response, open(transfer.part_path, 'r+b') as f:
+                length = response.headers.get("Content-Length")
+                with transfer.cond:
+                    transfer.size = int(length) if length else None
+                    transfer.cond.notify_all()
+                while True:
+                    chunk = response.read(COPY_BUFFER)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+                    f.flush()
+                    digest.update(chunk)
+                    with transfer.cond:
+                        transfer.written += len(chunk)
+                        transfer.cond.notify_all()
+
+            actual = digest.hexdigest()
+            if sha256 and actual != sha256.lower():
+                raise ValueError(f"Hash divergente para {url}: {actual}")
+
+            path = self.object_path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            try:
+                os.replace(transfer.part_path, path)
+            except PermissionError:
+                # Windows não renomeia arquivos abertos por leitores
+                shutil.copyfile(transfer.part_path, path)
+            meta = {
+                "url": url,
+                "size": transfer.written,
+                "sha256": actual,
+                "fetched_at": time.time(),
+            }
+            with open(path + ".json", 'w', encoding="utf-8") as f:
+                json.dump(meta, f)
+
+            with transfer.cond:
+                transfer.size = transfer.written
+                transfer.done = True
+                transfer.cond.notify_all()
+            self.stats["bytes_upstream"] += transfer.written
+        except Exception as e:
+            print(f"Erro ao baixar {url}: {e}", file=sys.stderr)
+            with transfer.cond:
+                transfer.error = e
+                transfer.cond.notify_all()
+        finally:
+            with self._lock:
+                self._transfers.pop(key, None)
+            if transfer.error is not None or os.path.exists(transfer.part_path):
+                try:
+                    os.remove(transfer.part_path)
+                except OSError:
+                    pass
+
+    def get_catalog(self, url):
+        """Retorna (corpo, etag) do catálogo, renovando após o TTL"""
+        if not _host_allowed(url, self.allowed_hosts):
+            raise PermissionError(f"Host não permitido: {url}")
+
+        with self._catalog_lock:
+            cached = self._catalogs.get(url)
+            if cached is not None and time.time() - cached[2] < self.catalog_ttl:
+                return cached[0], cached[1]
+            try:
+                with _open_upstream(url) as response:
+                    body = response.read()
+                json.loads(body)
+            except Exception as e:
+                if cached is None:
+                    raise
+                # Origem fora do ar: serve a última cópia conhecida
+                print(f"Usando catálogo antigo para {url}: {e}", file=sys.stderr)
+                self._catalogs[url] = (cached[0], cached[1], time.time())
+                return cached[0], cached[1]
+
+            etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+            self._catalogs[url] = (body, etag, time.time())
+            return body, etag
+
+
+class CacheRequestHandler(BaseHTTPRequestHandler):
+    server_version = "PeSCache/1.0"
+    store = None
+
+    def log_message(self, format, *args):
+        sys.stderr.write("%s - %s\n" % (self.address_string(), format % args))
+
+    def do_HEAD(self):
+        self._handle(send_body=False)
+
+    def do_GET(self):
+        self._handle(send_body=True)
+
+    def _handle(self, send_body):
+        parsed = urllib.parse.urlsplit(self.path)
+        query = urllib.parse.parse_qs(parsed.query)
+        url = query.get("url", [None])[0]
+        try:
+            if parsed.path == "/status":
+                self._send_bytes(json.dumps(self.store.stats).encode("utf-8"),
+                                 "application/json", send_body)
+            elif parsed.path == "/catalog" and url:
+                self._send_catalog(url, send_body)
+            elif parsed.path == "/fetch" and url:
+                self._send_object(url, query.get("sha256", [None])[0], send_body)
+            else:
+                self.send_error(404)
+        except PermissionError as e:
+            self.send_error(403, str(e))
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        except Exception as e:
+            self.send_error(502, str(e))
+
+    def _send_bytes(self, body, content_type, send_body, extra_headers=()):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in extra_headers:
+            self.send_header(name, value)
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def _send_catalog(self, url, send_body):
+        body, etag = self.store.get_catalog(url)
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        headers = [("ETag", etag), ("Cache-Control", f"max-age={self.store.catalog_ttl}")]
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body)
+            headers.append(("Content-Encoding", "gzip"))
+        self._send_bytes(body, "application/json", send_body, headers)
+
+    def _send_object(self, url, sha256, send_body):
+        if not send_body:
+            self._send_object_head(url, sha256)
+            return
+        kind, source, size = self.store.open_object(url, sha256)
+        if kind == "transfer" and self.headers.get("Range"):
+            size = source.wait_for_size()
+
+        byte_range = None
+        if size is not None:
+            try:
+                byte_range = parse_range(self.headers.get("Range"), size)
+            except ValueError:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.end_headers()
+                return
+
+        if byte_range is not None:
+            start, end = byte_range
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        else:
+            start, end = 0, (size - 1 if size is not None else None)
+            self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Accept-Ranges", "bytes")
+        if end is not None:
+            self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        if not send_body:
+            return
+
+        if kind == "file":
+            self._copy_file(source, start, end)
+        else:
+            self._copy_transfer(source, start, end)
+
+    def _send_object_head(self, url, sha256):
+        # HEAD só consulta o tamanho: não baixa o arquivo da origem
+        size = self.store.head_object(url, sha256)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Accept-Ranges", "bytes")
+        if size is not None:
+            self.send_header("Content-Length", str(size))
+        self.end_headers()
+
+    def _copy_file(self, path, start, end):
+        remaining = end - start + 1
+        with open(path, 'rb') as f:
+            f.seek(start)
+            while remaining > 0:
+                chunk = f.read(min(COPY_BUFFER, remaining))
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+                remaining -= len(chunk)
+                self.store.stats["bytes_served"] += len(chunk)
+
+    def _copy_transfer(self, transfer, start, end):
+        """Envia os bytes de uma transferência em andamento conforme chegam"""
+        position = start
+        with open(transfer.part_path, 'rb') as f:
+            f.seek(start)
+            while end is None or position <= end:
+                available = transfer.wait_for(position)
+                if available <= position:
+                    break
+                limit = available if end is None else min(available, end + 1)
+                while position < limit:
+                    chunk = f.read(min(COPY_BUFFER, limit - position))
+                    if not chunk:
+                        break
+                    self.wfile.write(chunk)
+                    position += len(chunk)
+                    self.store.stats["bytes_served"] += len(chunk)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cache HTTP da rede local para o PeS")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--cache-dir", required=True, help="Pasta onde os arquivos ficam guardados")
+    parser.add_argument("--catalog-ttl", type=int, default=CATALOG_TTL,
+                        help="Segundos até renovar o catálogo na origem")
+    parser.add_argument("--allow-host", action="append", default=None,
+                        help="Host de origem permitido (pode repetir)")
+    args = parser.parse_args(argv)
+
+    store = CacheStore(args.cache_dir, args.allow_host or DEFAULT_ALLOWED_HOSTS, args.catalog_ttl)
+    handler = type("Handler", (CacheRequestHandler,), {"store": store})
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    server.daemon_threads = True
+    print(f"Cache do PeS em http://{args.host}:{args.port} ({args.cache_dir})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,323 @@
+"""Catálogo de rigs: transporte comprimido, revalidação por ETag e cache local binário
+
+O cache em disco guarda o catálogo já indexado por rig: um cabeçalho com a
+tabela de offsets seguido do JSON compacto de cada rig. Abrir o cache lê só
+o índice; cada rig é decodificado na primeira vez em que é acessado.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import struct
+import threading
+import time
+from collections.abc import Mapping
+
+import requests
+
+from .downloader import get_session, CONNECT_TIMEOUT
+
+MAGIC = b"PESC"
+CACHE_FORMAT = 1
+# magic, formato, instante da última busca, quantidade de rigs
+_HEADER = struct.Struct("<4sHdI")
+# tamanho do id, offset e tamanho do JSON do rig
+_ENTRY = struct.Struct("<HII")
+_LENGTH = struct.Struct("<I")
+CATALOG_TIMEOUT = 10
+
+
+class CatalogCacheError(Exception):
+    """Arquivo de cache do catálogo ausente, corrompido ou de outro formato"""
+
+
+class LazyRigs(Mapping):
+    """Rigs do cache binário, decodificados sob demanda"""
+
+    def __init__(self, buffer, index):
+        self._buffer = buffer
+        self._index = index
+        self._decoded = {}
+
+    def __getitem__(self, rig_id):
+        rig = self._decoded.get(rig_id)
+        if rig is None:
+            offset, length = self._index[rig_id]
+            rig = self._decoded[rig_id] = json.loads(bytes(self._buffer[offset:offset + length]))
+        return rig
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+
+def catalog_cache_filename(url):
+    """Nome do arquivo de cache de uma URL de catálogo"""
+    return f"catalog-{hashlib.sha1(url.encode('utf-8')).hexdigest()[:12]}.bin"
+
+
+def _pack_string(text):
+    data = (text or "").encode("utf-8")
+    return _LENGTH.pack(len(data)) + data
+
+
+def write_catalog_cache(path, catalog, url, etag=None, fetched_at=None):
+    """Grava o catálogo no formato binário indexado (troca atômica do arquivo)"""
+    extra = {key: value for key, value in catalog.items() if key != "rigs"}
+    blobs = []
+    entries = []
+    offset = 0
+    for rig_id, rig in catalog.get("rigs", {}).items():
+        blob = json.dumps(rig, separators=(',', ':'), ensure_ascii=False).encode("utf-8")
+        key = rig_id.encode("utf-8")
+        entries.append(_ENTRY.pack(len(key), offset, len(blob)) + key)
+        blobs.append(blob)
+        offset += len(blob)
+
+    parts = [
+        _HEADER.pack(MAGIC, CACHE_FORMAT, fetched_at or time.time(), len(entries)),
+        _pack_string(url),
+        _pack_string(etag),
+        _pack_string(json.dumps(extra, separators=(',', ':'), ensure_ascii=False)),
+    ]
+    parts.extend(entries)
+    parts.extend(blobs)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(b"".join(parts))
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def read_catalog_cache(path):
+    """Abre o cache binário e retorna (catálogo, url, etag, instante da busca)"""
+    try:
+        with open(path, 'rb') as f:
+            data = memoryview(f.read())
+    except OSError as e:
+        raise CatalogCacheError(str(e)) from e
+
+    try:
+        magic, version, fetched_at, count = _HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != CACHE_FORMAT:
+            raise CatalogCacheError(f"Formato de cache desconhecido em {path}")
+        pos = _HEADER.size
+
+        strings = []
+        for _ in range(3):
+            (length,) = _LENGTH.unpack_from(data, pos)
+            pos += _LENGTH.size
+            strings.append(bytes(data[pos:pos + length]).decode("utf-8"))
+            pos += length
+        url, etag, extra = strings
+
+        index = {}
+        for _ in range(count):
+            key_length, offset, length = _ENTRY.unpack_from(data, pos)
+            pos += _ENTRY.size
+            index[bytes(data[pos:pos + key_length]).decode("utf-8")] = (offset, length)
+            pos += key_length
+    except (struct.error, UnicodeDecodeError) as e:
+        raise CatalogCacheError(f"Cache corrompido em {path}: {e}") from e
+
+    blobs = data[pos:]
+    if any(offset + length > len(blobs) for offset, length in index.values()):
+        raise CatalogCacheError(f"Cache truncado em {path}")
+
+    catalog = dict(json.loads(extra or "{}"))
+    catalog["rigs"] = LazyRigs(blobs, index)
+    return catalog, url, etag or None, fetched_at
+
+
+def fetch_catalog(url, etag=None):
+    """Baixa o catálogo com transporte comprimido; retorna (catálogo, etag, sha256)
+
+    Com etag, o pedido é condicional e o catálogo volta None se não mudou (304).
+    """
+    headers = {"Accept-Encoding": "gzip"}
+    if etag:
+        headers["If-None-Match"] = etag
+    response = get_session().get(url, headers=headers, timeout=(CONNECT_TIMEOUT, CATALOG_TIMEOUT))
+    if response.status_code == 304:
+        return None, etag, None
+    response.raise_for_status()
+    sha256 = hashlib.sha256(response.content).hexdigest()
+    return response.json(), response.headers.get("ETag"), sha256
+
+
+def _rig_versions(rig):
+    """{versão: URL} de um rig, inclusive de catálogos que só declaram a última"""
+    if "versions" in rig:
+        return rig["versions"]
+    return {str(rig["latest_version"]): rig["download_url"]}
+
+
+def _merge_rig_entries(entries):
+    """Um rig combinado a partir das entradas de vários catálogos, em ordem de prioridade"""
+    if len(entries) == 1:
+        return entries[0]
+    merged = dict(entries[0])
+    versions = dict(_rig_versions(entries[0]))
+    version_info = dict(entries[0].get("version_info", {}))
+    for rig in entries[1:]:
+        info = rig.get("version_info", {})
+        for version, url in _rig_versions(rig).items():
+            if version in versions:
+                continue
+            versions[version] = url
+            if version in info:
+                version_info[version] = info[version]
+            if int(version) > merged["latest_version"]:
+                merged["latest_version"] = int(version)
+                merged["download_url"] = url
+    merged["versions"] = versions
+    if version_info:
+        merged["version_info"] = version_info
+    return merged
+
+
+class FederatedRigs(Mapping):
+    """Rigs de vários catálogos num só espaço de nomes
+
+    O índice (rig -> catálogos que o têm) é montado só com as chaves; cada rig
+    é combinado no primeiro acesso. Em conflito, os campos do rig e cada versão
+    vêm do catálogo de maior prioridade; versões que só um catálogo de menor
+    prioridade tem são acrescentadas com seus metadados.
+    """
+
+    def __init__(self, sources):
+        # Rigs de cada catálogo, em ordem de prioridade
+        self._sources = sources
+        self._index = {}
+        for position, rigs in enumerate(sources):
+            for rig_id in rigs:
+                self._index.setdefault(rig_id, []).append(position)
+        self._merged = {}
+
+    def __getitem__(self, rig_id):
+        rig = self._merged.get(rig_id)
+        if rig is None:
+            rig = self._merged[rig_id] = _merge_rig_entries(
+                [self._sources[position][rig_id] for position in self._index[rig_id]]
+            )
+        return rig
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+
+def merge_catalogs(catalogs):
+    """Combina catálogos em ordem de prioridade; os que são None são ignorados
+
+    Com um só catálogo ele é devolvido sem cópia. Campos fora de "rigs" também
+    ficam com o catálogo de maior prioridade; nos que são dicionários (como
+    "bundles") a combinação é feita chave a chave.
+    """
+    catalogs = [catalog for catalog in catalogs if catalog is not None]
+    if not catalogs:
+        return {"rigs": {}}
+    if len(catalogs) == 1:
+        return catalogs[0]
+    merged = {}
+    for catalog in reversed(catalogs):
+        for key, value in catalog.items():
+            if key == "rigs":
+                continue
+            if isinstance(value, dict) and isinstance(merged.get(key), dict):
+                value = {**merged[key], **value}
+            merged[key] = value
+    merged["rigs"] = FederatedRigs([catalog.get("rigs", {}) for catalog in catalogs])
+    return merged
+
+
+class CatalogCache:
+    """Catálogo de uma origem mantido em memória e em disco, revalidado por ETag
+
+    Com store (StateStore), cada revisão nova do catálogo fica registrada.
+    Pode ser usado ao mesmo tempo pela thread principal, pelo loop de rede e
+    pelo executor: uma revalidação por vez, e quem esperou por ela reaproveita
+    o resultado.
+    """
+
+    def __init__(self, cache_path, store=None):
+        self.cache_path = cache_path
+        self.store = store
+        self.catalog = None
+        self.etag = None
+        self.checked_at = 0.0
+        # Protege catalog/etag/checked_at; _load_lock serializa as consultas à rede
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    def _read_disk(self):
+        try:
+            self.catalog, _, self.etag, _ = read_catalog_cache(self.cache_path)
+        except CatalogCacheError:
+            self.catalog = None
+
+    def current(self):
+        """Cópia em memória (ou em disco) sem consultar a rede; None se não houver"""
+        with self._lock:
+            if self.catalog is None:
+                self._read_disk()
+            return self.catalog
+
+    def is_fresh(self, max_age):
+        """A cópia atual foi conferida com a origem há menos de max_age segundos"""
+        with self._lock:
+            return self.catalog is not None and time.time() - self.checked_at < max_age
+
+    def load(self, urls, max_age=0):
+        """Retorna o catálogo, consultando a rede só quando ele tem mais de max_age segundos
+
+        Sem rede, devolve a última cópia conhecida (ou None se nunca houve uma).
+        """
+        requested_at = time.time()
+        with self._load_lock:
+            current = self.current()
+            with self._lock:
+                # Outra thread revalidou enquanto esta esperava
+                if current is not None and (time.time() - self.checked_at < max_age
+                                            or self.checked_at >= requested_at):
+                    return current
+                etag = self.etag if current is not None else None
+
+            for url in urls:
+                try:
+                    catalog, etag, sha256 = fetch_catalog(url, etag)
+                except (requests.RequestException, ValueError) as e:
+                    print(f"Erro ao carregar banco de dados: {str(e)}")
+                    continue
+                with self._lock:
+                    self.checked_at = time.time()
+                    if catalog is None:
+                        return self.catalog
+                    self.catalog, self.etag = catalog, etag
+                try:
+                    write_catalog_cache(self.cache_path, catalog, urls[-1], etag, self.checked_at)
+                except OSError as e:
+                    print(f"Aviso: não foi possível gravar o cache do catálogo: {e}")
+                if self.store is not None:
+                    try:
+                        self.store.record_catalog(urls[-1], sha256, etag, len(catalog.get("rigs", {})))
+                    except sqlite3.Error as e:
+                        print(f"Aviso: não foi possível registrar a revisão do catálogo: {e}")
+                return catalog
+
+            # Sem rede: evita repetir o timeout a cada redesenho do painel
+            with self._lock:
+                self.checked_at = time.time()
+                if self.catalog is not None:
+                    print("Usando a cópia local do catálogo")
+                return self.catalog
@@ -0,0 +1,453 @@
+"""Modo de linha de comando do PeS
+
+Roda dentro do Blender em modo background; os argumentos vêm depois de "--":
+
+    blender -b --factory-startup -P cli.py -- prestage jobs.txt --parallel 4
+
+Comandos:
+    prestage     baixa antes do job todas as versões de rig linkadas pelos shots
+    chunk-index  gera o índice de pedaços (<arquivo>.chunks.json) para atualização incremental
+    publish      gera o rigs.json a partir de uma pasta de arquivos PES_CHR_*_RIG_vNN.blend
+    bundle       gera o .tar de um pacote de rigs (ex.: o elenco de uma sequência) e o registra no catálogo
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+def resolve_library_path(library_path, blend_path):
+    """Converte o caminho de uma biblioteca (possivelmente //relativo) em absoluto"""
+    library_path = library_path.replace('\\', '/') if os.sep == '/' else library_path
+    if library_path.startswith('//'):
+        library_path = os.path.join(os.path.dirname(os.path.abspath(blend_path)), library_path[2:])
+    return os.path.normpath(library_path)
+
+
+def read_job_list(entries):
+    """Expande os argumentos em caminhos de .blend (listas .txt têm um caminho por linha)"""
+    shots = []
+    for entry in entries:
+        if entry.lower().endswith(".blend"):
+            shots.append(entry)
+            continue
+        with open(entry, 'r', encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    shots.append(line)
+    return shots
+
+
+def load_catalog(source):
+    """Carrega o catálogo de um arquivo local, de uma URL ou da configuração do add-on"""
+    from . import load_rigs_database
+    if not source:
+        return load_rigs_database()
+    if os.path.exists(source):
+        with open(source, 'r', encoding="utf-8") as f:
+            return json.load(f)
+    import requests
+    response = requests.get(source, timeout=10)
+    response.raise_for_status()
+    return response.json()
+
+
+def _format_bytes(size):
+    size = float(size)
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def collect_rig_files(shots, database):
+    """Lista os arquivos de rig linkados pelos shots, resolvidos pelo catálogo
+
+    Retorna (alvos, erros): alvos mapeia o caminho esperado do arquivo para
+    {"rig_id", "version", "urls", "shots"}. As dependências de cada versão
+    (texturas, bibliotecas, sub-rigs) entram como alvos com o rig e a versão
+    que as pediram.
+    """
+    from . import (find_rig, get_dependency_jobs, get_version_from_filename, get_version_info,
+                   get_version_urls, get_variant_from_filename, get_variant_urls, get_full_rig_filename)
+    from .blendfile import BlendFile, BlendFileError
+
+    targets = {}
+    # caminho do rig -> caminhos das dependências dele
+    dependencies = {}
+    errors = []
+    for shot in shots:
+        try:
+            libraries = BlendFile(shot).libraries()
+        except (OSError, BlendFileError) as e:
+            errors.append({"path": shot, "error": f"Erro ao ler shot: {e}"})
+            continue
+
+        paths = []
+        for library in libraries:
+            path = resolve_library_path(library, shot)
+            paths.append(path)
+            if get_variant_from_filename(os.path.basename(path)):
+                # O render troca variantes leves pelo rig completo: ele também precisa estar no nó
+                paths.append(os.path.join(os.path.dirname(path),
+                                          get_full_rig_filename(os.path.basename(path))))
+
+        for path in paths:
+            rig_id, rig_data = find_rig(database, path)
+            if rig_id is None:
+                continue
+            target = targets.get(path)
+            if target is None:
+                filename = os.path.basename(path)
+                _, version = get_version_from_filename(filename)
+                variant = get_variant_from_filename(filename)
+                versions = rig_data.get("versions", {})
+                urls = None
+                if variant:
+                    if variant in get_version_info(rig_data, version).get("variants", {}):
+                        urls = get_variant_urls(rig_data, version, variant)
+                elif str(version) in versions:
+                    urls = get_version_urls(rig_data, version)
+                elif version == rig_data["latest_version"]:
+                    urls = get_version_urls(rig_data, version, rig_data["download_url"])
+                target = targets[path] = {
+                    "rig_id": rig_id,
+                    "version": version,
+                    "urls": urls,
+                    "sha256": None if variant else get_version_info(rig_data, version).get("sha256"),
+                    "size": None if variant else get_version_info(rig_data, version).get("size"),
+                    "shots": [],
+                }
+                dependencies[path] = []
+                if urls and not variant:
+                    jobs = get_dependency_jobs(database, rig_data, version, os.path.dirname(path))
+                    for job_urls, filepath, sha256, size in jobs:
+                        dependencies[path].append(filepath)
+                        targets.setdefault(filepath, {
+                            "rig_id": rig_id,
+                            "version": version,
+                            "urls": job_urls,
+                            "sha256": sha256,
+                            "size": size,
+                            "shots": [],
+                        })
+            for filepath in [path] + dependencies.get(path, []):
+                if shot not in targets[filepath]["shots"]:
+                    targets[filepath]["shots"].append(shot)
+    return targets, errors
+
+
+def _stage_one(path, target, settings):
+    from . import fetch_file
+
+    started = time.perf_counter()
+    result = {"path": path, "rig_id": target["rig_id"], "version": target["version"]}
+    if os.path.exists(path):
+        result.update(status="presente", bytes=os.path.getsize(path), seconds=0.0)
+        return result
+    if not target["urls"]:
+        result.update(status="falhou", error="Versão não encontrada no catálogo",
+                      bytes=0, seconds=0.0)
+        return result
+
+    try:
+        fetch_file(target["urls"], path, target["sha256"], overwrite=False, size=target["size"],
+                   background=True, settings=settings)
+        result.update(status="baixado", bytes=os.path.getsize(path))
+    except Exception as e:
+        result.update(status="falhou", error=str(e), bytes=0)
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def prestage(args):
+    """Baixa para o nó todas as versões de rig linkadas pelos shots do job"""
+    wall_started = time.perf_counter()
+    shots = read_job_list(args.jobs)
+
+    scan_started = time.perf_counter()
+    database = load_catalog(args.catalog)
+    targets, errors = collect_rig_files(shots, database)
+    scan_seconds = time.perf_counter() - scan_started
+
+    # O limite da linha de comando vale para o processo todo, no lugar das preferências
+    from . import (DownloadSettings, get_bandwidth_budget, get_engine, get_state_store, probe_downloads,
+                   record_file_use)
+    from .bandwidth import mbps_to_rate
+    get_bandwidth_budget().configure(0, mbps_to_rate(args.limit_mbps))
+    # Os downloads rodam no pool abaixo, sem ler as preferências do Blender. Sem
+    # arquivo aberto, o que o job usa é que fica protegido da limpeza da pasta
+    cache_server = args.cache_server.strip().rstrip('/') if args.cache_server else None
+    protected = frozenset(os.path.normcase(os.path.abspath(path)) for path in targets)
+    settings = DownloadSettings(cache_server, get_bandwidth_budget(), protected)
+
+    results = []
+    if args.dry_run:
+        for path, target in sorted(targets.items()):
+            status = "presente" if os.path.exists(path) else "ausente"
+            results.append({"path": path, "rig_id": target["rig_id"],
+                            "version": target["version"], "status": status,
+                            "bytes": 0, "seconds": 0.0})
+            print(f"[{status}] {path}")
+    else:
+        # Banco local e loop de rede são criados aqui, não por várias threads do pool ao mesmo tempo
+        get_state_store()
+        get_engine().start()
+        # Os rigs já presentes contam como usados antes de qualquer download liberar espaço
+        record_file_use(*(os.path.abspath(path) for path in targets if os.path.exists(path)))
+        # Tamanhos que o catálogo não traz são sondados aqui, antes do pool
+        probe_downloads(settings, [(target["urls"], path, target["sha256"], target["size"])
+                                   for path, target in targets.items()])
+        with ThreadPoolExecutor(max_workers=max(1, args.parallel)) as pool:
+            futures = [pool.submit(_stage_one, path, target, settings)
+                       for path, target in sorted(targets.items())]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                line = f"[{result['status']}] {result['path']}"
+                if result["status"] == "baixado":
+                    line += f" ({_format_bytes(result['bytes'])} em {result['seconds']:.1f}s)"
+                elif result.get("error"):
+                    line += f": {result['error']}"
+                print(line, flush=True)
+
+    downloaded = [r for r in results if r["status"] == "baixado"]
+    failed = [r for r in results if r["status"] == "falhou"]
+    total_bytes = sum(r["bytes"] for r in downloaded)
+    wall_seconds = time.perf_counter() - wall_started
+    transfer_seconds = sum(r["seconds"] for r in downloaded)
+    summary = {
+        "shots": len(shots),
+        "rig_files": len(targets),
+        "present": sum(1 for r in results if r["status"] == "presente"),
+        "downloaded": len(downloaded),
+        "failed": len(failed) + len(errors),
+        "bytes_downloaded": total_bytes,
+        "scan_seconds": round(scan_seconds, 3),
+        "transfer_seconds": round(transfer_seconds, 3),
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_mb_s": round(total_bytes / wall_seconds / (1024 * 1024), 2) if wall_seconds else 0.0,
+        "parallel": args.parallel,
+    }
+
+    for error in errors:
+        print(f"[falhou] {error['path']}: {error['error']}")
+    print(
+        f"Shots: {summary['shots']}  Rigs: {summary['rig_files']}  "
+        f"Presentes: {summary['present']}  Baixados: {summary['downloaded']}  "
+        f"Falhas: {summary['failed']}"
+    )
+    print(
+        f"Total: {_format_bytes(total_bytes)} em {summary['wall_seconds']:.1f}s "
+        f"(leitura dos shots {summary['scan_seconds']:.2f}s, "
+        f"{summary['throughput_mb_s']:.1f} MB/s)"
+    )
+
+    if args.report:
+        with open(args.report, 'w', encoding="utf-8") as f:
+            json.dump({"summary": summary, "files": results, "errors": errors}, f, indent=2)
+
+    return 1 if summary["failed"] else 0
+
+
+def chunk_index(args):
+    """Gera o índice de pedaços de cada arquivo de rig publicado"""
+    from .delta import write_chunk_index
+
+    for path in args.files:
+        started = time.perf_counter()
+        index_path = write_chunk_index(path)
+        with open(index_path, 'r', encoding="utf-8") as f:
+            count = len(json.load(f)["chunks"])
+        print(f"{index_path}: {count} pedaços em {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+def publish(args):
+    """Gera o catálogo a partir da pasta de rigs, mantendo as URLs já publicadas"""
+    from .publish import CatalogError, build_catalog, dump_catalog, scan_rig_dir, validate_catalog
+
+    started = time.perf_counter()
+    existing = None
+    if os.path.exists(args.catalog):
+        with open(args.catalog, 'r', encoding="utf-8") as f:
+            existing = json.load(f)
+
+    chunk_indexes = None
+    if args.chunk_index:
+        from .delta import write_chunk_index
+        chunk_indexes = {}
+        for path, _, _, variant in scan_rig_dir(args.rig_dir):
+            if variant:
+                continue
+            index_path = path + ".chunks.json"
+            stale = not os.path.exists(index_path) or os.path.getmtime(index_path) < os.path.getmtime(path)
+            # --check só compara: o catálogo cita o índice pelo nome, sem precisar dele no disco
+            if stale and not args.check:
+                write_chunk_index(path, index_path)
+            chunk_indexes[path] = index_path
+
+    try:
+        catalog, rehashed = build_catalog(
+            args.rig_dir, existing, args.url_template, chunk_indexes, args.parallel, write_cache=not args.check
+        )
+    except CatalogError as e:
+        print(f"Erro: {e}")
+        return 1
+
+    problems = validate_catalog(catalog)
+    if problems:
+        for problem in problems:
+            print(f"Erro: {problem}")
+        return 1
+
+    text = dump_catalog(catalog)
+    output = args.output or args.catalog
+    current = None
+    if os.path.exists(output):
+        with open(output, 'r', encoding="utf-8") as f:
+            current = f.read()
+
+    elapsed = time.perf_counter() - started
+    if args.check:
+        if current != text:
+            print(f"{output} está desatualizado")
+            return 1
+        print(f"{output} está atualizado ({elapsed:.2f}s)")
+        return 0
+
+    if current != text:
+        tmp_path = output + ".tmp"
+        with open(tmp_path, 'w', encoding="utf-8", newline="\n") as f:
+            f.write(text)
+        os.replace(tmp_path, output)
+    print(f"{output}: {len(catalog['rigs'])} rigs, {rehashed} arquivos recalculados em {elapsed:.2f}s")
+    return 0
+
+
+def bundle(args):
+    """Grava o .tar de um pacote de rigs e registra o pacote no catálogo"""
+    from .publish import dump_catalog, validate_catalog, write_bundle
+
+    with open(args.catalog, 'r', encoding="utf-8") as f:
+        catalog = json.load(f)
+
+    rigs = {}
+    paths = []
+    for spec in args.rigs:
+        rig_id, _, version = spec.partition(":")
+        rig = catalog["rigs"].get(rig_id)
+        if rig is None:
+            print(f"Erro: {rig_id} não está no catálogo")
+            return 1
+        version = int(version.lstrip("v")) if version else rig["latest_version"]
+        url = rig.get("versions", {}).get(str(version))
+        if url is None:
+            print(f"Erro: {rig_id} não tem a versão v{version}")
+            return 1
+        path = os.path.join(args.rig_dir, os.path.basename(url.split('?')[0]))
+        if not os.path.exists(path):
+            print(f"Erro: {path} não existe")
+            return 1
+        rigs[rig_id] = version
+        paths.append(path)
+
+    filename = f"{args.name}.tar"
+    output = os.path.join(args.output_dir or args.rig_dir, filename)
+    started = time.perf_counter()
+    size = write_bundle(paths, output)
+
+    entry = dict(catalog.get("bundles", {}).get(args.name, {}))
+    entry.update(url=args.url_template.format(filename=filename), rigs=rigs, size=size)
+    if args.description:
+        entry["description"] = args.description
+    catalog.setdefault("bundles", {})[args.name] = entry
+
+    problems = validate_catalog(catalog)
+    if problems:
+        for problem in problems:
+            print(f"Erro: {problem}")
+        return 1
+    tmp_path = args.catalog + ".tmp"
+    with open(tmp_path, 'w', encoding="utf-8", newline="\n") as f:
+        f.write(dump_catalog(catalog))
+    os.replace(tmp_path, args.catalog)
+    print(f"{output}: {len(paths)} rigs, {size / 1048576:.1f} MB em {time.perf_counter() - started:.2f}s")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="pes", description="Ferramentas de linha de comando do PeS")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("prestage", help="Baixa os rigs linkados pelos shots antes do job")
+    p.add_argument("jobs", nargs="+",
+                   help="Arquivos .blend ou listas .txt com um caminho de .blend por linha")
+    p.add_argument("--parallel", "-j", type=int, default=4, help="Downloads simultâneos")
+    p.add_argument("--catalog", help="Caminho ou URL do rigs.json (padrão: o do add-on)")
+    p.add_argument("--cache-server", help="Cache da rede local, ex.: http://nas:8765")
+    p.add_argument("--report", help="Grava o relatório completo em JSON")
+    p.add_argument("--dry-run", action="store_true", help="Só lista o que seria baixado")
+    p.add_argument("--limit-mbps", type=float, default=0.0,
+                   help="Banda total dos downloads em Mbit/s (padrão: sem limite)")
+    p.set_defaults(func=prestage)
+
+    p = commands.add_parser("chunk-index", help="Gera o índice de pedaços para atualização incremental")
+    p.add_argument("files", nargs="+", help="Arquivos .blend publicados")
+    p.set_defaults(func=chunk_index)
+
+    p = commands.add_parser("publish", help="Gera o rigs.json a partir de uma pasta de rigs")
+    p.add_argument("rig_dir", help="Pasta com os arquivos PES_CHR_*_RIG_vNN.blend")
+    p.add_argument("--catalog", default="rigs.json",
+                   help="Catálogo atual, de onde vêm URLs e descrições (padrão: rigs.json)")
+    p.add_argument("--output", help="Onde gravar o catálogo (padrão: o próprio --catalog)")
+    p.add_argument("--url-template",
+                   help="URL para arquivos novos, ex.: http://nas/rigs/{filename}")
+    p.add_argument("--chunk-index", action="store_true",
+                   help="Gera também os índices de pedaços para atualização incremental")
+    p.add_argument("--parallel", "-j", type=int, default=4, help="Arquivos processados em paralelo")
+    p.add_argument("--check", action="store_true",
+                   help="Não grava; sai com erro se o catálogo estiver desatualizado")
+    p.set_defaults(func=publish)
+
+    p = commands.add_parser("bundle", help="Gera o .tar de um pacote de rigs e o registra no catálogo")
+    p.add_argument("name", help="Nome do pacote, ex.: seq03_cast")
+    p.add_argument("rigs", nargs="+", help="Rigs do pacote, como RIG_ID ou RIG_ID:vNN (padrão: a última versão)")
+    p.add_argument("--rig-dir", required=True, help="Pasta com os arquivos publicados")
+    p.add_argument("--catalog", default="rigs.json", help="Catálogo onde o pacote é registrado")
+    p.add_argument("--url-template", required=True,
+                   help="URL onde o pacote será publicado, ex.: http://nas/rigs/{filename}")
+    p.add_argument("--output-dir", help="Onde gravar o .tar (padrão: --rig-dir)")
+    p.add_argument("--description", help="Texto mostrado no painel")
+    p.set_defaults(func=bundle)
+    return parser
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+def _load_package():
+    """Carrega o pacote do add-on quando este arquivo é executado como script"""
+    import importlib
+    import importlib.util
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    spec = importlib.util.spec_from_file_location(
+        "pes", os.path.join(package_dir, "__init__.py"), submodule_search_locations=[package_dir]
+    )
+    package = importlib.util.module_from_spec(spec)
+    sys.modules["pes"] = package
+    spec.loader.exec_module(package)
+    return importlib.import_module("pes.cli")
+
+
+if __name__ == "__main__":
+    sys.exit(_load_package().main())
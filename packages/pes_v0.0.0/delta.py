@@ -0,0 +1,226 @@
+"""Atualização incremental de rigs por blocos
+
+O publicador gera, para cada versão, um índice de pedaços (chunks) do arquivo.
+Os cortes seguem a estrutura do .blend: um pedaço é formado por blocos
+inteiros e termina depois de um bloco escolhido pelo CRC do próprio bloco,
+com probabilidade proporcional ao tamanho dele. Assim os cortes dependem do
+conteúdo e não da posição, e blocos que não mudaram entre duas versões geram
+os mesmos pedaços mesmo que tenham mudado de lugar.
+Arquivos que não são .blend legíveis (ou estão comprimidos) usam pedaços de
+tamanho fixo.
+
+O cliente corta a versão local anterior com o mesmo algoritmo, copia os
+pedaços que já tem e baixa só os que faltam com pedidos Range.
+"""
+
+import hashlib
+import json
+import os
+import zlib
+
+from .blendfile import BlendFile, BlendFileError
+from .downloader import fetch_range, get_part_path, get_session, CONNECT_TIMEOUT, READ_TIMEOUT
+
+INDEX_FORMAT = 1
+MIN_CHUNK = 16 * 1024
+TARGET_CHUNK = 256 * 1024
+MAX_CHUNK = 4 * 1024 * 1024
+FIXED_CHUNK = 1024 * 1024
+# Maior pedido Range depois de juntar pedaços vizinhos
+MAX_RANGE = 16 * 1024 * 1024
+# Acima desta fração faltando, baixar o arquivo inteiro é mais barato
+MAX_MISSING_RATIO = 0.7
+READ_BUFFER = 1024 * 1024
+
+
+class DeltaError(Exception):
+    """A atualização incremental não pode ser usada; baixe o arquivo inteiro"""
+
+
+def _pieces(path):
+    """Unidades mínimas de corte: (início, fim, corte_por_conteúdo)"""
+    size = os.path.getsize(path)
+    try:
+        blend = BlendFile(path, codes=())
+    except (BlendFileError, ValueError, OSError):
+        blend = None
+
+    if blend is None or blend.compressed:
+        for start in range(0, size, FIXED_CHUNK):
+            yield start, min(start + FIXED_CHUNK, size), False
+        return
+
+    segments = [(0, blend.header_size)]
+    segments.extend((block.offset, block.end) for block in blend.blocks)
+    if segments[-1][1] < size:
+        segments.append((segments[-1][1], size))
+
+    for start, end in segments:
+        # Blocos enormes são divididos a partir do início do próprio bloco
+        for piece_start in range(start, end, MAX_CHUNK):
+            yield piece_start, min(piece_start + MAX_CHUNK, end), True
+
+
+def iter_chunks(path):
+    """Percorre o arquivo gerando (offset, tamanho, sha256) de cada pedaço"""
+    with open(path, 'rb') as f:
+        chunk_start = 0
+        chunk_len = 0
+        hasher = hashlib.sha256()
+        for start, end, content_defined in _pieces(path):
+            f.seek(start)
+            data = f.read(end - start)
+            if chunk_len and chunk_len + len(data) > MAX_CHUNK:
+                yield chunk_start, chunk_len, hasher.hexdigest()
+                chunk_start, chunk_len, hasher = start, 0, hashlib.sha256()
+
+            hasher.update(data)
+            chunk_len += len(data)
+
+            # Blocos grandes quase sempre cortam; pequenos, raramente (média de TARGET_CHUNK)
+            if chunk_len >= MIN_CHUNK and (
+                not content_defined or zlib.crc32(data) < len(data) * (2 ** 32 // TARGET_CHUNK)
+            ):
+                yield chunk_start, chunk_len, hasher.hexdigest()
+                chunk_start, chunk_len, hasher = end, 0, hashlib.sha256()
+
+        if chunk_len:
+            yield chunk_start, chunk_len, hasher.hexdigest()
+
+
+def file_sha256(path):
+    """sha256 do arquivo inteiro"""
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(READ_BUFFER)
+            if not data:
+                break
+            hasher.update(data)
+    return hasher.hexdigest()
+
+
+def build_chunk_index(path):
+    """Gera o índice de pedaços publicado ao lado de cada versão"""
+    chunks = [[offset, length, digest] for offset, length, digest in iter_chunks(path)]
+    return {
+        "format": INDEX_FORMAT,
+        "size": os.path.getsize(path),
+        "sha256": file_sha256(path),
+        "chunks": chunks,
+    }
+
+
+def write_chunk_index(path, index_path=None):
+    """Grava <arquivo>.chunks.json e retorna o caminho gravado"""
+    index_path = index_path or path + ".chunks.json"
+    index = build_chunk_index(path)
+    with open(index_path, 'w', encoding="utf-8") as f:
+        json.dump(index, f, separators=(',', ':'))
+    return index_path
+
+
+def load_chunk_index(url):
+    """Baixa o índice de pedaços de uma versão"""
+    response = get_session().get(url, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+    response.raise_for_status()
+    index = response.json()
+    if index.get("format") != INDEX_FORMAT:
+        raise DeltaError(f"Formato de índice não suportado: {index.get('format')}")
+    return index
+
+
+def _plan(index, base_files):
+    """Decide, pedaço a pedaço, o que copiar dos arquivos locais e o que baixar"""
+    wanted = {digest for _, _, digest in index["chunks"]}
+    local = {}
+    for base in base_files:
+        if not base or not os.path.exists(base):
+            continue
+        for offset, length, digest in iter_chunks(base):
+            if digest in wanted and digest not in local:
+                local[digest] = (base, offset, length)
+
+    plan = []
+    missing = 0
+    for offset, length, digest in index["chunks"]:
+        source = local.get(digest)
+        if source is None:
+            missing += length
+        plan.append((offset, length, digest, source))
+    return plan, missing
+
+
+def _missing_ranges(plan):
+    """Junta pedaços faltantes vizinhos em intervalos para pedidos Range"""
+    ranges = []
+    for offset, length, _, source in plan:
+        if source is not None:
+            continue
+        if ranges and ranges[-1][1] == offset and ranges[-1][1] - ranges[-1][0] + length <= MAX_RANGE:
+            ranges[-1][1] = offset + length
+        else:
+            ranges.append([offset, offset + length])
+    return ranges
+
+
+def delta_download(urls, filepath, index_url, base_files, sha256=None, throttle=None):
+    """Monta filepath a partir de versões locais e dos pedaços que faltam
+
+    Retorna estatísticas da transferência. Levanta DeltaError (ou erros de
+    download) quando é melhor baixar o arquivo inteiro. throttle(bytes), se
+    houver, limita a banda dos intervalos baixados.
+    """
+    index = load_chunk_index(index_url)
+    expected_sha256 = sha256 or index["sha256"]
+    plan, missing = _plan(index, base_files)
+    if index["size"] and missing / index["size"] > MAX_MISSING_RATIO:
+        raise DeltaError("Poucos pedaços reaproveitáveis")
+
+    ranges = _missing_ranges(plan)
+
+    part_path = get_part_path(filepath)
+    hasher = hashlib.sha256()
+    open_bases = {}
+    try:
+        with open(part_path, 'wb') as out:
+            range_iter = iter(ranges)
+            current = None
+            current_data = None
+            for offset, length, digest, source in plan:
+                if source is not None:
+                    base, base_offset, _ = source
+                    f = open_bases.get(base)
+                    if f is None:
+                        f = open_bases[base] = open(base, 'rb')
+                    f.seek(base_offset)
+                    data = f.read(length)
+                else:
+                    if current is None or offset >= current[1]:
+                        # Baixa o próximo intervalo só quando a escrita chega nele
+                        current = next(range_iter)
+                        current_data = fetch_range(urls, current[0], current[1] - 1, throttle)
+                    start = offset - current[0]
+                    data = current_data[start:start + length]
+                    if hashlib.sha256(data).hexdigest() != digest:
+                        raise DeltaError(f"Pedaço corrompido no offset {offset}")
+                out.write(data)
+                hasher.update(data)
+            out.flush()
+            os.fsync(out.fileno())
+
+        if hasher.hexdigest() != expected_sha256:
+            raise DeltaError("Hash do arquivo montado não confere com o da versão")
+        os.replace(part_path, filepath)
+    finally:
+        for f in open_bases.values():
+            f.close()
+        if os.path.exists(part_path):
+            os.remove(part_path)
+
+    return {
+        "size": index["size"],
+        "downloaded": missing,
+        "reused": index["size"] - missing,
+        "requests": len(ranges),
+    }
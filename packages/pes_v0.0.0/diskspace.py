@@ -0,0 +1,95 @@
+"""Verificação e reserva de espaço em disco antes dos downloads de rigs
+
+Cada download reserva o tamanho esperado no disco de destino enquanto roda.
+Downloads simultâneos do mesmo processo descontam as reservas uns dos outros;
+a parte que o arquivo .part já ocupa no disco deixa de contar como reservada.
+"""
+
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+
+# Espaço mantido livre além do tamanho do arquivo
+SAFETY_MARGIN = 64 * 1024 * 1024
+
+# chave -> (dispositivo, arquivo .part, tamanho)
+_reservations = {}
+_lock = threading.RLock()
+
+
+class DiskSpaceError(Exception):
+    """Não há espaço para o download, mesmo depois de liberar o cache de rigs"""
+
+
+def _existing_dir(path):
+    """A própria pasta ou o ancestral mais próximo que já existe"""
+    path = os.path.abspath(path)
+    while not os.path.isdir(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+def free_space(directory):
+    """Bytes livres no disco da pasta (que pode ainda não existir)"""
+    return shutil.disk_usage(_existing_dir(directory)).free
+
+
+def _allocated(path):
+    if not path:
+        return 0
+    try:
+        st = os.stat(path)
+    except OSError:
+        return 0
+    blocks = getattr(st, "st_blocks", None)
+    return blocks * 512 if blocks is not None else st.st_size
+
+
+def reserved_bytes(device):
+    """Bytes reservados no disco `device` que ainda não foram gravados"""
+    with _lock:
+        entries = [entry for entry in _reservations.values() if entry[0] == device]
+    return sum(max(0, size - _allocated(part_path)) for _, part_path, size in entries)
+
+
+def available_space(directory):
+    """Bytes livres na pasta descontadas as reservas do processo"""
+    directory = _existing_dir(directory)
+    return free_space(directory) - reserved_bytes(os.stat(directory).st_dev)
+
+
+@contextmanager
+def reserve_space(directory, size, part_path=None, evict=None, margin=SAFETY_MARGIN):
+    """Confere se cabem `size` bytes na pasta e os reserva até o fim do bloco
+
+    Sem espaço, chama evict(bytes que faltam) para liberar o cache e confere de
+    novo; se ainda faltar, levanta DiskSpaceError antes de qualquer transferência.
+    Com size desconhecido (None ou 0) não confere nada.
+    """
+    if not size:
+        yield
+        return
+
+    directory = _existing_dir(directory)
+    device = os.stat(directory).st_dev
+    key = object()
+    with _lock:
+        shortfall = size + margin - available_space(directory)
+        if shortfall > 0 and evict is not None:
+            evict(shortfall)
+            shortfall = size + margin - available_space(directory)
+        if shortfall > 0:
+            raise DiskSpaceError(
+                f"Espaço insuficiente em {directory}: o arquivo tem {size / 1048576:.0f} MB "
+                f"e faltam {shortfall / 1048576:.0f} MB"
+            )
+        _reservations[key] = (device, part_path, size)
+    try:
+        yield
+    finally:
+        with _lock:
+            _reservations.pop(key, None)
@@ -0,0 +1,361 @@
+"""Download de arquivos de rig com retry, failover de mirrors e cache de redirects"""
+
+import errno
+import hashlib
+import http.client
+import os
+import random
+import threading
+import time
+
+import requests
+import urllib3
+
+from .timing import span
+
+# Status HTTP que indicam falha transitória e podem ser repetidos com segurança
+RETRY_STATUS = {429, 500, 502, 503, 504}
+# Status que invalidam um redirect guardado em cache (link temporário expirado)
+STALE_REDIRECT_STATUS = {403, 404, 410}
+
+MAX_ATTEMPTS = 4
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+CONNECT_TIMEOUT = 10
+READ_TIMEOUT = 60
+CHUNK_SIZE = 8192
+# Buffer reaproveitado na gravação dos downloads
+BUFFER_SIZE = 1024 * 1024
+
+# Tempo padrão de validade de um redirect quando o servidor não informa cache
+REDIRECT_TTL = 600
+
+# url original -> (url final, instante de expiração)
+_resolved_urls = {}
+_resolved_lock = threading.Lock()
+
+# Uma sessão por thread para reaproveitar conexões (keep-alive) entre pedidos
+_local = threading.local()
+
+
+class DownloadError(Exception):
+    """Falha definitiva no download depois de esgotar tentativas e mirrors"""
+
+
+class IntegrityError(DownloadError):
+    """O arquivo baixado não confere com o tamanho ou hash do catálogo"""
+
+
+class RangeNotSupported(DownloadError):
+    """O servidor ignorou o cabeçalho Range e devolveu o arquivo inteiro"""
+
+
+def get_session():
+    """Sessão HTTP da thread atual"""
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = _local.session = requests.Session()
+    return session
+
+
+def get_part_path(filepath):
+    """Arquivo temporário onde filepath é gravado até ficar completo"""
+    return f"{filepath}.{os.getpid()}.part"
+
+
+def get_filename_from_url(url):
+    """Extrai o nome do arquivo de uma URL de download"""
+    return url.split('/')[-1].split('?')[0]
+
+
+def _redirect_ttl(response):
+    """Calcula a validade de um redirect a partir dos cabeçalhos de cache"""
+    cache_control = response.headers.get("Cache-Control", "")
+    for directive in cache_control.split(','):
+        directive = directive.strip().lower()
+        if directive in ("no-store", "no-cache"):
+            return 0
+        if directive.startswith("max-age="):
+            try:
+                return int(directive.split('=', 1)[1])
+            except ValueError:
+                pass
+    return REDIRECT_TTL
+
+
+def get_resolved_url(url):
+    """Retorna o destino em cache de uma URL com redirect, se ainda for válido"""
+    with _resolved_lock:
+        cached = _resolved_urls.get(url)
+        if cached is None:
+            return None
+        target, expires_at = cached
+        if expires_at <= time.time():
+            del _resolved_urls[url]
+            return None
+        return target
+
+
+def remember_redirect(url, response):
+    """Guarda o destino final de uma resposta que passou por redirects"""
+    if not response.history or response.url == url:
+        return
+    ttl = min(_redirect_ttl(r) for r in response.history)
+    if ttl <= 0:
+        return
+    with _resolved_lock:
+        _resolved_urls[url] = (response.url, time.time() + ttl)
+
+
+def forget_redirect(url):
+    """Remove um redirect do cache"""
+    with _resolved_lock:
+        _resolved_urls.pop(url, None)
+
+
+def clear_redirect_cache():
+    """Limpa todo o cache de redirects"""
+    with _resolved_lock:
+        _resolved_urls.clear()
+
+
+def _backoff_delay(attempt, retry_after=None):
+    """Tempo de espera antes da próxima tentativa (backoff exponencial com jitter)"""
+    if retry_after:
+        try:
+            return min(float(retry_after), BACKOFF_MAX)
+        except ValueError:
+            pass
+    delay = min(BACKOFF_BASE * (2 ** attempt), BACKOFF_MAX)
+    return delay * (0.5 + random.random() / 2)
+
+
+def _open_stream(url, headers=None):
+    """Abre a URL em modo streaming, usando o redirect em cache quando houver"""
+    with span("http.connect"):
+        return _open_stream_resolved(url, headers)
+
+
+def _open_stream_resolved(url, headers):
+    session = get_session()
+    target = get_resolved_url(url)
+    if target is not None:
+        response = session.get(target, headers=headers, stream=True,
+                               timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+        if response.status_code not in STALE_REDIRECT_STATUS:
+            return response
+        # O link temporário expirou antes do previsto: resolve de novo a partir da original
+        response.close()
+        forget_redirect(url)
+
+    response = session.get(url, headers=headers, stream=True,
+                           timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+    if response.ok:
+        remember_redirect(url, response)
+    return response
+
+
+def _raw_stream(response):
+    """Corpo da resposta sem decodificação, para readinto; None se vier comprimido
+
+    Também None quando o urllib3 não expõe o http.client.HTTPResponse: aí o
+    corpo é lido por iter_content.
+    """
+    if response.headers.get("Content-Encoding", "identity").strip().lower() not in ("", "identity"):
+        return None
+    # O readinto do urllib3 passa por um read() e uma cópia; o http.client.HTTPResponse
+    # por baixo dele lê do socket direto no buffer. _fp é interno ao urllib3 e pode
+    # mudar entre versões, por isso a conferência antes de usar
+    stream = getattr(response.raw, "_fp", None)
+    if stream is None or not callable(getattr(stream, "readinto", None)):
+        return None
+    return stream
+
+
+def _iter_body(response, buffer):
+    """Pedaços do corpo como fatias de buffer (ou bytes, se o corpo vier comprimido)"""
+    stream = _raw_stream(response)
+    if stream is None:
+        yield from response.iter_content(chunk_size=len(buffer))
+        return
+    expected = response.headers.get("Content-Length")
+    expected = int(expected) if expected and expected.isdigit() else None
+    view = memoryview(buffer)
+    received = 0
+    while True:
+        try:
+            read = stream.readinto(view)
+        except (http.client.HTTPException, urllib3.exceptions.HTTPError, OSError) as e:
+            # Mesmo tratamento de uma conexão que caiu em iter_content
+            raise requests.ConnectionError(f"Transferência interrompida ({response.url}): {e}") from e
+        if not read:
+            break
+        received += read
+        yield view[:read]
+    # O http.client não acusa conexão fechada antes do Content-Length no readinto
+    if expected is not None and received != expected:
+        raise requests.ConnectionError(
+            f"Transferência interrompida ({response.url}): {received} de {expected} bytes"
+        )
+
+
+def _preallocate(fd, size):
+    """Reserva o espaço do arquivo de uma vez, onde o sistema de arquivos suportar"""
+    if not size or not hasattr(os, "posix_fallocate"):
+        return
+    try:
+        os.posix_fallocate(fd, 0, size)
+    except OSError as e:
+        if e.errno == errno.ENOSPC:
+            raise
+        # EOPNOTSUPP/EINVAL (rede, FAT...): grava sem reservar
+
+
+def _write_all(f, data):
+    # FileIO.write pode gravar menos que o pedido
+    while data:
+        data = data[f.write(data):]
+
+
+def _write_response(response, filepath, sha256=None, size=None, progress=None, throttle=None):
+    """Grava o corpo da resposta em um arquivo temporário e o move para o destino
+
+    Com sha256/size, confere o conteúdo durante a escrita e descarta o arquivo
+    se não bater. progress(recebidos, total) é chamado a cada pedaço gravado e
+    throttle(bytes), se houver, segura a leitura no limite de banda. O arquivo
+    é gravado sem buffer do Python, pré-alocado quando o tamanho é conhecido e
+    sincronizado com o disco uma única vez, antes de ir ao destino.
+    """
+    part_path = get_part_path(filepath)
+    hasher = hashlib.sha256() if sha256 else None
+    total = size or int(response.headers.get("Content-Length") or 0) or None
+    buffer = bytearray(BUFFER_SIZE)
+    written = 0
+    try:
+        with open(part_path, 'wb', buffering=0) as f:
+            _preallocate(f.fileno(), total)
+            for chunk in _iter_body(response, buffer):
+                _write_all(f, chunk)
+                written += len(chunk)
+                if hasher:
+                    hasher.update(chunk)
+                if progress:
+                    progress(written, total)
+                if throttle:
+                    throttle(len(chunk))
+            if total and written != total:
+                # Descarta a sobra da pré-alocação
+                f.truncate(written)
+            os.fsync(f.fileno())
+        if size is not None and written != size:
+            raise IntegrityError(f"Tamanho {written} difere do esperado {size} ({response.url})")
+        if hasher and hasher.hexdigest() != sha256:
+            raise IntegrityError(f"sha256 não confere ({response.url})")
+        os.replace(part_path, filepath)
+    finally:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+
+
+def download_file(urls, filepath, sha256=None, size=None, progress=None, throttle=None):
+    """Baixa o primeiro mirror disponível para filepath
+
+    Cada URL é tentada até MAX_ATTEMPTS vezes em falhas transitórias (429/5xx,
+    conexão, timeout) antes de passar para o próximo mirror. O arquivo só
+    aparece em filepath depois de completo e, se sha256/size forem informados,
+    conferido; um mirror com conteúdo divergente é trocado pelo próximo.
+    """
+    if isinstance(urls, str):
+        urls = [urls]
+
+    last_error = None
+    for url in urls:
+        for attempt in range(MAX_ATTEMPTS):
+            try:
+                response = _open_stream(url)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                last_error = e
+                time.sleep(_backoff_delay(attempt))
+                continue
+
+            with response:
+                if response.status_code in RETRY_STATUS:
+                    last_error = requests.HTTPError(
+                        f"{response.status_code} {response.reason} ({url})", response=response
+                    )
+                    time.sleep(_backoff_delay(attempt, response.headers.get("Retry-After")))
+                    continue
+
+                if not response.ok:
+                    # Erro permanente neste mirror (404, 403...): passa para o próximo
+                    last_error = requests.HTTPError(
+                        f"{response.status_code} {response.reason} ({url})", response=response
+                    )
+                    break
+
+                try:
+                    with span("http.transfer"):
+                        _write_response(response, filepath, sha256, size, progress, throttle)
+                    return filepath
+                except IntegrityError as e:
+                    last_error = e
+                    break
+                except (requests.ConnectionError, requests.Timeout,
+                        requests.exceptions.ChunkedEncodingError) as e:
+                    # Conexão caiu no meio da transferência
+                    last_error = e
+                    forget_redirect(url)
+                    time.sleep(_backoff_delay(attempt))
+                    continue
+
+    raise DownloadError(str(last_error) if last_error else "Nenhuma URL de download disponível")
+
+
+def fetch_range(urls, start, end, throttle=None):
+    """Baixa os bytes [start, end] (inclusivo) do primeiro mirror que responder
+
+    Levanta RangeNotSupported se o servidor devolver o arquivo inteiro.
+    """
+    if isinstance(urls, str):
+        urls = [urls]
+
+    headers = {"Range": f"bytes={start}-{end}"}
+    last_error = None
+    for url in urls:
+        for attempt in range(MAX_ATTEMPTS):
+            try:
+                response = _open_stream(url, headers)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                last_error = e
+                time.sleep(_backoff_delay(attempt))
+                continue
+
+            with response:
+                if response.status_code in RETRY_STATUS:
+                    last_error = requests.HTTPError(
+                        f"{response.status_code} {response.reason} ({url})", response=response
+                    )
+                    time.sleep(_backoff_delay(attempt, response.headers.get("Retry-After")))
+                    continue
+                if response.status_code == 200:
+                    raise RangeNotSupported(f"Servidor não suporta Range: {url}")
+                if response.status_code != 206:
+                    last_error = requests.HTTPError(
+                        f"{response.status_code} {response.reason} ({url})", response=response
+                    )
+                    break
+                try:
+                    data = response.content
+                except (requests.ConnectionError, requests.Timeout,
+                        requests.exceptions.ChunkedEncodingError) as e:
+                    last_error = e
+                    time.sleep(_backoff_delay(attempt))
+                    continue
+                if len(data) != end - start + 1:
+                    last_error = DownloadError(f"Intervalo incompleto de {url}")
+                    continue
+                if throttle:
+                    throttle(len(data))
+                return data
+
+    raise DownloadError(str(last_error) if last_error else "Nenhuma URL de download disponível")
@@ -0,0 +1,256 @@
+"""Motor de rede do PeS: um loop asyncio em uma thread de fundo
+
+O loop é criado no primeiro uso e parado no unregister(). Pedidos pequenos
+(sondagens HEAD, catálogos) usam um cliente HTTP assíncrono próprio e rodam
+concorrentes na mesma thread; downloads grandes, que usam requests, rodam num
+executor próprio com concorrência limitada. O executor padrão do loop fica
+livre para o getaddrinfo das sondagens: um download que espera uma sondagem
+nunca ocupa a thread de que ela precisa.
+
+O Blender só pode ser tocado pela thread principal: resultados com callback
+ficam numa fila que a thread principal esvazia com dispatch_completions()
+(chamado por um bpy.app.timers no add-on).
+"""
+
+import asyncio
+import functools
+import gzip
+import queue
+import ssl
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+# Trabalhos bloqueantes (downloads com requests) simultâneos
+MAX_BLOCKING = 4
+MAX_REDIRECTS = 5
+HTTP_TIMEOUT = 10
+PROBE_TIMEOUT = 3
+REDIRECT_STATUS = {301, 302, 303, 307, 308}
+
+
+class HTTPError(Exception):
+    """Falha de protocolo no cliente HTTP assíncrono"""
+
+
+class HTTPResponse:
+    def __init__(self, status, headers, body, url):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.url = url
+
+    @property
+    def ok(self):
+        return 200 <= self.status < 400
+
+
+@functools.lru_cache(maxsize=1)
+def _ssl_context():
+    try:
+        import certifi
+        return ssl.create_default_context(cafile=certifi.where())
+    except ImportError:
+        return ssl.create_default_context()
+
+
+async def _read_chunked(reader, timeout):
+    body = bytearray()
+    while True:
+        size_line = await asyncio.wait_for(reader.readline(), timeout)
+        size = int(size_line.split(b";")[0].strip() or b"0", 16)
+        if size == 0:
+            # Cabeçalhos finais opcionais até a linha vazia
+            while (await asyncio.wait_for(reader.readline(), timeout)) not in (b"\r\n", b"\n", b""):
+                pass
+            return bytes(body)
+        body += await asyncio.wait_for(reader.readexactly(size), timeout)
+        await asyncio.wait_for(reader.readexactly(2), timeout)
+
+
+async def _request_once(url, method, headers, timeout):
+    parts = urllib.parse.urlsplit(url)
+    if parts.scheme not in ("http", "https"):
+        raise HTTPError(f"Esquema não suportado: {url}")
+    https = parts.scheme == "https"
+    port = parts.port or (443 if https else 80)
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(parts.hostname, port, ssl=_ssl_context() if https else None,
+                                server_hostname=parts.hostname if https else None),
+        timeout,
+    )
+    try:
+        target = parts.path or "/"
+        if parts.query:
+            target += "?" + parts.query
+        lines = [
+            f"{method} {target} HTTP/1.1",
+            f"Host: {parts.netloc}",
+            "Connection: close",
+            "Accept-Encoding: gzip",
+            "User-Agent: PeS",
+        ]
+        lines.extend(f"{key}: {value}" for key, value in (headers or {}).items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        await writer.drain()
+
+        status_line = await asyncio.wait_for(reader.readline(), timeout)
+        try:
+            status = int(status_line.split()[1])
+        except (IndexError, ValueError):
+            raise HTTPError(f"Resposta inválida de {url}: {status_line[:80]!r}")
+
+        response_headers = {}
+        while True:
+            line = await asyncio.wait_for(reader.readline(), timeout)
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            response_headers[key.strip().lower()] = value.strip()
+
+        body = b""
+        if method != "HEAD" and status not in (204, 304) and status not in REDIRECT_STATUS:
+            if response_headers.get("transfer-encoding", "").lower() == "chunked":
+                body = await _read_chunked(reader, timeout)
+            elif "content-length" in response_headers:
+                body = await asyncio.wait_for(
+                    reader.readexactly(int(response_headers["content-length"])), timeout
+                )
+            else:
+                body = await asyncio.wait_for(reader.read(), timeout)
+        if body and response_headers.get("content-encoding") == "gzip":
+            body = gzip.decompress(body)
+        return HTTPResponse(status, response_headers, body, url)
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except (OSError, ssl.SSLError):
+            pass
+
+
+async def http_request(url, method="GET", headers=None, timeout=HTTP_TIMEOUT):
+    """Pedido HTTP assíncrono seguindo redirects; o corpo vem inteiro em memória"""
+    for _ in range(MAX_REDIRECTS + 1):
+        response = await _request_once(url, method, headers, timeout)
+        location = response.headers.get("location")
+        if response.status not in REDIRECT_STATUS or not location:
+            return response
+        url = urllib.parse.urljoin(url, location)
+        if response.status == 303:
+            method = "GET"
+    raise HTTPError(f"Redirects demais a partir de {url}")
+
+
+async def probe(url, timeout=PROBE_TIMEOUT):
+    """HEAD em uma URL: (segundos até a resposta, resposta) ou (None, erro)"""
+    started = time.perf_counter()
+    try:
+        response = await http_request(url, "HEAD", timeout=timeout)
+    except (OSError, asyncio.TimeoutError, HTTPError, ssl.SSLError) as e:
+        return None, e
+    if not response.ok:
+        return None, HTTPError(f"{response.status} ({url})")
+    return time.perf_counter() - started, response
+
+
+class NetworkEngine:
+    """Loop asyncio dedicado à rede do PeS, iniciado sob demanda"""
+
+    def __init__(self, max_blocking=MAX_BLOCKING):
+        self.max_blocking = max_blocking
+        self._loop = None
+        self._thread = None
+        self._executor = None  # downloads; o executor padrão do loop fica para DNS
+        self._lock = threading.Lock()
+        self._completions = queue.SimpleQueue()
+        self._pending_callbacks = 0
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def pending_callbacks(self):
+        """Trabalhos com callback que ainda não foram entregues à thread principal"""
+        return self._pending_callbacks
+
+    def start(self):
+        """Inicia a thread do loop (se ainda não estiver rodando)"""
+        with self._lock:
+            if self.running:
+                return
+            ready = threading.Event()
+            self._loop = asyncio.new_event_loop()
+            self._executor = ThreadPoolExecutor(max_workers=self.max_blocking,
+                                                thread_name_prefix="pes-download")
+            self._thread = threading.Thread(target=self._run, args=(ready,),
+                                            name="pes-network", daemon=True)
+            self._thread.start()
+            ready.wait()
+
+    def _run(self, ready):
+        loop = self._loop
+        asyncio.set_event_loop(loop)
+        loop.call_soon(ready.set)
+        try:
+            loop.run_forever()
+        finally:
+            pending = asyncio.all_tasks(loop)
+            for task in pending:
+                task.cancel()
+            if pending:
+                loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            loop.close()
+
+    def stop(self, timeout=5):
+        """Para o loop e descarta trabalhos pendentes"""
+        with self._lock:
+            if not self.running:
+                return
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout)
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._loop = self._thread = self._executor = None
+
+    def submit(self, coro, callback=None):
+        """Agenda uma corrotina no loop e retorna um concurrent.futures.Future
+
+        callback(future) é chamado na thread principal, por dispatch_completions().
+        """
+        self.start()
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        if callback is not None:
+            with self._lock:
+                self._pending_callbacks += 1
+            future.add_done_callback(lambda done: self._completions.put((callback, done)))
+        return future
+
+    def run(self, coro, timeout=None):
+        """Executa a corrotina no loop e espera o resultado (na thread que chamou)"""
+        return self.submit(coro).result(timeout)
+
+    async def to_thread(self, func, *args, **kwargs):
+        """Roda uma função bloqueante no executor de downloads (concorrência limitada)"""
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, functools.partial(func, *args, **kwargs)
+        )
+
+    def dispatch_completions(self):
+        """Entrega os resultados prontos aos callbacks; chamar só da thread principal"""
+        delivered = 0
+        while True:
+            try:
+                callback, future = self._completions.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._pending_callbacks -= 1
+            delivered += 1
+            try:
+                callback(future)
+            except Exception as e:
+                print(f"PeS: erro ao entregar resultado de rede: {e}")
+        return delivered
+
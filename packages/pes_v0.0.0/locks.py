@@ -0,0 +1,157 @@
+"""Travas em arquivo para coordenar downloads entre processos do Blender"""
+
+import json
+import os
+import socket
+import threading
+import time
+
+# Intervalo em que o dono da trava renova o mtime do arquivo de trava
+HEARTBEAT_INTERVAL = 5.0
+# Sem renovação por esse tempo, a trava é considerada abandonada
+STALE_AFTER = 60.0
+POLL_INTERVAL = 0.25
+
+
+def _pid_alive(pid):
+    """Verifica se um processo da máquina local ainda existe"""
+    if pid <= 0:
+        return False
+    if os.name == 'nt':
+        import ctypes
+        PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+        STILL_ACTIVE = 259
+        ERROR_ACCESS_DENIED = 5
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            return kernel32.GetLastError() == ERROR_ACCESS_DENIED
+        try:
+            exit_code = ctypes.c_ulong()
+            kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code))
+            return exit_code.value == STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class FileLock:
+    """Trava exclusiva baseada na criação atômica de <arquivo>.lock
+
+    Funciona entre processos da mesma máquina e entre máquinas que acessam a
+    mesma pasta compartilhada. Enquanto a trava está ativa uma thread renova
+    o mtime do arquivo; travas de processos mortos ou sem renovação há mais de
+    STALE_AFTER segundos são quebradas.
+    """
+
+    def __init__(self, target_path, stale_after=STALE_AFTER):
+        self.path = target_path + ".lock"
+        self.stale_after = stale_after
+        self._owner = {"pid": os.getpid(), "host": socket.gethostname()}
+        self._stop = threading.Event()
+        self._heartbeat = None
+        self.locked = False
+        self.waited = False
+
+    def _try_create(self):
+        try:
+            fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, 'w') as f:
+            json.dump(dict(self._owner, created=time.time()), f)
+        return True
+
+    def _read_owner(self):
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f), os.stat(self.path).st_mtime
+        except (OSError, ValueError):
+            # Trava sendo criada ou removida neste instante
+            return None, None
+
+    def _is_stale(self, owner, mtime):
+        if mtime is None:
+            return False
+        if time.time() - mtime > self.stale_after:
+            return True
+        if owner and owner.get("host") == self._owner["host"]:
+            return not _pid_alive(owner.get("pid", 0))
+        return False
+
+    def _break_stale(self, owner):
+        """Remove uma trava abandonada sem apagar uma trava nova criada no meio tempo"""
+        stale_path = f"{self.path}.{os.getpid()}.stale"
+        try:
+            os.replace(self.path, stale_path)
+        except OSError:
+            return
+        try:
+            with open(stale_path, 'r') as f:
+                taken = json.load(f)
+        except (OSError, ValueError):
+            taken = None
+        if owner is not None and taken is not None and taken != owner:
+            # Outro processo recriou a trava entre a leitura e a remoção: devolve
+            try:
+                os.link(stale_path, self.path)
+            except OSError:
+                pass
+        try:
+            os.remove(stale_path)
+        except OSError:
+            pass
+        print(f"Trava abandonada removida: {self.path}")
+
+    def acquire(self, timeout=None):
+        """Obtém a trava e retorna True se precisou esperar por outro processo"""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        waited = False
+        while not self._try_create():
+            waited = True
+            owner, mtime = self._read_owner()
+            if self._is_stale(owner, mtime):
+                self._break_stale(owner)
+                continue
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"Tempo esgotado esperando a trava {self.path}")
+            time.sleep(POLL_INTERVAL)
+
+        self.locked = True
+        self.waited = waited
+        self._stop.clear()
+        self._heartbeat = threading.Thread(target=self._beat, daemon=True)
+        self._heartbeat.start()
+        return waited
+
+    def _beat(self):
+        while not self._stop.wait(HEARTBEAT_INTERVAL):
+            try:
+                os.utime(self.path)
+            except OSError:
+                return
+
+    def release(self):
+        if not self.locked:
+            return
+        self._stop.set()
+        self._heartbeat.join()
+        self.locked = False
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
@@ -0,0 +1,391 @@
+"""Geração do catálogo de rigs (rigs.json) a partir de uma pasta de arquivos"""
+
+import hashlib
+import json
+import os
+import re
+import tarfile
+from concurrent.futures import ThreadPoolExecutor
+
+from .blendfile import BlendFile, BlendFileError
+
+# Mesmo padrão de nome usado pelo add-on: PES_CHR_<nome>_RIG_v<NN>[_<variante>].blend
+PUBLISH_FILENAME_RE = re.compile(
+    r'^(?P<base>PES_CHR_[A-Za-z0-9]+_RIG)_v(?P<version>\d+)(?:_(?P<variant>[A-Za-z0-9]+))?\.blend$'
+)
+HASH_CACHE_NAME = ".pes_publish_cache.json"
+DEPENDENCY_CACHE_NAME = ".pes_publish_deps.json"
+READ_BUFFER = 1024 * 1024
+
+
+class CatalogError(Exception):
+    """Catálogo inválido"""
+
+
+def scan_rig_dir(rig_dir):
+    """Lista os arquivos de rig da pasta: [(caminho, rig_id, versão, variante)]"""
+    found = []
+    for filename in sorted(os.listdir(rig_dir)):
+        match = PUBLISH_FILENAME_RE.match(filename)
+        if match:
+            found.append((
+                os.path.join(rig_dir, filename),
+                match.group("base"),
+                int(match.group("version")),
+                match.group("variant") or "",
+            ))
+    return found
+
+
+def _hash_file(path):
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(READ_BUFFER)
+            if not data:
+                break
+            hasher.update(data)
+    return hasher.hexdigest()
+
+
+def _describe_file(path):
+    """Hash, collections, versão do Blender e caminhos externos de um arquivo de rig"""
+    try:
+        blend = BlendFile(path, codes=(b'GR', b'LI', b'IM'))
+        collections = sorted(blend.collections())
+        blender = f"{blend.version // 100}.{blend.version % 100}.0"
+        libraries = blend.libraries()
+        images = blend.images()
+    except BlendFileError as e:
+        print(f"Aviso: não foi possível ler as collections de {path}: {e}")
+        collections = []
+        blender = None
+        libraries = images = []
+    return {"sha256": _hash_file(path), "collections": collections, "blender": blender,
+            "libraries": libraries, "images": images}
+
+
+def _describe_dependency(path):
+    return {"sha256": _hash_file(path)}
+
+
+def describe_files(paths, cache_path, parallel=4, describe=_describe_file, required=("blender", "libraries"),
+                   root=None, write_cache=True):
+    """Descreve os arquivos reaproveitando o cache para os que não mudaram (mtime/tamanho)
+
+    O cache é indexado pelo nome do arquivo, ou pelo caminho relativo a root;
+    entradas sem algum dos campos required (de versões antigas) são refeitas.
+    Com write_cache=False o cache só é lido.
+    """
+
+    def cache_key(path):
+        return os.path.relpath(path, root).replace(os.sep, "/") if root else os.path.basename(path)
+
+    try:
+        with open(cache_path, 'r', encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+
+    result = {}
+    pending = []
+    for path in paths:
+        stat = os.stat(path)
+        entry = cache.get(cache_key(path))
+        if (entry and all(key in entry for key in required)
+                and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size):
+            result[path] = entry
+        else:
+            pending.append((path, stat))
+
+    with ThreadPoolExecutor(max_workers=max(1, parallel)) as pool:
+        for (path, stat), info in zip(pending, pool.map(describe, [p for p, _ in pending])):
+            result[path] = dict(info, mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+
+    new_cache = {cache_key(path): entry for path, entry in sorted(result.items())}
+    if write_cache and new_cache != cache:
+        with open(cache_path, 'w', encoding="utf-8") as f:
+            json.dump(new_cache, f, indent=2, sort_keys=True)
+    return result, len(pending)
+
+
+def find_dependencies(path, meta, rig_dir):
+    """Dependências de um arquivo de rig a partir das bibliotecas e imagens que ele usa
+
+    Só entram caminhos relativos ao arquivo (//) que ficam dentro da pasta de
+    rigs e existem nela: {"path": caminho relativo}, ou {"rig", "version"} para
+    bibliotecas que são rigs publicados na própria pasta.
+    """
+    name = os.path.basename(path)
+    found = {}
+    for raw in meta.get("libraries", []) + meta.get("images", []):
+        if not raw.startswith("//"):
+            if raw and not raw.startswith("<"):
+                print(f"Aviso: {name}: caminho absoluto ignorado nas dependências: {raw}")
+            continue
+        relative = os.path.normpath(raw[2:].replace("\\", "/")).replace(os.sep, "/")
+        if relative.startswith("../") or relative == ".." or os.path.isabs(relative):
+            print(f"Aviso: {name}: {raw} fica fora da pasta de rigs e não será baixado junto")
+            continue
+        match = PUBLISH_FILENAME_RE.match(relative)
+        if match and not match.group("variant"):
+            found[relative] = {"rig": match.group("base"), "version": int(match.group("version"))}
+        elif os.path.isfile(os.path.join(rig_dir, relative)):
+            found[relative] = {"path": relative}
+        else:
+            # Imagens empacotadas mantêm o caminho original, que pode não existir
+            print(f"Aviso: {name}: dependência {raw} não encontrada na pasta de rigs")
+    return [found[key] for key in sorted(found)]
+
+
+def build_catalog(rig_dir, existing=None, url_template=None, chunk_indexes=None, parallel=4, write_cache=True):
+    """Monta o catálogo a partir da pasta, preservando URLs e textos do catálogo existente
+
+    url_template (ex.: "http://nas/rigs/{filename}") gera a URL de arquivos
+    que ainda não têm URL no catálogo. chunk_indexes mapeia caminho do arquivo
+    para o caminho do índice de pedaços gerado. Com write_cache=False nada é
+    gravado na pasta (os caches de hash só são lidos).
+    """
+    existing = existing or {"rigs": {}}
+    files = scan_rig_dir(rig_dir)
+    described, rehashed = describe_files(
+        [path for path, _, _, _ in files], os.path.join(rig_dir, HASH_CACHE_NAME), parallel,
+        write_cache=write_cache
+    )
+
+    def url_for(filename, rig_id, version, known=None):
+        if known:
+            return known
+        if url_template:
+            return url_template.format(filename=filename, rig_id=rig_id, version=version)
+        return None
+
+    rigs = {}
+    for rig_id, old in existing.get("rigs", {}).items():
+        rigs[rig_id] = {
+            "latest_version": old.get("latest_version", 0),
+            "download_url": old.get("download_url"),
+            "description": old.get("description"),
+            "versions": dict(old.get("versions", {})),
+            "version_info": {v: dict(info) for v, info in old.get("version_info", {}).items()},
+        }
+
+    missing_urls = []
+    published = []
+    for path, rig_id, version, variant in files:
+        filename = os.path.basename(path)
+        rig = rigs.setdefault(rig_id, {
+            "latest_version": 0,
+            "download_url": None,
+            "description": f"Personagem {rig_id.split('_')[-2]}",
+            "versions": {},
+            "version_info": {},
+        })
+        key = str(version)
+        info = rig["version_info"].setdefault(key, {})
+        meta = described[path]
+
+        if variant:
+            variants = info.setdefault("variants", {})
+            url = url_for(filename, rig_id, version, variants.get(variant))
+            if url is None:
+                missing_urls.append(filename)
+                continue
+            variants[variant] = url
+            continue
+
+        url = url_for(filename, rig_id, version, rig["versions"].get(key))
+        if url is None:
+            missing_urls.append(filename)
+            continue
+        rig["versions"][key] = url
+        published.append((path, rig_id, version, info))
+        info["size"] = meta["size"]
+        info["sha256"] = meta["sha256"]
+        if meta["collections"]:
+            info["collections"] = meta["collections"]
+        # Arquivos salvos em versões mais novas não abrem de forma confiável nas antigas
+        if meta["blender"] and "blender_min" not in info:
+            info["blender_min"] = meta["blender"]
+        if chunk_indexes and path in chunk_indexes:
+            index_name = os.path.basename(chunk_indexes[path])
+            index_url = url_for(index_name, rig_id, version, info.get("chunk_index"))
+            if index_url:
+                info["chunk_index"] = index_url
+
+    # Texturas, bibliotecas e sub-rigs que cada versão usa, para o add-on baixar junto
+    dependencies = {path: find_dependencies(path, described[path], rig_dir) for path, _, _, _ in published}
+    dependency_paths = sorted({
+        os.path.join(rig_dir, dependency["path"])
+        for found in dependencies.values() for dependency in found if "path" in dependency
+    })
+    dependency_meta, dependency_rehashed = describe_files(
+        dependency_paths, os.path.join(rig_dir, DEPENDENCY_CACHE_NAME), parallel,
+        _describe_dependency, ("sha256",), rig_dir, write_cache
+    )
+    rehashed += dependency_rehashed
+    for path, rig_id, version, info in published:
+        known = {d["path"]: d.get("url") for d in info.get("dependencies", []) if "path" in d}
+        entries = []
+        for dependency in dependencies[path]:
+            if "rig" in dependency:
+                entries.append(dependency)
+                continue
+            url = url_for(dependency["path"], rig_id, version, known.get(dependency["path"]))
+            if url is None:
+                missing_urls.append(dependency["path"])
+                continue
+            meta = dependency_meta[os.path.join(rig_dir, dependency["path"])]
+            entries.append(dict(dependency, url=url, sha256=meta["sha256"], size=meta["size"]))
+        if entries:
+            info["dependencies"] = entries
+        else:
+            info.pop("dependencies", None)
+
+    for rig in rigs.values():
+        if rig["versions"]:
+            latest = max(int(v) for v in rig["versions"])
+            rig["latest_version"] = latest
+            rig["download_url"] = rig["versions"][str(latest)]
+
+    # Campos fora de "rigs" (como os pacotes) passam como estão
+    catalog = dict(existing, rigs=rigs)
+    if missing_urls:
+        raise CatalogError(
+            "Arquivos sem URL no catálogo (use --url-template): " + ", ".join(missing_urls)
+        )
+    return normalize_catalog(catalog), rehashed
+
+
+def normalize_catalog(catalog):
+    """Ordena o catálogo de forma determinística e remove campos vazios"""
+    rigs = {}
+    for rig_id in sorted(catalog["rigs"]):
+        rig = catalog["rigs"][rig_id]
+        entry = {
+            "latest_version": rig["latest_version"],
+            "download_url": rig["download_url"],
+        }
+        if rig.get("description"):
+            entry["description"] = rig["description"]
+        entry["versions"] = {
+            v: rig["versions"][v] for v in sorted(rig.get("versions", {}), key=int, reverse=True)
+        }
+        version_info = {
+            v: {k: info[k] for k in sorted(info)}
+            for v, info in sorted(rig.get("version_info", {}).items(), key=lambda item: -int(item[0]))
+            if info
+        }
+        if version_info:
+            entry["version_info"] = version_info
+        rigs[rig_id] = entry
+    result = {"rigs": rigs}
+    for key in sorted(catalog):
+        if key != "rigs":
+            result[key] = catalog[key]
+    return result
+
+
+def validate_catalog(catalog):
+    """Lista os problemas encontrados no catálogo (lista vazia se válido)"""
+    problems = []
+    rigs = catalog.get("rigs")
+    if not isinstance(rigs, dict):
+        return ["Campo 'rigs' ausente ou inválido"]
+
+    def check_url(where, url):
+        if not isinstance(url, str) or not url.startswith(("http://", "https://")):
+            problems.append(f"{where}: URL inválida {url!r}")
+
+    for rig_id, rig in rigs.items():
+        versions = rig.get("versions", {})
+        latest = rig.get("latest_version")
+        if not isinstance(latest, int):
+            problems.append(f"{rig_id}: latest_version deve ser inteiro")
+            continue
+        check_url(f"{rig_id}.download_url", rig.get("download_url"))
+        for version, url in versions.items():
+            if not version.isdigit():
+                problems.append(f"{rig_id}: versão inválida {version!r}")
+            check_url(f"{rig_id} v{version}", url)
+        if versions:
+            if str(latest) not in versions:
+                problems.append(f"{rig_id}: latest_version v{latest} não está em versions")
+            elif versions[str(latest)] != rig.get("download_url"):
+                problems.append(f"{rig_id}: download_url difere da URL de v{latest}")
+            if max(int(v) for v in versions if v.isdigit()) != latest:
+                problems.append(f"{rig_id}: latest_version não é a maior versão")
+        for version, info in rig.get("version_info", {}).items():
+            for mirror in info.get("mirrors", []):
+                check_url(f"{rig_id} v{version} mirror", mirror)
+            for variant, url in info.get("variants", {}).items():
+                check_url(f"{rig_id} v{version} variante {variant}", url)
+            if "sha256" in info and not re.fullmatch(r'[0-9a-f]{64}', str(info["sha256"])):
+                problems.append(f"{rig_id} v{version}: sha256 inválido")
+            if "size" in info and (not isinstance(info["size"], int) or info["size"] <= 0):
+                problems.append(f"{rig_id} v{version}: tamanho inválido")
+            if "blender_min" in info and not re.fullmatch(r'\d+(\.\d+){0,2}', str(info["blender_min"])):
+                problems.append(f"{rig_id} v{version}: blender_min inválido {info['blender_min']!r}")
+            link_collections = info.get("link_collections", [])
+            if not isinstance(link_collections, list) or not all(
+                isinstance(name, str) and name for name in link_collections
+            ):
+                problems.append(f"{rig_id} v{version}: link_collections deve ser lista de nomes")
+            elif info.get("collections"):
+                for name in link_collections:
+                    if name not in info["collections"]:
+                        problems.append(f"{rig_id} v{version}: collection {name!r} não existe no arquivo")
+            for dependency in info.get("dependencies", []):
+                if "rig" in dependency:
+                    sub_rig = rigs.get(dependency["rig"])
+                    if sub_rig is None or str(dependency.get("version")) not in sub_rig.get("versions", {}):
+                        problems.append(
+                            f"{rig_id} v{version}: depende de {dependency['rig']} "
+                            f"v{dependency.get('version')}, que não está no catálogo"
+                        )
+                    continue
+                relative = str(dependency.get("path", ""))
+                if not relative or relative.startswith(("/", "../")) or "/../" in relative or "\\" in relative:
+                    problems.append(f"{rig_id} v{version}: caminho de dependência inválido {relative!r}")
+                check_url(f"{rig_id} v{version} dependência {relative}", dependency.get("url"))
+                if "sha256" in dependency and not re.fullmatch(r'[0-9a-f]{64}', str(dependency["sha256"])):
+                    problems.append(f"{rig_id} v{version}: sha256 inválido em {relative}")
+
+    for name, bundle in catalog.get("bundles", {}).items():
+        check_url(f"pacote {name}", bundle.get("url"))
+        for mirror in bundle.get("mirrors", []):
+            check_url(f"pacote {name} mirror", mirror)
+        bundle_rigs = bundle.get("rigs")
+        if not isinstance(bundle_rigs, dict) or not bundle_rigs:
+            problems.append(f"pacote {name}: 'rigs' deve mapear rigs a versões")
+            continue
+        for rig_id, version in bundle_rigs.items():
+            rig = rigs.get(rig_id)
+            if rig is None:
+                problems.append(f"pacote {name}: rig {rig_id} não está no catálogo")
+            elif str(version) not in rig.get("versions", {str(rig["latest_version"]): None}):
+                problems.append(f"pacote {name}: {rig_id} não tem a versão v{version}")
+    return problems
+
+
+def write_bundle(paths, output):
+    """Grava os arquivos num .tar sem compressão (os .blend já vêm comprimidos)
+
+    Os membros levam só o nome do arquivo, como o add-on espera; a troca do
+    arquivo é atômica. Retorna o tamanho do pacote.
+    """
+    tmp_path = output + ".tmp"
+    try:
+        with tarfile.open(tmp_path, "w", format=tarfile.PAX_FORMAT) as tar:
+            for path in paths:
+                tar.add(path, arcname=os.path.basename(path), recursive=False)
+        os.replace(tmp_path, output)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return os.path.getsize(output)
+
+
+def dump_catalog(catalog):
+    """Serializa o catálogo sempre com a mesma formatação"""
+    return json.dumps(catalog, indent=2, ensure_ascii=False) + "\n"
@@ -0,0 +1,217 @@
+"""Estado local do PeS em SQLite: revisões do catálogo, arquivos baixados e uso
+
+O banco fica na pasta de dados do usuário (disco local) em modo WAL, o que
+permite leituras concorrentes enquanto outro processo do Blender escreve.
+Cada thread usa a própria conexão; close() fecha as de todas elas.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+from .locks import STALE_AFTER
+
+SCHEMA_VERSION = 1
+BUSY_TIMEOUT_MS = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS catalog_revisions (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    etag TEXT,
+    rig_count INTEGER NOT NULL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    UNIQUE (url, sha256)
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    rig_id TEXT,
+    version INTEGER,
+    variant TEXT NOT NULL DEFAULT '',
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT,
+    verified_at REAL,
+    downloaded_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_rig ON files (rig_id, version);
+CREATE INDEX IF NOT EXISTS files_last_used ON files (last_used);
+CREATE TABLE IF NOT EXISTS downloads (
+    path TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    total INTEGER,
+    received INTEGER NOT NULL DEFAULT 0,
+    pid INTEGER NOT NULL,
+    started_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+def _key(path):
+    """Chave normalizada de um caminho de arquivo"""
+    return os.path.normcase(os.path.abspath(path))
+
+
+class StateStore:
+    """Banco SQLite com o estado local do PeS, seguro entre processos"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        # Conexões abertas por qualquer thread, para o close()
+        self._connections = set()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as db:
+            if db.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                db.executescript(SCHEMA)
+                db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _connect(self):
+        db = getattr(self._local, "db", None)
+        if db is None or db not in self._connections:
+            # Cada conexão só é usada pela thread que a abriu; close() pode fechá-la de outra
+            db = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode = WAL")
+            db.execute("PRAGMA synchronous = NORMAL")
+            db.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+            with self._lock:
+                self._connections.add(db)
+            self._local.db = db
+        return db
+
+    def close(self):
+        """Fecha as conexões de todas as threads; quem usar o banco depois abre outra"""
+        with self._lock:
+            connections, self._connections = self._connections, set()
+        for db in connections:
+            db.close()
+        self._local.db = None
+
+    # Catálogo
+
+    def record_catalog(self, url, sha256, etag, rig_count):
+        """Registra uma revisão do catálogo (ou renova a já conhecida)"""
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO catalog_revisions (url, sha256, etag, rig_count, first_seen, last_seen)"
+                " VALUES (?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (url, sha256) DO UPDATE SET last_seen = excluded.last_seen,"
+                " etag = excluded.etag",
+                (url, sha256, etag, rig_count, now, now),
+            )
+
+    def catalog_revisions(self, url, limit=20):
+        """Revisões conhecidas de um catálogo, da mais recente para a mais antiga"""
+        return self._connect().execute(
+            "SELECT * FROM catalog_revisions WHERE url = ? ORDER BY first_seen DESC LIMIT ?",
+            (url, limit),
+        ).fetchall()
+
+    # Arquivos
+
+    def record_file(self, path, rig_id=None, version=None, variant="", sha256=None, verified=False):
+        """Registra um arquivo de rig baixado; verified indica que o sha256 foi conferido"""
+        stat = os.stat(path)
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO files (path, rig_id, version, variant, size, mtime_ns,"
+                " sha256, verified_at, downloaded_at, last_used) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (_key(path), rig_id, version, variant or "", stat.st_size, stat.st_mtime_ns,
+                 sha256, now if verified and sha256 else None, now, now),
+            )
+
+    def get_file(self, path):
+        """Registro de um arquivo, ou None se ele não é conhecido ou mudou no disco"""
+        row = self._connect().execute("SELECT * FROM files WHERE path = ?", (_key(path),)).fetchone()
+        if row is None:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if stat.st_size != row["size"] or stat.st_mtime_ns != row["mtime_ns"]:
+            return None
+        return row
+
+    def is_verified(self, path, sha256=None):
+        """O arquivo no disco é o mesmo que foi conferido (e, se informado, tem esse hash)"""
+        row = self.get_file(path)
+        return bool(row and row["verified_at"] and (sha256 is None or row["sha256"] == sha256))
+
+    def local_versions(self, rig_id):
+        """Versões de um rig presentes no disco: {versão: [caminhos]}"""
+        result = {}
+        rows = self._connect().execute(
+            "SELECT path, version FROM files WHERE rig_id = ? ORDER BY version DESC", (rig_id,)
+        ).fetchall()
+        for row in rows:
+            if os.path.exists(row["path"]):
+                result.setdefault(row["version"], []).append(row["path"])
+        return result
+
+    def touch(self, paths):
+        """Marca arquivos como usados agora"""
+        now = time.time()
+        with self._connect() as db:
+            db.executemany(
+                "UPDATE files SET last_used = ? WHERE path = ?", [(now, _key(path)) for path in paths]
+            )
+
+    def least_recently_used(self, directory=None, limit=100):
+        """Arquivos do menos para o mais recentemente usado, opcionalmente só de uma pasta"""
+        query = "SELECT * FROM files"
+        params = []
+        if directory:
+            query += " WHERE path LIKE ? ESCAPE '\\'"
+            prefix = os.path.join(_key(directory), "")
+            params.append(prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+        query += " ORDER BY last_used LIMIT ?"
+        params.append(limit)
+        return self._connect().execute(query, params).fetchall()
+
+    def forget_file(self, path):
+        """Remove o registro de um arquivo apagado"""
+        with self._connect() as db:
+            db.execute("DELETE FROM files WHERE path = ?", (_key(path),))
+
+    # Downloads em andamento
+
+    def start_download(self, path, url, total=None):
+        """Registra o início de um download"""
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO downloads (path, url, total, received, pid, started_at, updated_at)"
+                " VALUES (?, ?, ?, 0, ?, ?, ?)",
+                (_key(path), url, total, os.getpid(), now, now),
+            )
+
+    def update_download(self, path, received, total=None):
+        """Atualiza o progresso de um download"""
+        with self._connect() as db:
+            db.execute(
+                "UPDATE downloads SET received = ?, total = COALESCE(?, total), updated_at = ?"
+                " WHERE path = ?",
+                (received, total, time.time(), _key(path)),
+            )
+
+    def finish_download(self, path):
+        """Remove um download concluído (ou que falhou) da lista de andamento"""
+        with self._connect() as db:
+            db.execute("DELETE FROM downloads WHERE path = ?", (_key(path),))
+
+    def active_downloads(self):
+        """Downloads em andamento em qualquer processo (ignora os abandonados)"""
+        return self._connect().execute(
+            "SELECT * FROM downloads WHERE updated_at > ? ORDER BY started_at",
+            (time.time() - STALE_AFTER,),
+        ).fetchall()
@@ -0,0 +1,107 @@
+"""Medição de tempo das etapas do PeS (catálogo, download, link, reload...)
+
+Cada etapa guarda as últimas medições em memória para o painel de
+diagnóstico; opcionalmente cada medição também é anexada a um log JSONL.
+"""
+
+import functools
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Medições guardadas por etapa
+HISTORY = 200
+
+
+def percentile(values, fraction):
+    """Percentil pelo método do posto mais próximo"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(fraction * len(ordered)))
+    return ordered[rank - 1]
+
+
+class Timings:
+    """Buffer circular de durações por etapa, seguro entre threads"""
+
+    def __init__(self, history=HISTORY):
+        self.history = history
+        self.log_path = None
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds, **extra):
+        """Registra uma duração (em segundos) de uma etapa"""
+        with self._lock:
+            samples = self._stages.get(stage)
+            if samples is None:
+                samples = self._stages[stage] = deque(maxlen=self.history)
+            samples.append(seconds)
+            log_path = self.log_path
+        if log_path:
+            entry = dict(extra, ts=round(time.time(), 3), stage=stage,
+                         ms=round(seconds * 1000, 3), pid=os.getpid())
+            try:
+                with open(log_path, 'a', encoding="utf-8") as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            except OSError as e:
+                print(f"Aviso: não foi possível gravar o log de tempos: {e}")
+
+    @contextmanager
+    def span(self, stage, **extra):
+        """Mede o bloco como uma etapa"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - started, **extra)
+
+    def timed(self, stage):
+        """Decorador que mede cada chamada da função como uma etapa"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(stage):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def timed_method(self, stage):
+        """Como timed, para execute/draw/invoke de operadores e painéis
+
+        O Blender confere a quantidade de argumentos desses métodos ao
+        registrar a classe, então o wrapper declara (self, context).
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(owner, context):
+                with self.span(stage):
+                    return func(owner, context)
+            return wrapper
+        return decorator
+
+    def summary(self):
+        """[(etapa, quantidade, p50, p95, última)] em segundos, ordenado pela etapa"""
+        with self._lock:
+            stages = {stage: list(samples) for stage, samples in self._stages.items()}
+        return [
+            (stage, len(samples), percentile(samples, 0.5), percentile(samples, 0.95), samples[-1])
+            for stage, samples in sorted(stages.items())
+        ]
+
+    def clear(self):
+        """Descarta as medições em memória"""
+        with self._lock:
+            self._stages.clear()
+
+
+# Instância usada por todo o add-on
+timings = Timings()
+span = timings.span
+timed = timings.timed
+timed_method = timings.timed_method
@@ -0,0 +1,224 @@
+"""Índice das versões de rig presentes na pasta de rigs, sem rede
+
+Versões copiadas direto para a pasta compartilhada (sem passar pelo catálogo)
+entram no índice quando o arquivo para de mudar. A pasta é conferida pelo
+inotify (Linux) e pelo mtime dela; o mtime cobre também pastas de rede, onde
+o inotify não vê arquivos gravados por outras máquinas.
+"""
+
+import os
+import sys
+import threading
+import time
+from collections.abc import Mapping
+
+# Segundos sem mudança de tamanho/mtime até um arquivo copiado entrar no índice
+SETTLE_SECONDS = 2.0
+
+# Eventos do inotify que mudam a lista de arquivos (IN_ATTRIB, IN_CLOSE_WRITE,
+# IN_MOVED_FROM, IN_MOVED_TO, IN_CREATE, IN_DELETE)
+_INOTIFY_MASK = 0x004 | 0x008 | 0x040 | 0x080 | 0x100 | 0x200
+
+
+class _Inotify:
+    """Descritor inotify não bloqueante observando uma pasta"""
+
+    def __init__(self, directory):
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), _INOTIFY_MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch({directory})")
+
+    def pending(self):
+        """Descarta os eventos acumulados; True se havia algum"""
+        changed = False
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return changed
+            if not data:
+                return changed
+            changed = True
+
+    def close(self):
+        os.close(self.fd)
+
+
+def _open_inotify(directory):
+    if not sys.platform.startswith("linux") or not os.path.isdir(directory):
+        return None
+    try:
+        return _Inotify(directory)
+    except (OSError, AttributeError):
+        # libc sem inotify ou limite de watches atingido: fica só com o mtime
+        return None
+
+
+class RigFolderIndex:
+    """Versões de rig de uma pasta: {rig_id: {versão: caminho}}
+
+    parse(nome do arquivo) retorna (rig_id, versão) ou None para ignorar o
+    arquivo. refresh() é barato quando nada mudou (um stat e, no Linux, uma
+    leitura não bloqueante) e pode rodar fora da thread principal.
+    """
+
+    def __init__(self, directory, parse, settle=SETTLE_SECONDS):
+        self.directory = directory
+        self.parse = parse
+        self.settle = settle
+        self.generation = 0
+        self._lock = threading.Lock()
+        # nome -> (rig_id, versão, tamanho, mtime_ns)
+        self._files = {}
+        # nome -> (tamanho, mtime_ns, visto em)
+        self._pending = {}
+        self._versions = {}
+        self._dir_mtime = None
+        self._scanned = False
+        self._inotify = _open_inotify(directory)
+
+    def versions(self):
+        """Índice atual; é trocado inteiro a cada mudança, então não deve ser alterado"""
+        with self._lock:
+            return self._versions
+
+    def refresh(self):
+        """Reindexa se a pasta mudou; retorna True quando o índice mudou"""
+        changed = not self._scanned or bool(self._pending)
+        if self._inotify is not None and self._inotify.pending():
+            changed = True
+        try:
+            dir_mtime = os.stat(self.directory).st_mtime_ns
+        except OSError:
+            dir_mtime = None
+        if dir_mtime != self._dir_mtime:
+            self._dir_mtime = dir_mtime
+            changed = True
+            if self._inotify is None and dir_mtime is not None:
+                # A pasta pode ter sido criada depois do índice
+                self._inotify = _open_inotify(self.directory)
+        if not changed:
+            return False
+        return self._scan()
+
+    def _scan(self):
+        now = time.time()
+        initial = not self._scanned
+        self._scanned = True
+        files = {}
+        pending = {}
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            entries = []
+        for entry in entries:
+            parsed = self.parse(entry.name)
+            if parsed is None:
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            if not entry.is_file():
+                continue
+            rig_id, version = parsed
+            key = (stat.st_size, stat.st_mtime_ns)
+            known = self._files.get(entry.name)
+            if known is not None and known[2:] == key:
+                files[entry.name] = known
+                continue
+            seen = self._pending.get(entry.name)
+            age = now - stat.st_mtime_ns / 1e9
+            settled = (seen is not None and seen[:2] == key and now - seen[2] >= self.settle) or \
+                (initial and age >= self.settle)
+            if settled:
+                files[entry.name] = (rig_id, version) + key
+            elif seen is not None and seen[:2] == key:
+                pending[entry.name] = seen
+            else:
+                pending[entry.name] = key + (now,)
+
+        self._pending = pending
+        if files.keys() == self._files.keys() and all(files[n] == self._files[n] for n in files):
+            return False
+
+        versions = {}
+        for name, (rig_id, version, _, _) in files.items():
+            versions.setdefault(rig_id, {})[version] = os.path.join(self.directory, name)
+        with self._lock:
+            self._files = files
+            self._versions = versions
+            self.generation += 1
+        return True
+
+    def close(self):
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+
+class MergedRigs(Mapping):
+    """Rigs do catálogo com as versões encontradas só na pasta local"""
+
+    def __init__(self, rigs, overrides):
+        self._rigs = rigs
+        self._overrides = overrides
+
+    def __getitem__(self, rig_id):
+        if rig_id in self._overrides:
+            return self._overrides[rig_id]
+        return self._rigs[rig_id]
+
+    def __iter__(self):
+        yield from self._rigs
+        yield from (rig_id for rig_id in self._overrides if rig_id not in self._rigs)
+
+    def __len__(self):
+        return len(self._rigs) + sum(1 for rig_id in self._overrides if rig_id not in self._rigs)
+
+
+def _merge_rig(rig_data, local):
+    """rig_data com as versões de local ({versão: caminho}) que o catálogo não tem"""
+    if rig_data is None:
+        rig_data = {"latest_version": 0, "download_url": "", "versions": {},
+                    "description": "Encontrado só na pasta de rigs"}
+    if "versions" in rig_data:
+        known = rig_data["versions"]
+    else:
+        known = {str(rig_data["latest_version"]): rig_data["download_url"]}
+    extra = {version: path for version, path in local.items() if str(version) not in known}
+    if not extra:
+        return None
+
+    # "versions" continua só com URLs do catálogo; o caminho local fica em version_info
+    merged = dict(rig_data)
+    merged["versions"] = dict(known)
+    merged["version_info"] = dict(rig_data.get("version_info", {}))
+    for version, path in extra.items():
+        merged["version_info"][str(version)] = {"local_path": path}
+    merged["latest_version"] = max(rig_data["latest_version"], max(extra))
+    return merged
+
+
+def merge_local_versions(database, local):
+    """Catálogo acrescido das versões locais ({rig_id: {versão: caminho}}) que ele não conhece
+
+    As versões acrescentadas só aparecem em version_info, com "local_path";
+    o resto do catálogo não é copiado.
+    """
+    rigs = database["rigs"]
+    overrides = {}
+    for rig_id, versions in local.items():
+        merged = _merge_rig(rigs.get(rig_id), versions)
+        if merged is not None:
+            overrides[rig_id] = merged
+    if not overrides:
+        return database
+    return dict(database, rigs=MergedRigs(rigs, overrides))
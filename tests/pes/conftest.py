@@ -0,0 +1,32 @@
+"""Testes do PeS fora do Blender
+
+O add-on é carregado como pacote "pes" com o bpy mínimo de
+benchmarks/pes/bpy_stub, o mesmo dos benchmarks.
+
+    python -m pytest tests
+"""
+
+import importlib.util
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+ADDON_DIR = os.path.join(ROOT, "packages", "pes_v0.0.0")
+
+sys.path.insert(0, os.path.join(ROOT, "benchmarks", "pes", "bpy_stub"))
+
+if "pes" not in sys.modules:
+    _spec = importlib.util.spec_from_file_location(
+        "pes", os.path.join(ADDON_DIR, "__init__.py"), submodule_search_locations=[ADDON_DIR]
+    )
+    _addon = importlib.util.module_from_spec(_spec)
+    sys.modules["pes"] = _addon
+    _spec.loader.exec_module(_addon)
+
+
+@pytest.fixture
+def pes():
+    """O add-on, sem register()"""
+    return sys.modules["pes"]
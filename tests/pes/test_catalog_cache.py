@@ -0,0 +1,73 @@
+"""Cache binário do catálogo: ida e volta e arquivos corrompidos"""
+
+import pytest
+
+from pes.catalog import CatalogCacheError, LazyRigs, read_catalog_cache, write_catalog_cache
+
+CATALOG = {
+    "rigs": {
+        "PES_CHR_Poba_RIG": {
+            "latest_version": 3,
+            "download_url": "https://example.com/PES_CHR_Poba_RIG_v03.blend",
+            "description": "Poba, versão com acentuação",
+            "versions": {"3": "https://example.com/PES_CHR_Poba_RIG_v03.blend"},
+        },
+        "PES_CHR_Sagu_RIG": {
+            "latest_version": 1,
+            "download_url": "https://example.com/PES_CHR_Sagu_RIG_v01.blend",
+        },
+    },
+    "bundles": {"elenco": {"url": "https://example.com/elenco.tar", "rigs": {"PES_CHR_Sagu_RIG": 1}}},
+}
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    path = str(tmp_path / "cache" / "catalog.bin")
+    write_catalog_cache(path, CATALOG, "https://example.com/rigs.json", '"abc"', fetched_at=1234.5)
+    return path
+
+
+def test_round_trip(cache_path):
+    catalog, url, etag, fetched_at = read_catalog_cache(cache_path)
+    assert (url, etag, fetched_at) == ("https://example.com/rigs.json", '"abc"', 1234.5)
+    assert catalog["bundles"] == CATALOG["bundles"]
+    assert isinstance(catalog["rigs"], LazyRigs)
+    assert list(catalog["rigs"]) == list(CATALOG["rigs"])
+    assert dict(catalog["rigs"]) == CATALOG["rigs"]
+
+
+def test_rigs_are_decoded_on_access(cache_path):
+    rigs = read_catalog_cache(cache_path)[0]["rigs"]
+    assert len(rigs) == 2 and not rigs._decoded
+    assert rigs["PES_CHR_Sagu_RIG"]["latest_version"] == 1
+    assert list(rigs._decoded) == ["PES_CHR_Sagu_RIG"]
+
+
+def test_without_etag(tmp_path):
+    path = str(tmp_path / "catalog.bin")
+    write_catalog_cache(path, {"rigs": {}}, "https://example.com/rigs.json")
+    catalog, _, etag, _ = read_catalog_cache(path)
+    assert etag is None and len(catalog["rigs"]) == 0
+
+
+def test_missing_file(tmp_path):
+    with pytest.raises(CatalogCacheError):
+        read_catalog_cache(str(tmp_path / "nada.bin"))
+
+
+def test_wrong_magic(cache_path):
+    with open(cache_path, 'r+b') as f:
+        f.write(b"XXXX")
+    with pytest.raises(CatalogCacheError):
+        read_catalog_cache(cache_path)
+
+
+@pytest.mark.parametrize("keep", [3, 20, -10])
+def test_truncated(cache_path, keep):
+    with open(cache_path, 'rb') as f:
+        data = f.read()
+    with open(cache_path, 'wb') as f:
+        f.write(data[:keep])
+    with pytest.raises(CatalogCacheError):
+        read_catalog_cache(cache_path)
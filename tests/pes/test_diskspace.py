@@ -0,0 +1,131 @@
+"""Reserva de espaço em disco e limpeza do cache de rigs"""
+
+import os
+import time
+
+import pytest
+
+from pes import diskspace
+from pes.diskspace import DiskSpaceError, available_space, reserve_space
+from pes.state import StateStore
+
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def free(monkeypatch):
+    """Espaço livre simulado do disco, em bytes"""
+    disk = {"free": 100 * MB}
+    monkeypatch.setattr(diskspace, "free_space", lambda directory: disk["free"])
+    return disk
+
+
+def test_unknown_size_is_not_checked(free, tmp_path):
+    free["free"] = 0
+    with reserve_space(tmp_path, None):
+        pass
+    with reserve_space(tmp_path, 0):
+        pass
+
+
+def test_fits(free, tmp_path):
+    with reserve_space(tmp_path, 30 * MB, margin=10 * MB):
+        assert available_space(tmp_path) == 70 * MB
+    assert available_space(tmp_path) == 100 * MB
+
+
+def test_missing_directory_uses_the_nearest_ancestor(free, tmp_path):
+    with reserve_space(tmp_path / "rigs" / "novo", 30 * MB, margin=0):
+        assert available_space(tmp_path) == 70 * MB
+
+
+def test_no_space_raises_before_the_transfer(free, tmp_path):
+    with pytest.raises(DiskSpaceError):
+        with reserve_space(tmp_path, 95 * MB, margin=10 * MB):
+            pytest.fail("o bloco não deveria rodar")
+    assert available_space(tmp_path) == 100 * MB
+
+
+def test_concurrent_reservations_add_up(free, tmp_path):
+    with reserve_space(tmp_path, 60 * MB, margin=0):
+        with pytest.raises(DiskSpaceError):
+            with reserve_space(tmp_path, 60 * MB, margin=0):
+                pass
+        with reserve_space(tmp_path, 40 * MB, margin=0):
+            assert available_space(tmp_path) == 0
+
+
+def test_written_part_file_stops_counting_as_reserved(free, tmp_path):
+    part_path = tmp_path / "rig.blend.part"
+    part_path.write_bytes(os.urandom(MB))
+    with reserve_space(tmp_path, 30 * MB, part_path=str(part_path), margin=0):
+        assert 70 * MB < available_space(tmp_path) <= 71 * MB
+
+
+def test_evict_is_called_with_the_shortfall(free, tmp_path):
+    calls = []
+
+    def evict(needed):
+        calls.append(needed)
+        free["free"] += needed
+
+    with reserve_space(tmp_path, 95 * MB, evict=evict, margin=10 * MB):
+        pass
+    assert calls == [5 * MB]
+
+
+def test_evict_that_frees_too_little(free, tmp_path):
+    calls = []
+    with pytest.raises(DiskSpaceError):
+        with reserve_space(tmp_path, 95 * MB, evict=calls.append, margin=10 * MB):
+            pass
+    assert calls == [5 * MB]
+
+
+@pytest.fixture
+def store(pes, monkeypatch, tmp_path):
+    state = StateStore(str(tmp_path / "state" / "state.sqlite3"))
+    monkeypatch.setattr(pes, "get_state_store", lambda: state)
+    yield state
+    state.close()
+
+
+def add_rig(store, directory, name, idle, version=1, size=MB):
+    """Arquivo de rig registrado como usado há `idle` segundos"""
+    path = os.path.join(directory, name)
+    with open(path, 'wb') as f:
+        f.write(b"\0" * size)
+    store.record_file(path, name.split(".")[0], version)
+    used = time.time() - idle
+    with store._connect() as db:
+        db.execute("UPDATE files SET last_used = ? WHERE path = ?", (used, os.path.normcase(path)))
+    return path
+
+
+def test_evict_rig_cache(pes, store, tmp_path):
+    idle = pes.EVICT_MIN_IDLE + 3600
+    directory = str(tmp_path)
+    oldest = add_rig(store, directory, "velho_v01.blend", idle * 3)
+    linked = add_rig(store, directory, "aberto_v01.blend", idle * 2)
+    library = add_rig(store, directory, "texturas.blend", idle * 2, version=None)
+    older = add_rig(store, directory, "antigo_v01.blend", idle)
+    recent = add_rig(store, directory, "recente_v01.blend", 60)
+
+    freed = pes.evict_rig_cache(directory, 10 * MB, frozenset({os.path.normcase(linked)}))
+
+    assert freed == 2 * MB
+    assert not os.path.exists(oldest) and not os.path.exists(older)
+    assert os.path.exists(linked) and os.path.exists(library) and os.path.exists(recent)
+    assert store.get_file(oldest) is None
+    assert store.get_file(linked) is not None
+
+
+def test_evict_rig_cache_stops_when_enough(pes, store, tmp_path):
+    idle = pes.EVICT_MIN_IDLE + 3600
+    directory = str(tmp_path)
+    oldest = add_rig(store, directory, "velho_v01.blend", idle * 2)
+    older = add_rig(store, directory, "antigo_v01.blend", idle)
+
+    assert pes.evict_rig_cache(directory, MB, frozenset()) == MB
+    assert not os.path.exists(oldest)
+    assert os.path.exists(older)
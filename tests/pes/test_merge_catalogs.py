@@ -0,0 +1,70 @@
+"""Combinação de catálogos por prioridade"""
+
+from pes.catalog import FederatedRigs, merge_catalogs
+
+
+def rig(latest, urls, **fields):
+    return dict(fields, latest_version=latest, download_url=urls[str(latest)], versions=urls)
+
+
+PRIMARY = {
+    "rigs": {
+        "PES_CHR_Poba_RIG": rig(2, {"2": "https://a/poba_v02", "1": "https://a/poba_v01"},
+                                description="principal",
+                                version_info={"2": {"size": 20}, "1": {"size": 10}}),
+    },
+    "bundles": {"elenco": {"url": "https://a/elenco.tar"}},
+}
+EXTRA = {
+    "rigs": {
+        "PES_CHR_Poba_RIG": rig(3, {"3": "https://b/poba_v03", "2": "https://b/poba_v02"},
+                                description="extra",
+                                version_info={"3": {"size": 30}, "2": {"size": 99}}),
+        "PES_CHR_Sagu_RIG": rig(1, {"1": "https://b/sagu_v01"}),
+    },
+    "bundles": {"elenco": {"url": "https://b/elenco.tar"}, "fundo": {"url": "https://b/fundo.tar"}},
+}
+
+
+def test_single_catalog_is_returned_as_is():
+    assert merge_catalogs([None, PRIMARY]) is PRIMARY
+    assert merge_catalogs([None]) == {"rigs": {}}
+
+
+def test_rig_ids_from_all_sources():
+    merged = merge_catalogs([PRIMARY, EXTRA])
+    assert isinstance(merged["rigs"], FederatedRigs)
+    assert sorted(merged["rigs"]) == ["PES_CHR_Poba_RIG", "PES_CHR_Sagu_RIG"]
+    assert merged["rigs"]["PES_CHR_Sagu_RIG"] is EXTRA["rigs"]["PES_CHR_Sagu_RIG"]
+
+
+def test_higher_priority_wins_fields_and_shared_versions():
+    poba = merge_catalogs([PRIMARY, EXTRA])["rigs"]["PES_CHR_Poba_RIG"]
+    assert poba["description"] == "principal"
+    assert poba["versions"]["2"] == "https://a/poba_v02"
+    assert poba["version_info"]["2"] == {"size": 20}
+
+
+def test_versions_only_in_lower_priority_are_added():
+    poba = merge_catalogs([PRIMARY, EXTRA])["rigs"]["PES_CHR_Poba_RIG"]
+    assert sorted(poba["versions"]) == ["1", "2", "3"]
+    assert poba["version_info"]["3"] == {"size": 30}
+    assert (poba["latest_version"], poba["download_url"]) == (3, "https://b/poba_v03")
+
+
+def test_priority_order_is_the_list_order():
+    poba = merge_catalogs([EXTRA, PRIMARY])["rigs"]["PES_CHR_Poba_RIG"]
+    assert poba["description"] == "extra"
+    assert poba["versions"]["2"] == "https://b/poba_v02"
+    assert poba["versions"]["1"] == "https://a/poba_v01"
+
+
+def test_sources_are_not_modified():
+    merge_catalogs([PRIMARY, EXTRA])["rigs"]["PES_CHR_Poba_RIG"]
+    assert sorted(PRIMARY["rigs"]["PES_CHR_Poba_RIG"]["versions"]) == ["1", "2"]
+    assert PRIMARY["rigs"]["PES_CHR_Poba_RIG"]["latest_version"] == 2
+
+
+def test_dict_fields_merge_key_by_key():
+    bundles = merge_catalogs([PRIMARY, EXTRA])["bundles"]
+    assert bundles == {"elenco": {"url": "https://a/elenco.tar"}, "fundo": {"url": "https://b/fundo.tar"}}
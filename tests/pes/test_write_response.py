@@ -0,0 +1,103 @@
+"""Gravação de downloads: leitura curta, tamanho e hash divergentes"""
+
+import hashlib
+import http.server
+import os
+import threading
+
+import pytest
+import requests
+
+from pes import downloader
+from pes.downloader import IntegrityError, _write_response, get_part_path
+
+BODY = bytes(range(256)) * 1024
+SHA256 = hashlib.sha256(BODY).hexdigest()
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        if self.path == "/short":
+            # Fecha a conexão antes de entregar o Content-Length prometido
+            self.wfile.write(BODY[:len(BODY) // 3])
+            self.close_connection = True
+        else:
+            self.wfile.write(BODY)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def server():
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture(params=["readinto", "iter_content"])
+def get(request, monkeypatch):
+    """Abre a URL pelos dois caminhos de leitura do corpo"""
+    if request.param == "iter_content":
+        monkeypatch.setattr(downloader, "_raw_stream", lambda response: None)
+    with requests.Session() as session:
+        yield lambda url: session.get(url, stream=True)
+
+
+def assert_nothing_left(filepath):
+    assert not os.path.exists(filepath)
+    assert not os.path.exists(get_part_path(filepath))
+
+
+def test_complete_download(server, get, tmp_path):
+    filepath = str(tmp_path / "rig.blend")
+    progress = []
+    with get(f"{server}/file") as response:
+        _write_response(response, filepath, SHA256, len(BODY),
+                        progress=lambda received, total: progress.append((received, total)))
+    with open(filepath, 'rb') as f:
+        assert f.read() == BODY
+    assert not os.path.exists(get_part_path(filepath))
+    assert progress[-1] == (len(BODY), len(BODY))
+
+
+def test_short_read_is_a_connection_error(server, get, tmp_path):
+    filepath = str(tmp_path / "rig.blend")
+    with get(f"{server}/short") as response:
+        with pytest.raises((requests.ConnectionError, requests.exceptions.ChunkedEncodingError)):
+            _write_response(response, filepath)
+    assert_nothing_left(filepath)
+
+
+def test_size_mismatch(server, get, tmp_path):
+    filepath = str(tmp_path / "rig.blend")
+    with get(f"{server}/file") as response:
+        with pytest.raises(IntegrityError, match="Tamanho"):
+            _write_response(response, filepath, size=len(BODY) + 1)
+    assert_nothing_left(filepath)
+
+
+def test_sha256_mismatch(server, get, tmp_path):
+    filepath = str(tmp_path / "rig.blend")
+    with get(f"{server}/file") as response:
+        with pytest.raises(IntegrityError, match="sha256"):
+            _write_response(response, filepath, "0" * 64, len(BODY))
+    assert_nothing_left(filepath)
+
+
+def test_failed_download_keeps_the_previous_file(server, get, tmp_path):
+    filepath = tmp_path / "rig.blend"
+    filepath.write_bytes(b"anterior")
+    with get(f"{server}/short") as response:
+        with pytest.raises((requests.ConnectionError, requests.exceptions.ChunkedEncodingError)):
+            _write_response(response, str(filepath))
+    assert filepath.read_bytes() == b"anterior"
+    assert not os.path.exists(get_part_path(str(filepath)))